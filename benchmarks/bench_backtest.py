@@ -0,0 +1,129 @@
+"""
+Benchmark: backtest com fatias do histórico vs. backtest em streaming
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona o diretório raiz e src ao PYTHONPATH
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
+
+from models.market_model import MarketData, OptionContract
+from services.backtest_service import BacktestService, CandleArrays, CandleWindow
+from services.options_backtest import OptionsBacktestService
+
+
+def make_candles(n: int, seed: int = 42) -> CandleArrays:
+    rng = np.random.default_rng(seed)
+    price = 45000.0 * np.exp(np.cumsum(rng.normal(0.0, 1e-3, n)))
+    timestamp = np.datetime64("2024-01-01T00:00") + np.arange(n).astype("timedelta64[m]")
+    return CandleArrays(timestamp=timestamp, price=price, volume=rng.uniform(0.0, 10.0, n))
+
+
+def make_market_data(n: int) -> list:
+    arrays = make_candles(n)
+    start = datetime(2024, 1, 1)
+    return [
+        MarketData(start + timedelta(minutes=i), float(p), 0.0, float(p), float(p), float(p), float(p))
+        for i, p in enumerate(arrays.price)
+    ]
+
+
+def momentum(window: CandleWindow) -> float:
+    # Compra/vende em movimentos de mais de 0,5% no último candle
+    if window.end < 2:
+        return 0.0
+    prices = window.arrays.price
+    change = prices[window.end - 1] / prices[window.end - 2] - 1.0
+    return 1.0 if change > 5e-3 else -1.0 if change < -5e-3 else 0.0
+
+
+def legacy_momentum(history: list) -> float:
+    if len(history) < 2:
+        return 0.0
+    change = history[-1].price / history[-2].price - 1.0
+    return 1.0 if change > 5e-3 else -1.0 if change < -5e-3 else 0.0
+
+
+def bench_legacy_slicing(n: int) -> float:
+    # Reproduz o comportamento anterior: uma cópia do prefixo por candle (O(N²))
+    data = make_market_data(n)
+    service = BacktestService()
+    start = time.perf_counter()
+    for i, candle in enumerate(data):
+        signal = legacy_momentum(data[:i + 1])
+        if signal != 0:
+            service._execute_trade(signal, candle.price, candle.timestamp)
+    return time.perf_counter() - start
+
+
+def bench_adapter(n: int) -> float:
+    data = make_market_data(n)
+    start = time.perf_counter()
+    BacktestService().run_backtest(data, legacy_momentum)
+    return time.perf_counter() - start
+
+
+def bench_streaming(n: int) -> float:
+    candles = make_candles(n)
+    start = time.perf_counter()
+    BacktestService().run_streaming_backtest(candles, momentum)
+    return time.perf_counter() - start
+
+
+def bench_vectorized(n: int) -> float:
+    candles = make_candles(n)
+    start = time.perf_counter()
+    # Sinal de momentum calculado de antemão: posição-alvo de +1/-1/0 unidade
+    change = np.diff(candles.price, prepend=candles.price[0]) / candles.price
+    signal = np.where(change > 5e-3, 1.0, np.where(change < -5e-3, -1.0, 0.0))
+    BacktestService().run_vectorized_backtest(candles, signal)
+    return time.perf_counter() - start
+
+
+def bench_options(n_hours: int, legs_per_day: int = 10) -> float:
+    # Abre strangles diários com 30 dias de vencimento: ~300 pernas abertas em regime
+    timestamp = np.datetime64("2024-01-01T00") + np.arange(n_hours).astype("timedelta64[h]")
+    candles = CandleArrays(timestamp=timestamp, price=make_candles(n_hours).price)
+
+    def ladder(state) -> list:
+        if len(state.window) % 24 != 1:
+            return []
+        expiry = state.timestamp + timedelta(days=30)
+        orders = []
+        for k in range(legs_per_day // 2):
+            for is_call, sign in ((True, 1), (False, -1)):
+                strike = round(state.spot * (1 + sign * 0.02 * (k + 1)), -1)
+                contract_id = f"BTC-{expiry:%Y%m%d%H}-{'C' if is_call else 'P'}-{strike}"
+                orders.append((OptionContract("BTC", strike, expiry, contract_id, "BTC", is_call), -1.0))
+        return orders
+
+    start = time.perf_counter()
+    OptionsBacktestService().run_backtest(candles, ladder, volatility=0.6)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    for n in (10_000, 20_000, 40_000):
+        print(
+            f"{n:>10} candles | fatias: {bench_legacy_slicing(n):8.3f}s "
+            f"| adaptador: {bench_adapter(n):8.3f}s | streaming: {bench_streaming(n):8.3f}s"
+        )
+    for n in (100_000, 1_000_000, 10_000_000):
+        elapsed = bench_streaming(n)
+        vectorized = bench_vectorized(n)
+        print(
+            f"{n:>10} candles | streaming: {elapsed:8.3f}s | {elapsed / n * 1e9:6.0f} ns/candle "
+            f"| vetorizado: {vectorized:8.3f}s | {vectorized / n * 1e9:6.0f} ns/candle"
+        )
+    hours = 3 * 365 * 24
+    print(f"{hours:>10} horas   | opções (~300 pernas abertas): {bench_options(hours):8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: precificação escalar vs. vetorizada de cadeias de opções
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona o diretório raiz e src ao PYTHONPATH
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
+
+from services.analysis_service import AnalysisService
+
+
+def make_chain(n: int, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "spot": np.full(n, 45000.0),
+        "strike": rng.uniform(20000.0, 80000.0, n),
+        "time_to_expiry": rng.uniform(1 / 365, 1.0, n),
+        "volatility": rng.uniform(0.2, 1.2, n),
+        "is_call": rng.random(n) < 0.5,
+    }
+
+
+def bench_scalar(service: AnalysisService, chain: dict, sample: int = 10_000) -> float:
+    # O caminho escalar é linear no tamanho da cadeia: mede uma amostra e extrapola
+    n = len(chain["strike"])
+    sample = min(sample, n)
+    start = time.perf_counter()
+    for i in range(sample):
+        args = (
+            float(chain["spot"][i]),
+            float(chain["strike"][i]),
+            float(chain["time_to_expiry"][i]),
+            float(chain["volatility"][i]),
+            bool(chain["is_call"][i]),
+        )
+        service._black_scholes_price(*args)
+        service.calculate_greeks(*args)
+    return (time.perf_counter() - start) * n / sample
+
+
+def bench_batch(service: AnalysisService, chain: dict, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        service.calculate_greeks_batch(**chain)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_implied_volatility(service: AnalysisService, chain: dict, **kwargs) -> float:
+    prices = service.calculate_greeks_batch(**chain).price
+    args = (prices, chain["spot"], chain["strike"], chain["time_to_expiry"], chain["is_call"])
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        service.calculate_implied_volatility_batch(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    service = AnalysisService()
+    for n in (10_000, 100_000):
+        chain = make_chain(n)
+        batch = bench_batch(service, chain)
+        scalar = bench_scalar(service, chain)
+        print(
+            f"{n:>7} contratos | escalar: {scalar:8.3f}s | vetorizado: {batch * 1000:8.2f}ms "
+            f"| speedup: {scalar / batch:8.0f}x"
+        )
+        fixed = bench_implied_volatility(service, chain, initial_guess="fixed")
+        interpolated = bench_implied_volatility(service, chain)
+        fast = bench_implied_volatility(service, chain, fast=True)
+        print(
+            f"{n:>7} IVs      | chute fixo: {fixed * 1000:8.2f}ms | interpolado: {interpolated * 1000:8.2f}ms "
+            f"| rápido: {fast * 1000:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
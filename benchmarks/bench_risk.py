@@ -0,0 +1,92 @@
+"""
+Benchmark: reavaliação completa de cenários (cenários x pernas), Monte Carlo,
+superfície de PnL de estratégias e reotimização do portfolio sobre um
+universo de contratos
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Adiciona o diretório raiz e src ao PYTHONPATH
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
+
+from models.market_model import OptionContract
+from services.monte_carlo import MonteCarloEngine
+from services.payoff_engine import PayoffEngine
+from services.risk_service import RiskService
+from services.scenario_engine import ScenarioEngine, ScenarioLegs, ScenarioSet
+from utils.clock import SimulatedClock
+
+
+def make_legs(n: int, seed: int = 42) -> ScenarioLegs:
+    rng = np.random.default_rng(seed)
+    return ScenarioLegs(
+        spot=np.full(n, 45000.0),
+        strike=rng.uniform(30000.0, 60000.0, n),
+        time_to_expiry=rng.uniform(1 / 365, 1.0, n),
+        volatility=rng.uniform(0.3, 1.0, n),
+        is_call=rng.random(n) < 0.5,
+        quantity=rng.choice([-2.0, -1.0, 1.0, 2.0], n),
+    )
+
+
+def main() -> None:
+    engine = ScenarioEngine()
+    scenarios = ScenarioSet.grid(np.linspace(-0.5, 0.5, 41), np.linspace(-0.5, 1.0, 16), [0, 1, 7, 30])
+    for n_legs in (100, 1_000, 5_000):
+        legs = make_legs(n_legs)
+        start = time.perf_counter()
+        result = engine.revalue(legs, scenarios)
+        elapsed = time.perf_counter() - start
+        cells = result.pnl.size
+        print(
+            f"{len(scenarios):>6} cenários x {n_legs:>5} pernas | {elapsed:8.3f}s "
+            f"| {elapsed / cells * 1e9:6.1f} ns/reavaliação"
+        )
+
+    for n_legs in (10, 50):
+        legs = make_legs(n_legs)
+        start = time.perf_counter()
+        risk = MonteCarloEngine().value_at_risk(legs, n_paths=1_000_000, seed=42, jump_intensity=5.0,
+                                                jump_mean=-0.02, jump_std=0.04)
+        elapsed = time.perf_counter() - start
+        print(
+            f"1M caminhos x {n_legs:>5} pernas | {elapsed:8.3f}s | VaR 95%: {risk.value_at_risk:12.2f} "
+            f"[{risk.var_interval[0]:.2f}, {risk.var_interval[1]:.2f}]"
+        )
+
+    payoff = PayoffEngine()
+    grid = np.linspace(20000.0, 70000.0, 10_000)
+    for n_legs in (4, 48):
+        legs = make_legs(n_legs)
+        start = time.perf_counter()
+        surface = payoff.surface(legs, grid, days=[0, 7, 30], vol_shifts=[-0.2, 0.0, 0.2])
+        elapsed = time.perf_counter() - start
+        print(f"superfície de PnL {surface.pnl.size:>6} pontos x {n_legs:>3} pernas | {elapsed * 1e3:7.1f} ms")
+
+    now = datetime(2030, 1, 1)
+    rng = np.random.default_rng(7)
+    universe = [
+        OptionContract("BTC", float(k), now + timedelta(days=int(d)), f"BTC-{i}", "BTC", bool(c))
+        for i, (k, d, c) in enumerate(zip(rng.choice(np.arange(20000, 80001, 1000), 2000),
+                                          rng.choice([7, 14, 30, 60, 90, 180], 2000),
+                                          rng.integers(0, 2, 2000)))
+    ]
+    risk = RiskService(clock=SimulatedClock(now))
+    book = None
+    for target in (0.2, 0.3, 0.25, 0.5):
+        start = time.perf_counter()
+        book = risk.optimize_portfolio(universe, target, max_vega=50.0, max_theta=-20.0, budget=10000.0,
+                                       spot_price=45000.0, volatility=0.6, current_positions=book)
+        elapsed = time.perf_counter() - start
+        status = "ok" if elapsed < 0.1 else "acima da meta de 100 ms"
+        print(f"otimização 2000 contratos | delta alvo {target:4.2f} | {elapsed * 1e3:7.1f} ms | {len(book)} posições | {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,19 @@ import webbrowser
 import time
 import platform
 
-# Adiciona o diretório raiz ao PYTHONPATH
+import numpy as np
+
+# Adiciona o diretório raiz e src ao PYTHONPATH
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
 
-from src.services.ccxt_service import CCXTService
-from src.services.strategy_service import StrategyService
-from src.services.risk_service import RiskService
-from src.web.app import app
-from src.models.market_model import OptionContract
+from services.ccxt_service import CCXTService
+from services.strategy_service import StrategyService
+from services.risk_service import RiskService
+from services.payoff_engine import expiry_payoff
+from web.app import app
+from models.market_model import OptionContract
 
 
 async def setup_strategy():
@@ -74,26 +78,29 @@ async def setup_strategy():
         )
 
         # Atualiza variáveis globais do dashboard
-        from src.web.app import positions as dash_positions
-        from src.web.app import risk_metrics as dash_risk_metrics
+        from web.app import positions as dash_positions
+        from web.app import risk_metrics as dash_risk_metrics
+
+        # Payoffs no vencimento calculados de uma vez sobre a grade, prontos para plotar
+        price_grid = np.linspace(spot_price * 0.7, spot_price * 1.3, 1000)
+
+        def strategy_payoff(contracts, quantity, net_cost):
+            strikes = [c.strike_price for c in contracts]
+            return expiry_payoff(price_grid, strikes, [c.is_call for c in contracts], quantity) - net_cost
 
         dash_positions.extend(
             [
                 {
                     "name": "Bull Call Spread",
-                    "strike": bull_spread_options[0].strike,
-                    "calc_payoff": lambda x: max(0, x - bull_spread_options[0].strike)
-                    - max(0, x - bull_spread_options[1].strike)
-                    - bull_metrics["net_cost"],
+                    "strike": bull_spread_options[0].strike_price,
+                    "spot": price_grid,
+                    "payoff": strategy_payoff(bull_spread_options, [1, -1], bull_metrics["net_cost"]),
                 },
                 {
                     "name": "Iron Condor",
-                    "strike": iron_condor_options[0].strike,
-                    "calc_payoff": lambda x: max(0, iron_condor_options[0].strike - x)
-                    - max(0, iron_condor_options[1].strike - x)
-                    - max(0, x - iron_condor_options[2].strike)
-                    + max(0, x - iron_condor_options[3].strike)
-                    + condor_metrics["net_credit"],
+                    "strike": iron_condor_options[0].strike_price,
+                    "spot": price_grid,
+                    "payoff": strategy_payoff(iron_condor_options, [1, -1, -1, 1], condor_metrics["net_cost"]),
                 },
             ]
         )
@@ -5,15 +5,16 @@ import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Adiciona o diretório raiz ao PYTHONPATH
+# Adiciona o diretório raiz e src ao PYTHONPATH
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
 
-from src.services.ccxt_service import CCXTService
-from src.services.strategy_service import StrategyService
-from src.services.risk_service import RiskService
-from src.services.visualization_service import VisualizationService
-from src.models.market_model import OptionContract
+from services.ccxt_service import CCXTService
+from services.strategy_service import StrategyService
+from services.risk_service import RiskService
+from services.visualization_service import VisualizationService
+from models.market_model import OptionContract
 
 
 async def main():
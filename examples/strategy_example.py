@@ -7,14 +7,17 @@ import numpy as np
 import sys
 from pathlib import Path
 
-# Adiciona o diretório raiz ao PYTHONPATH
+# Adiciona o diretório raiz e src ao PYTHONPATH
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / "src"))
 
-from src.services.ccxt_service import CCXTService
-from src.services.strategy_service import StrategyService
-from src.services.visualization_service import VisualizationService
-from src.models.market_model import OptionAnalysis, OptionContract
+from services.ccxt_service import CCXTService
+from services.strategy_service import StrategyService
+from services.visualization_service import VisualizationService
+from services.payoff_engine import PayoffEngine
+from services.scenario_engine import ScenarioLegs
+from models.market_model import OptionAnalysis, OptionContract
 
 
 async def main():
@@ -65,17 +68,13 @@ async def main():
         # Plota os gráficos para cada estratégia
         print("\nGerando visualizações...")
 
-        await viz_service.plot_option_payoff(
-            analysis=OptionAnalysis(
-                contract=options[0],
-                greeks=metrics["greeks"],
-                implied_volatility=0.5,
-                theoretical_price=metrics["net_cost"],
-                extrinsic_value=metrics["net_cost"],
-                intrinsic_value=0,
-            ),
-            price_range=(spot_price * 0.5, spot_price * 1.5),
+        legs = ScenarioLegs.from_positions(
+            options, spot_price, datetime.now(), strategy_service.default_volatility, [1, -1]
         )
+        surface = PayoffEngine().surface(
+            legs, np.linspace(spot_price * 0.5, spot_price * 1.5, 1000), days=[0, 15]
+        )
+        viz_service.plot_strategy_pnl(surface).show()
 
     except Exception as error:
         print(f"Erro na execução: {error}")
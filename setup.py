@@ -8,7 +8,7 @@ setup(
         "ccxt>=4.0.0",
         "numpy>=1.21.0",
         "pandas>=1.3.0",
-        "scipy>=1.7.0",
+        "scipy>=1.9.0",
         "plotly>=5.3.0",
         "python-dotenv>=0.19.0",
         "pytest>=6.2.5",
@@ -8,26 +8,31 @@ from services.ccxt_service import CCXTService
 from services.analysis_service import AnalysisService
 from services.visualization_service import VisualizationService
 from models.market_model import OptionContract, OptionAnalysis
+from utils.clock import Clock, SystemClock
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class App:
-    def __init__(self, simulation_mode: bool = True) -> None:
+    def __init__(self, simulation_mode: bool = True, clock: Optional[Clock] = None,
+                 figure_dir: Optional[str] = None) -> None:
         if platform.system() == 'Windows':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
             
+        self.clock = clock or SystemClock()
         self.ccxt_service = CCXTService(simulation_mode=simulation_mode)
-        self.analysis_service = AnalysisService()
+        self.analysis_service = AnalysisService(clock=self.clock)
         self.visualization_service = VisualizationService()
+        # Com figure_dir, as figuras são gravadas em HTML em vez de abertas no navegador
+        self.figure_dir = figure_dir
         
     async def main(self) -> None:
         try:
             logger.info("Iniciando aplicação...")
             # Exemplo de uso do sistema
             symbol = "BTC/USD"
-            expiry = datetime.now() + timedelta(days=30)
+            expiry = self.clock.now() + timedelta(days=30)
             
             logger.info(f"Buscando dados de opções para {symbol}")
             options_data = await self.ccxt_service.fetch_options_data(symbol, expiry)
@@ -58,15 +63,20 @@ class App:
             
             logger.info("Realizando análise das opções")
             analysis_results: Dict[str, OptionAnalysis] = {}
+            # Um único instante de avaliação e uma única busca de preço por ativo para toda a cadeia
+            valuation_time = self.clock.now()
+            spot_prices = await self.ccxt_service.get_underlying_prices(option.underlying for option in options)
+            for underlying, spot_price in spot_prices.items():
+                logger.info(f"Preço spot para {underlying}: {spot_price}")
             for option in options:
                 try:
-                    spot_price = await self.ccxt_service.get_underlying_price(option.underlying)
-                    logger.info(f"Preço spot para {option.underlying}: {spot_price}")
+                    time_to_expiry = option.time_to_expiry_at(valuation_time)
+                    spot_price = spot_prices[option.underlying]
                     
                     implied_vol = self.analysis_service.calculate_implied_volatility(
                         strike=option.strike_price,
                         spot=spot_price,
-                        time_to_expiry=option.time_to_expiry,
+                        time_to_expiry=time_to_expiry,
                         is_call=option.is_call
                     )
                     logger.info(f"Volatilidade implícita calculada: {implied_vol:.2%}")
@@ -74,7 +84,7 @@ class App:
                     greeks = self.analysis_service.calculate_greeks(
                         spot=spot_price,
                         strike=option.strike_price,
-                        time_to_expiry=option.time_to_expiry,
+                        time_to_expiry=time_to_expiry,
                         volatility=implied_vol,
                         is_call=option.is_call
                     )
@@ -105,16 +115,19 @@ class App:
             if analysis_results:
                 logger.info("Gerando visualizações")
                 
-                # Gera o smile de volatilidade primeiro
-                self.visualization_service.plot_volatility_surface(options, analysis_results)
-                
-                # Gera os Greeks em seguida
-                self.visualization_service.plot_greeks_surface(options, analysis_results)
-                
-                # Por fim, gera o payoff da primeira opção
+                figures = {
+                    'volatility_smile': self.visualization_service.plot_volatility_surface(options, analysis_results),
+                    'greeks': self.visualization_service.plot_greeks_surface(options, analysis_results),
+                }
                 if options:
                     price_range = (options[0].strike_price * 0.5, options[0].strike_price * 1.5)
-                    self.visualization_service.plot_option_payoff(options[0], price_range, analysis_results)
+                    figures['payoff'] = self.visualization_service.plot_option_payoff(options[0], price_range, analysis_results)
+
+                if self.figure_dir:
+                    self.visualization_service.export_figures(figures, self.figure_dir, 'html')
+                else:
+                    for figure in figures.values():
+                        figure.show()  # type: ignore[union-attr]
                     
                 logger.info("Visualizações geradas com sucesso")
                 
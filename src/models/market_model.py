@@ -1,6 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import Optional, Literal
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Literal, Sequence
+
+import numpy as np
 
 
 @dataclass
@@ -17,7 +20,12 @@ class OptionContract:
     
     @property
     def time_to_expiry(self) -> float:
-        now = datetime.now()
+        return self.time_to_expiry_at(datetime.now())
+    
+    def time_to_expiry_at(self, now: datetime) -> float:
+        """
+        Tempo até o vencimento em anos a partir de um instante de avaliação fixo
+        """
         return (self.expiry - now).total_seconds() / (365 * 24 * 60 * 60)
 
 
@@ -48,3 +56,199 @@ class Exchange:
     api_key: Optional[str] = None
     secret: Optional[str] = None
     testnet: bool = False
+
+
+_CHAIN_FLOAT_COLUMNS = (
+    'strike', 'price', 'volume', 'open_interest',
+    'implied_volatility', 'theoretical_price', 'intrinsic_value', 'extrinsic_value',
+    'delta', 'gamma', 'theta', 'vega', 'rho'
+)
+_CHAIN_GREEKS = ('delta', 'gamma', 'theta', 'vega', 'rho')
+
+
+@dataclass(eq=False)
+class OptionChain:
+    """
+    Cadeia de opções em formato colunar: um array NumPy por campo.
+
+    As linhas ficam ordenadas por (calls primeiro, vencimento, strike), de modo
+    que calls, puts e cada vencimento de um mesmo tipo são fatias contíguas e
+    podem ser expostos como views sem cópia. Colunas de análise (IV, preço
+    teórico e Greeks) começam como NaN até serem preenchidas pelo
+    AnalysisService.
+    """
+    contract_id: np.ndarray
+    symbol: np.ndarray
+    underlying: np.ndarray
+    expiry: np.ndarray  # datetime64[ms]
+    is_call: np.ndarray
+    strike: np.ndarray
+    price: np.ndarray
+    volume: np.ndarray
+    open_interest: np.ndarray
+    implied_volatility: np.ndarray
+    theoretical_price: np.ndarray
+    intrinsic_value: np.ndarray
+    extrinsic_value: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+    rho: np.ndarray
+
+    @classmethod
+    def from_arrays(cls, contract_id: Sequence[str], underlying: Sequence[str], expiry: Sequence[Any],
+                    is_call: Sequence[bool], strike: Sequence[float], price: Optional[Sequence[float]] = None,
+                    symbol: Optional[Sequence[str]] = None, **columns: Sequence[float]) -> 'OptionChain':
+        """
+        Monta a cadeia a partir de colunas, ordenando-as no layout canônico
+        """
+        contract_ids = np.asarray(contract_id, dtype=str)
+        n = contract_ids.size
+        data: Dict[str, np.ndarray] = {
+            'contract_id': contract_ids,
+            'symbol': np.asarray(symbol if symbol is not None else contract_ids, dtype=str),
+            'underlying': np.asarray(underlying, dtype=str),
+            'expiry': np.asarray(expiry, dtype='datetime64[ms]'),
+            'is_call': np.asarray(is_call, dtype=bool),
+        }
+        for name in _CHAIN_FLOAT_COLUMNS:
+            values = price if name == 'price' else (strike if name == 'strike' else columns.pop(name, None))
+            default = 0.0 if name in ('price', 'volume', 'open_interest') else np.nan
+            data[name] = np.full(n, default) if values is None else np.asarray(values, dtype=np.float64)
+        if columns:
+            raise TypeError(f"Colunas desconhecidas: {sorted(columns)}")
+
+        # Calls primeiro, depois vencimento e strike
+        order = np.lexsort((data['strike'], data['expiry'], ~data['is_call']))
+        return cls(**{name: np.ascontiguousarray(values[order]) for name, values in data.items()})
+
+    @classmethod
+    def from_contracts(cls, contracts: Sequence[OptionContract],
+                       analysis: Optional[Dict[str, OptionAnalysis]] = None) -> 'OptionChain':
+        columns: Dict[str, List[float]] = {}
+        if analysis:
+            results = [analysis.get(c.contract_id) for c in contracts]
+            columns['implied_volatility'] = [r.implied_volatility if r else np.nan for r in results]
+            columns['theoretical_price'] = [r.theoretical_price if r else np.nan for r in results]
+            columns['intrinsic_value'] = [r.intrinsic_value if r else np.nan for r in results]
+            columns['extrinsic_value'] = [r.extrinsic_value if r else np.nan for r in results]
+            for greek in _CHAIN_GREEKS:
+                columns[greek] = [r.greeks.get(greek, np.nan) if r else np.nan for r in results]
+        return cls.from_arrays(
+            contract_id=[c.contract_id for c in contracts],
+            symbol=[c.symbol for c in contracts],
+            underlying=[c.underlying for c in contracts],
+            expiry=[c.expiry for c in contracts],
+            is_call=[c.is_call for c in contracts],
+            strike=[c.strike_price for c in contracts],
+            price=[c.current_price for c in contracts],
+            volume=[c.volume for c in contracts],
+            open_interest=[c.open_interest for c in contracts],
+            **columns
+        )
+
+    def to_contracts(self) -> List[OptionContract]:
+        expiries = self.expiry.astype(datetime)
+        return [
+            OptionContract(
+                symbol=str(self.symbol[i]),
+                strike_price=float(self.strike[i]),
+                expiry=expiries[i],
+                contract_id=str(self.contract_id[i]),
+                underlying=str(self.underlying[i]),
+                is_call=bool(self.is_call[i]),
+                current_price=float(self.price[i]),
+                volume=float(self.volume[i]),
+                open_interest=float(self.open_interest[i])
+            )
+            for i in range(len(self))
+        ]
+
+    def to_analysis(self) -> Dict[str, OptionAnalysis]:
+        """
+        Converte as colunas de análise para o formato Dict[contract_id, OptionAnalysis]
+        """
+        results: Dict[str, OptionAnalysis] = {}
+        for i, contract in enumerate(self.to_contracts()):
+            results[contract.contract_id] = OptionAnalysis(
+                contract=contract,
+                implied_volatility=float(self.implied_volatility[i]),
+                theoretical_price=float(self.theoretical_price[i]),
+                intrinsic_value=float(self.intrinsic_value[i]),
+                extrinsic_value=float(self.extrinsic_value[i]),
+                greeks={greek: float(getattr(self, greek)[i]) for greek in _CHAIN_GREEKS}
+            )
+        return results
+
+    def __len__(self) -> int:
+        return int(self.strike.size)
+
+    def _view(self, rows: slice) -> 'OptionChain':
+        return OptionChain(**{f.name: getattr(self, f.name)[rows] for f in fields(self)})
+
+    def take(self, indices: np.ndarray) -> 'OptionChain':
+        """
+        Cópia com as linhas indicadas, na ordem dada (não preserva o layout canônico)
+        """
+        return OptionChain(**{f.name: getattr(self, f.name)[indices] for f in fields(self)})
+
+    @property
+    def n_calls(self) -> int:
+        # is_call está ordenado com True primeiro
+        return int(np.count_nonzero(self.is_call))
+
+    @property
+    def calls(self) -> 'OptionChain':
+        return self._view(slice(0, self.n_calls))
+
+    @property
+    def puts(self) -> 'OptionChain':
+        return self._view(slice(self.n_calls, len(self)))
+
+    @property
+    def expiries(self) -> np.ndarray:
+        return np.unique(self.expiry)
+
+    def select(self, is_call: bool, expiry: Any) -> 'OptionChain':
+        """
+        View sem cópia dos contratos de um tipo e vencimento, ordenados por strike
+        """
+        side = self.calls if is_call else self.puts
+        target = np.datetime64(expiry, 'ms')
+        start = int(np.searchsorted(side.expiry, target, side='left'))
+        end = int(np.searchsorted(side.expiry, target, side='right'))
+        return side._view(slice(start, end))
+
+    @cached_property
+    def strike_index(self) -> np.ndarray:
+        """
+        Índices que ordenam a cadeia inteira por strike (e vencimento),
+        calculados uma vez por instância: strikes e vencimentos são fixos
+        desde a construção, só as colunas de análise são preenchidas depois
+        """
+        index = np.lexsort((self.expiry, self.strike))
+        index.flags.writeable = False
+        return index
+
+    def nearest_strike(self, strike: float) -> int:
+        """
+        Posição do contrato com strike mais próximo; use sobre views de
+        `select`, cujos strikes estão ordenados
+        """
+        if len(self) == 0:
+            raise ValueError("Cadeia vazia")
+        i = int(np.searchsorted(self.strike, strike))
+        if i == len(self) or (i > 0 and strike - self.strike[i - 1] <= self.strike[i] - strike):
+            return i - 1
+        return i
+
+    def greeks_matrix(self) -> np.ndarray:
+        """
+        Greeks como matriz (n_contratos x 5) na ordem delta, gamma, theta, vega, rho
+        """
+        return np.column_stack([getattr(self, greek) for greek in _CHAIN_GREEKS])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, f.name).nbytes for f in fields(self))
@@ -1,10 +1,58 @@
 import numpy as np
 import pandas as pd
-from src.models.market_model import OptionContract
+from numpy.typing import ArrayLike
+from models.market_model import OptionContract, OptionChain
 from typing import Dict, Any, Optional
 from scipy.stats import norm
-from dataclasses import dataclass
+from scipy.special import ndtr
+from dataclasses import dataclass, replace
 from datetime import datetime
+from services.greeks_cache import GreeksCache
+from utils.clock import Clock, SystemClock, year_fraction
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+# Grade da tabela inversa de volatilidade total: sqrt(|ln-moneyness|) x ln(preço normalizado).
+# A raiz adensa a grade perto do dinheiro, onde vencimentos curtos têm σ√T pequeno
+_IV_TABLE_MAX_MONEYNESS = 3.0
+_IV_TABLE_MIN_LOG_PRICE = -30.0
+_IV_TABLE_SHAPE = (201, 400)
+_iv_table: Optional[np.ndarray] = None
+
+
+def _build_total_volatility_table() -> np.ndarray:
+    # Preço normalizado da opção fora do dinheiro em uma grade fina de σ√T,
+    # invertido linha a linha para uma grade regular de ln(preço)
+    n_moneyness, n_price = _IV_TABLE_SHAPE
+    x = -np.linspace(0.0, np.sqrt(_IV_TABLE_MAX_MONEYNESS), n_moneyness)[:, None] ** 2
+    total_vol = np.geomspace(1e-4, 12.0, 4096)
+    w = total_vol[None, :]
+    normalized = ndtr(x / w + w / 2) - np.exp(-x) * ndtr(x / w - w / 2)
+    normalized = np.maximum.accumulate(np.maximum(normalized, 1e-300), axis=1)
+    log_price = np.log(normalized)
+    price_grid = np.linspace(_IV_TABLE_MIN_LOG_PRICE, 0.0, n_price)
+    log_total_vol = np.log(total_vol)
+    return np.stack([np.interp(price_grid, row, log_total_vol) for row in log_price])
+
+
+def _interpolate_total_volatility(abs_log_moneyness: np.ndarray, log_price: np.ndarray) -> np.ndarray:
+    global _iv_table
+    if _iv_table is None:
+        _iv_table = _build_total_volatility_table()
+    n_moneyness, n_price = _IV_TABLE_SHAPE
+    
+    fi = np.clip(np.sqrt(abs_log_moneyness / _IV_TABLE_MAX_MONEYNESS) * (n_moneyness - 1), 0, n_moneyness - 1 - 1e-9)
+    fj = np.clip((log_price / -_IV_TABLE_MIN_LOG_PRICE + 1.0) * (n_price - 1), 0, n_price - 1 - 1e-9)
+    i = fi.astype(np.intp)
+    j = fj.astype(np.intp)
+    u = fi - i
+    v = fj - j
+    table = _iv_table
+    log_total_vol = (
+        (1 - u) * (1 - v) * table[i, j] + u * (1 - v) * table[i + 1, j]
+        + (1 - u) * v * table[i, j + 1] + u * v * table[i + 1, j + 1]
+    )
+    return np.exp(log_total_vol)
 
 @dataclass
 class Greeks:
@@ -14,25 +62,68 @@ class Greeks:
     vega: float
     rho: float = 0.0
 
+@dataclass
+class GreeksBatch:
+    """
+    Preço e Greeks de uma cadeia inteira de contratos, um array por campo
+    """
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+    rho: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.price.size)
+
+    def greeks_at(self, index: int) -> Greeks:
+        return Greeks(
+            delta=float(self.delta[index]),
+            gamma=float(self.gamma[index]),
+            theta=float(self.theta[index]),
+            vega=float(self.vega[index]),
+            rho=float(self.rho[index])
+        )
+
+@dataclass
+class ImpliedVolatilityBatch:
+    """
+    Resultado do solver de volatilidade implícita para uma cadeia inteira
+    """
+    volatility: np.ndarray
+    converged: np.ndarray
+    iterations: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.volatility.size)
+
 class AnalysisService:
-    def __init__(self) -> None:
+    def __init__(self, cache: Optional[GreeksCache] = None, clock: Optional[Clock] = None) -> None:
         self.risk_free_rate = 0.05  # Taxa livre de risco padrão
+        self.cache = cache  # Opcional: memoiza preços e Greeks por entradas quantizadas
+        self.clock = clock or SystemClock()
+        self.min_volatility = 0.0001
+        self.max_volatility = 5.0
         
     def calculate_implied_volatility(self, strike: float, spot: float, time_to_expiry: float, is_call: bool) -> float:
         # Implementação do método de Newton-Raphson para calcular volatilidade implícita
         target_price = min(spot * 0.2, abs(spot - strike))  # Preço alvo mais realista
-        vol = 0.3  # Estimativa inicial mais conservadora
+        # Estimativa inicial pela aproximação tabelada, com 0.3 como reserva
+        guess = float(self.approximate_implied_volatility_batch(target_price, spot, strike, time_to_expiry, is_call))
+        vol = min(guess, 2.0) if np.isfinite(guess) else 0.3
         MAX_ITERATIONS = 100
         PRECISION = 0.00001
         
+        # As iterações não passam pelo cache para não poluí-lo com volatilidades intermediárias
         for i in range(MAX_ITERATIONS):
-            price = self._black_scholes_price(spot, strike, time_to_expiry, vol, is_call)
+            price = self._compute_black_scholes_price(spot, strike, time_to_expiry, vol, is_call)
             diff = target_price - price
             
             if abs(diff) < PRECISION:
                 return min(vol, 2.0)  # Limita a volatilidade máxima
                 
-            vega = self._calculate_vega(spot, strike, time_to_expiry, vol)
+            vega = self._compute_vega(spot, strike, time_to_expiry, vol)
             if abs(vega) < PRECISION:
                 return min(vol, 2.0)
                 
@@ -43,6 +134,14 @@ class AnalysisService:
     
     def calculate_greeks(self, spot: float, strike: float, time_to_expiry: float, 
                         volatility: float, is_call: bool) -> Greeks:
+        if self.cache is None:
+            return self._compute_greeks(spot, strike, time_to_expiry, volatility, is_call)
+        greeks = self.cache.compute('greeks', self._compute_greeks, spot, strike, time_to_expiry, volatility, is_call)
+        # Cópia para que o chamador não altere a instância compartilhada no cache
+        return replace(greeks)
+    
+    def _compute_greeks(self, spot: float, strike: float, time_to_expiry: float, 
+                        volatility: float, is_call: bool) -> Greeks:
         # Cálculo dos Greeks usando Black-Scholes
         if volatility <= 0:
             volatility = 0.0001
@@ -70,10 +169,280 @@ class AnalysisService:
         # Vega
         vega = float(spot * sqrt_t * norm.pdf(d1))
         
-        return Greeks(delta=delta, gamma=gamma, theta=theta, vega=vega)
+        # Rho
+        discounted_strike = strike * time_to_expiry * np.exp(-self.risk_free_rate * time_to_expiry)
+        if is_call:
+            rho = float(discounted_strike * norm.cdf(d2))
+        else:
+            rho = float(-discounted_strike * norm.cdf(-d2))
+        
+        return Greeks(delta=delta, gamma=gamma, theta=theta, vega=vega, rho=rho)
+    
+    def calculate_greeks_batch(self, spot: ArrayLike, strike: ArrayLike, time_to_expiry: ArrayLike,
+                               volatility: ArrayLike, is_call: ArrayLike) -> GreeksBatch:
+        """
+        Calcula preço e Greeks (incluindo rho) de vários contratos em uma única
+        passagem vetorizada. Os argumentos aceitam escalares ou arrays e seguem
+        as regras de broadcasting do NumPy.
+        """
+        spot, strike, t, vol, call = np.broadcast_arrays(
+            np.asarray(spot, dtype=np.float64),
+            np.asarray(strike, dtype=np.float64),
+            np.asarray(time_to_expiry, dtype=np.float64),
+            np.asarray(volatility, dtype=np.float64),
+            np.asarray(is_call, dtype=bool)
+        )
+        # Mesmas proteções do caminho escalar; contratos vencidos convergem para o valor intrínseco
+        vol = np.where(vol <= 0, 0.0001, vol)
+        t = np.maximum(t, 1e-10)
+        r = self.risk_free_rate
+        
+        sqrt_t = np.sqrt(t)
+        vol_sqrt_t = vol * sqrt_t
+        d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        
+        pdf_d1 = _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+        cdf_d1 = ndtr(d1)
+        cdf_d2 = ndtr(d2)
+        discount = np.exp(-r * t)
+        discounted_strike = strike * discount
+        
+        # Paridade put-call evita calcular N(-d1) e N(-d2) separadamente
+        call_price = spot * cdf_d1 - discounted_strike * cdf_d2
+        price = np.where(call, call_price, call_price - spot + discounted_strike)
+        delta = np.where(call, cdf_d1, cdf_d1 - 1.0)
+        gamma = pdf_d1 / (spot * vol_sqrt_t)
+        theta_term1 = -(spot * pdf_d1 * vol) / (2 * sqrt_t)
+        theta = np.where(
+            call,
+            theta_term1 - r * discounted_strike * cdf_d2,
+            theta_term1 + r * discounted_strike * (1.0 - cdf_d2)
+        )
+        vega = spot * sqrt_t * pdf_d1
+        rho = np.where(
+            call,
+            discounted_strike * t * cdf_d2,
+            -discounted_strike * t * (1.0 - cdf_d2)
+        )
+        
+        return GreeksBatch(price=price, delta=delta, gamma=gamma, theta=theta, vega=vega, rho=rho)
+
+    def calculate_price_batch(self, spot: ArrayLike, strike: ArrayLike, time_to_expiry: ArrayLike,
+                              volatility: ArrayLike, is_call: ArrayLike) -> np.ndarray:
+        """
+        Apenas o preço de Black-Scholes, com o mesmo broadcasting e as mesmas
+        proteções de calculate_greeks_batch. Usado na reavaliação de cenários,
+        onde as Greeks não são necessárias.
+        """
+        spot = np.asarray(spot, dtype=np.float64)
+        strike = np.asarray(strike, dtype=np.float64)
+        vol = np.asarray(volatility, dtype=np.float64)
+        vol = np.where(vol <= 0, 0.0001, vol)
+        t = np.maximum(np.asarray(time_to_expiry, dtype=np.float64), 1e-10)
+        r = self.risk_free_rate
+
+        vol_sqrt_t = vol * np.sqrt(t)
+        d1 = (np.log(spot / strike) + (r + 0.5 * vol * vol) * t) / vol_sqrt_t
+        discounted_strike = strike * np.exp(-r * t)
+        call_price = spot * ndtr(d1) - discounted_strike * ndtr(d1 - vol_sqrt_t)
+        return np.where(np.asarray(is_call, dtype=bool), call_price, call_price - spot + discounted_strike)
+
+    def calculate_implied_volatility_batch(self, option_price: ArrayLike, spot: ArrayLike, strike: ArrayLike,
+                                           time_to_expiry: ArrayLike, is_call: ArrayLike,
+                                           initial_volatility: Optional[ArrayLike] = None,
+                                           max_iterations: int = 20, tolerance: float = 1e-8,
+                                           bisection_iterations: int = 100,
+                                           initial_guess: str = 'interpolated',
+                                           fast: bool = False) -> ImpliedVolatilityBatch:
+        """
+        Resolve a volatilidade implícita de todos os contratos de uma vez a partir
+        dos preços observados. Usa passos de Halley protegidos por um intervalo
+        [min_volatility, max_volatility] e termina por bisseção os contratos que
+        não convergirem. `initial_volatility` permite partir das IVs do tick
+        anterior; onde ela não existe (NaN) a estimativa inicial vem de
+        `initial_guess`: 'interpolated' ou 'corrado_miller' (ver
+        approximate_implied_volatility_batch) ou 'fixed' (0.3). Preços fora dos
+        limites de arbitragem resultam em NaN com `converged=False`.
+        
+        Com `fast=True` retorna a aproximação seguida de um único passo de Halley,
+        sem bisseção. Para |ln(S/K)| <= 0.5, T entre 1 dia e 1 ano e vol entre
+        20% e 150%, partindo de 'interpolated' o erro absoluto fica abaixo de
+        1e-9 em vol para todo contrato com vega >= 1e-4 * spot; contratos com
+        vega menor (asas extremas) têm IV mal condicionada e podem errar em
+        mais de 1e-1. Partindo de 'corrado_miller' o erro nas asas chega a
+        dezenas de pontos percentuais. Nesse modo `converged` marca os contratos
+        cujo erro de preço ficou abaixo de `tolerance` após o passo.
+        """
+        price, spot, strike, t, call = np.broadcast_arrays(
+            np.asarray(option_price, dtype=np.float64),
+            np.asarray(spot, dtype=np.float64),
+            np.asarray(strike, dtype=np.float64),
+            np.maximum(np.asarray(time_to_expiry, dtype=np.float64), 1e-10),
+            np.asarray(is_call, dtype=bool)
+        )
+        shape = price.shape
+        price, spot, strike, t, call = (a.ravel() for a in (price, spot, strike, t, call))
+        n = price.size
+        
+        if initial_guess in ('interpolated', 'corrado_miller'):
+            vol = self.approximate_implied_volatility_batch(price, spot, strike, t, call, method=initial_guess)
+            vol = np.where(np.isfinite(vol), vol, 0.3)
+        elif initial_guess == 'fixed':
+            vol = np.full(n, 0.3)
+        else:
+            raise ValueError(f"Estimativa inicial desconhecida: {initial_guess}")
+        if initial_volatility is not None:
+            guess = np.broadcast_to(np.asarray(initial_volatility, dtype=np.float64), shape).ravel()
+            vol = np.where(np.isfinite(guess) & (guess > 0), guess, vol)
+        vol = np.clip(vol, self.min_volatility, self.max_volatility)
+        
+        lower = np.full(n, self.min_volatility)
+        upper = np.full(n, self.max_volatility)
+        converged = np.zeros(n, dtype=bool)
+        iterations = np.zeros(n, dtype=np.int64)
+        
+        # Preços abaixo do valor intrínseco descontado ou acima do limite superior não têm IV
+        discounted_strike = strike * np.exp(-self.risk_free_rate * t)
+        lower_bound = np.where(call, np.maximum(spot - discounted_strike, 0.0), np.maximum(discounted_strike - spot, 0.0))
+        upper_bound = np.where(call, spot, discounted_strike)
+        valid = np.isfinite(price) & (price > lower_bound) & (price < upper_bound)
+        
+        active = np.flatnonzero(valid)
+        if fast:
+            max_iterations, bisection_iterations = 1, 0
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            iterations[active] += 1
+            s, k, tt, c, v = spot[active], strike[active], t[active], call[active], vol[active]
+            model_price, vega, vomma = self._price_vega_vomma_batch(s, k, tt, v, c)
+            diff = model_price - price[active]
+            
+            done = np.abs(diff) < tolerance
+            converged[active[done]] = True
+            
+            # O preço é crescente na volatilidade: o sinal do erro estreita o intervalo
+            upper[active] = np.where(diff > 0, v, upper[active])
+            lower[active] = np.where(diff < 0, v, lower[active])
+            
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                newton_step = diff / vega
+                halley_denominator = 1.0 - 0.5 * newton_step * vomma / vega
+                step = np.where(np.abs(halley_denominator) > 0.5, newton_step / halley_denominator, newton_step)
+                candidate = v - step
+            
+            lo, hi = lower[active], upper[active]
+            outside = ~np.isfinite(candidate) | (candidate <= lo) | (candidate >= hi)
+            vol[active] = np.where(done, v, np.where(outside, 0.5 * (lo + hi), candidate))
+            active = active[~done]
+        
+        if fast and active.size:
+            model_price, _, _ = self._price_vega_vomma_batch(
+                spot[active], strike[active], t[active], vol[active], call[active]
+            )
+            converged[active] = np.abs(model_price - price[active]) < tolerance
+            active = active[:0]
+        
+        # Bisseção para os contratos que o Halley não resolveu
+        if active.size:
+            s, k, tt, c, p = spot[active], strike[active], t[active], call[active], price[active]
+            lo, hi = lower[active], upper[active]
+            mid = 0.5 * (lo + hi)
+            pending = np.ones(active.size, dtype=bool)
+            for _ in range(bisection_iterations):
+                mid = 0.5 * (lo + hi)
+                model_price, _, _ = self._price_vega_vomma_batch(s, k, tt, mid, c)
+                diff = model_price - p
+                iterations[active[pending]] += 1
+                pending &= ~(np.abs(diff) < tolerance)
+                if not pending.any():
+                    break
+                hi = np.where(pending & (diff > 0), mid, hi)
+                lo = np.where(pending & (diff < 0), mid, lo)
+            vol[active] = mid
+            converged[active] = ~pending
+        
+        vol[~valid] = np.nan
+        return ImpliedVolatilityBatch(
+            volatility=vol.reshape(shape),
+            converged=converged.reshape(shape),
+            iterations=iterations.reshape(shape)
+        )
+    
+    def approximate_implied_volatility_batch(self, option_price: ArrayLike, spot: ArrayLike, strike: ArrayLike,
+                                             time_to_expiry: ArrayLike, is_call: ArrayLike,
+                                             method: str = 'interpolated') -> np.ndarray:
+        """
+        Aproximação da volatilidade implícita sem iterações.
+        
+        'interpolated': em coordenadas normalizadas (x = ln(S/K·e^{rT}), preço
+        fora do dinheiro dividido por min(S, K·e^{-rT})) a IV total σ√T depende
+        só de duas variáveis. A inversa é tabelada uma única vez e consultada
+        por interpolação bilinear, com erro mediano ~1e-4 em vol.
+        
+        'corrado_miller': fórmula fechada de Corrado-Miller, precisa perto do
+        dinheiro e grosseira nas asas. Quando o discriminante fica negativo ele
+        é truncado em zero (Brenner-Subrahmanyam no dinheiro).
+        
+        Contratos sem aproximação válida retornam NaN.
+        """
+        price, spot, strike, t, call = np.broadcast_arrays(
+            np.asarray(option_price, dtype=np.float64),
+            np.asarray(spot, dtype=np.float64),
+            np.asarray(strike, dtype=np.float64),
+            np.maximum(np.asarray(time_to_expiry, dtype=np.float64), 1e-10),
+            np.asarray(is_call, dtype=bool)
+        )
+        discounted_strike = strike * np.exp(-self.risk_free_rate * t)
+        call_price = np.where(call, price, price + spot - discounted_strike)
+        
+        if method == 'interpolated':
+            log_moneyness = np.log(spot / discounted_strike)
+            # Usa sempre a opção fora do dinheiro, obtida pela paridade put-call
+            otm_price = np.where(log_moneyness <= 0, call_price, call_price - spot + discounted_strike)
+            normalized = otm_price / np.minimum(spot, discounted_strike)
+            valid = normalized > 0
+            total_vol = _interpolate_total_volatility(
+                np.abs(log_moneyness), np.log(np.where(valid, normalized, 1.0))
+            )
+            vol = np.where(valid, total_vol, np.nan) / np.sqrt(t)
+        elif method == 'corrado_miller':
+            forward_gap = spot - discounted_strike
+            half_gap = call_price - 0.5 * forward_gap
+            discriminant = np.maximum(half_gap * half_gap - forward_gap * forward_gap / np.pi, 0.0)
+            vol_sqrt_t = np.sqrt(2.0 * np.pi) / (spot + discounted_strike) * (half_gap + np.sqrt(discriminant))
+            vol = vol_sqrt_t / np.sqrt(t)
+        else:
+            raise ValueError(f"Método de aproximação desconhecido: {method}")
+        
+        with np.errstate(invalid='ignore'):
+            return np.where(vol > 0, np.clip(vol, self.min_volatility, self.max_volatility), np.nan)
+    
+    def _price_vega_vomma_batch(self, spot: np.ndarray, strike: np.ndarray, time_to_expiry: np.ndarray,
+                                volatility: np.ndarray, is_call: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Versão enxuta de calculate_greeks_batch para o solver de IV
+        r = self.risk_free_rate
+        sqrt_t = np.sqrt(time_to_expiry)
+        vol_sqrt_t = volatility * sqrt_t
+        d1 = (np.log(spot / strike) + (r + 0.5 * volatility * volatility) * time_to_expiry) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        discounted_strike = strike * np.exp(-r * time_to_expiry)
+        call_price = spot * ndtr(d1) - discounted_strike * ndtr(d2)
+        price = np.where(is_call, call_price, call_price - spot + discounted_strike)
+        vega = spot * sqrt_t * _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+        vomma = vega * d1 * d2 / volatility
+        return price, vega, vomma
     
     def _black_scholes_price(self, spot: float, strike: float, time_to_expiry: float, 
                           volatility: float, is_call: bool) -> float:
+        if self.cache is None:
+            return self._compute_black_scholes_price(spot, strike, time_to_expiry, volatility, is_call)
+        return float(self.cache.compute('price', self._compute_black_scholes_price,
+                                        spot, strike, time_to_expiry, volatility, is_call))
+    
+    def _compute_black_scholes_price(self, spot: float, strike: float, time_to_expiry: float, 
+                                     volatility: float, is_call: bool) -> float:
         sqrt_t = np.sqrt(time_to_expiry)
         d1 = (np.log(spot/strike) + (self.risk_free_rate + 0.5 * volatility**2) * time_to_expiry) / (volatility * sqrt_t)
         d2 = d1 - volatility * sqrt_t
@@ -87,10 +456,51 @@ class AnalysisService:
     
     def _calculate_vega(self, spot: float, strike: float, time_to_expiry: float, 
                      volatility: float) -> float:
+        if self.cache is None:
+            return self._compute_vega(spot, strike, time_to_expiry, volatility)
+        return float(self.cache.compute('vega', lambda s, k, t, v, _: self._compute_vega(s, k, t, v),
+                                        spot, strike, time_to_expiry, volatility, True))
+    
+    def _compute_vega(self, spot: float, strike: float, time_to_expiry: float, 
+                      volatility: float) -> float:
         sqrt_t = np.sqrt(time_to_expiry)
         d1 = (np.log(spot/strike) + (self.risk_free_rate + 0.5 * volatility**2) * time_to_expiry) / (volatility * sqrt_t)
         return float(spot * sqrt_t * norm.pdf(d1))
     
-    def _calculate_time_to_expiry(self, expiry: datetime) -> float:
-        now = datetime.now()
-        return (expiry - now).total_seconds() / (365 * 24 * 60 * 60)
+    def analyze_chain(self, chain: OptionChain, spot: ArrayLike,
+                      volatility: Optional[ArrayLike] = None, fast: bool = False,
+                      valuation_time: Optional[datetime] = None) -> OptionChain:
+        """
+        Analisa uma cadeia colunar inteira, preenchendo in-place IV, preço
+        teórico, valores intrínseco/extrínseco e Greeks. Sem `volatility`, a IV
+        é resolvida a partir de `chain.price`, partindo das IVs já presentes na
+        cadeia (tick anterior). Views de calls/puts compartilham memória com a
+        cadeia de origem, que também é atualizada. Todos os contratos usam o
+        mesmo instante de avaliação (`valuation_time` ou o relógio do serviço).
+        """
+        now = valuation_time or self.clock.now()
+        time_to_expiry = year_fraction(chain.expiry, now)
+        spot = np.broadcast_to(np.asarray(spot, dtype=np.float64), chain.strike.shape)
+        
+        if volatility is None:
+            solved = self.calculate_implied_volatility_batch(
+                chain.price, spot, chain.strike, time_to_expiry, chain.is_call,
+                initial_volatility=chain.implied_volatility, fast=fast
+            )
+            chain.implied_volatility[:] = solved.volatility
+        else:
+            chain.implied_volatility[:] = volatility
+        
+        batch = self.calculate_greeks_batch(spot, chain.strike, time_to_expiry, chain.implied_volatility, chain.is_call)
+        chain.theoretical_price[:] = batch.price
+        for greek in ('delta', 'gamma', 'theta', 'vega', 'rho'):
+            getattr(chain, greek)[:] = getattr(batch, greek)
+        
+        chain.intrinsic_value[:] = np.where(
+            chain.is_call, np.maximum(spot - chain.strike, 0.0), np.maximum(chain.strike - spot, 0.0)
+        )
+        chain.extrinsic_value[:] = chain.price - chain.intrinsic_value
+        return chain
+    
+    def _calculate_time_to_expiry(self, expiry: datetime, now: Optional[datetime] = None) -> float:
+        return year_fraction(expiry, now or self.clock.now())
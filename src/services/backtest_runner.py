@@ -0,0 +1,190 @@
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from models.market_model import MarketData
+from services.backtest_service import BacktestResult, BacktestService, CandleArrays, as_candle_arrays
+
+# Candles mapeados pelo processo worker; preenchido pelo initializer do pool
+_worker_candles: Optional[CandleArrays] = None
+
+
+@dataclass
+class WalkForwardFold:
+    fold: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def parameter_grid(grid: Mapping[str, Iterable[Any]]) -> List[Dict[str, Any]]:
+    """
+    Produto cartesiano de um dicionário {parâmetro: valores}
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(list(grid[name]) for name in names))]
+
+
+def walk_forward_folds(n: int, train_size: int, test_size: int,
+                       step: Optional[int] = None) -> List[WalkForwardFold]:
+    """
+    Janelas consecutivas de treino seguidas de teste; por padrão avançam o
+    tamanho do teste, de modo que os períodos de teste não se sobrepõem
+    """
+    if train_size <= 0 or test_size <= 0:
+        raise ValueError("train_size e test_size devem ser positivos")
+    step = step or test_size
+    folds = []
+    start = 0
+    while start + train_size + test_size <= n:
+        train_end = start + train_size
+        folds.append(WalkForwardFold(len(folds), start, train_end, train_end, train_end + test_size))
+        start += step
+    return folds
+
+
+def _init_worker(directory: str) -> None:
+    global _worker_candles
+    _worker_candles = CandleArrays.load(directory, mmap=True)
+
+
+def _run_task(strategy_fn: Callable[..., Any], mode: str, initial_capital: float,
+              params: Dict[str, Any], start: int, end: int,
+              candles: Optional[CandleArrays] = None) -> Dict[str, Any]:
+    """
+    Executa um backtest sobre os candles [start, end) com uma instância nova
+    do BacktestService. Só os parâmetros e os índices trafegam entre processos.
+    """
+    arrays = (candles if candles is not None else _worker_candles)
+    if arrays is None:
+        raise RuntimeError("Worker sem candles mapeados")
+    window = arrays.slice(start, end)
+    service = BacktestService()
+    service.initial_capital = initial_capital
+    service.reset()
+
+    result: BacktestResult
+    if mode == 'vectorized':
+        result = service.run_vectorized_backtest(window, strategy_fn(window, **params))
+    elif mode == 'streaming':
+        result = service.run_streaming_backtest(window, lambda w: strategy_fn(w, **params))
+    else:
+        raise ValueError(f"Modo de backtest desconhecido: {mode}")
+
+    return {
+        **params,
+        **result.metrics,
+        "n_trades": len(result.trades),
+        "final_equity": float(result.equity_curve[-1]),
+    }
+
+
+class BacktestRunner:
+    """
+    Executa varreduras de parâmetros e walk-forward em um pool de processos.
+
+    Os candles são gravados uma única vez em arquivos .npy (em /dev/shm quando
+    disponível) e mapeados por cada worker no initializer; as tarefas carregam
+    apenas parâmetros e índices. A estratégia precisa ser uma função de módulo
+    (serializável por pickle):
+
+    - modo 'streaming': strategy_fn(window: CandleWindow, **params) -> float
+    - modo 'vectorized': strategy_fn(candles: CandleArrays, **params) -> np.ndarray
+      com a posição-alvo por candle
+    """
+
+    def __init__(self, data: Union[Sequence[MarketData], CandleArrays],
+                 max_workers: Optional[int] = None, initial_capital: float = 10000.0,
+                 mp_context: Optional[Any] = None) -> None:
+        self.candles = as_candle_arrays(data)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.initial_capital = initial_capital
+        self.mp_context = mp_context
+        self._directory: Optional[str] = None
+        self._executor: Optional[Executor] = None
+
+    def __enter__(self) -> 'BacktestRunner':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+            self._directory = tempfile.mkdtemp(prefix='backtest-', dir=shm)
+            self.candles.save(self._directory)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=self.mp_context,
+                initializer=_init_worker, initargs=(self._directory,)
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def _map(self, strategy_fn: Callable[..., Any], mode: str,
+             tasks: List[Tuple[Dict[str, Any], int, int]]) -> List[Dict[str, Any]]:
+        if self.max_workers == 1:
+            return [_run_task(strategy_fn, mode, self.initial_capital, params, start, end, self.candles)
+                    for params, start, end in tasks]
+        executor = self._get_executor()
+        futures = [executor.submit(_run_task, strategy_fn, mode, self.initial_capital, params, start, end)
+                   for params, start, end in tasks]
+        return [future.result() for future in futures]
+
+    def sweep(self, strategy_fn: Callable[..., Any], grid: Mapping[str, Iterable[Any]],
+              mode: str = 'vectorized', start: int = 0, end: Optional[int] = None) -> pd.DataFrame:
+        """
+        Roda uma combinação de parâmetros por tarefa e devolve uma linha por
+        combinação com os parâmetros, as métricas, n_trades e final_equity
+        """
+        end = len(self.candles) if end is None else end
+        tasks = [(params, start, end) for params in parameter_grid(grid)]
+        return pd.DataFrame(self._map(strategy_fn, mode, tasks))
+
+    def walk_forward(self, strategy_fn: Callable[..., Any], grid: Mapping[str, Iterable[Any]],
+                     train_size: int, test_size: int, step: Optional[int] = None,
+                     mode: str = 'vectorized', objective: str = 'sharpe_ratio') -> pd.DataFrame:
+        """
+        Para cada janela, escolhe no treino a combinação que maximiza
+        `objective` e a avalia no período de teste seguinte. Todas as
+        janelas de treino são avaliadas juntas para ocupar o pool inteiro.
+        """
+        folds = walk_forward_folds(len(self.candles), train_size, test_size, step)
+        combos = parameter_grid(grid)
+        train_tasks = [(params, fold.train_start, fold.train_end) for fold in folds for params in combos]
+        train_results = self._map(strategy_fn, mode, train_tasks)
+
+        best: List[Tuple[Dict[str, Any], float]] = []
+        for i in range(len(folds)):
+            scores = [result[objective] for result in train_results[i * len(combos):(i + 1) * len(combos)]]
+            winner = max(range(len(scores)), key=scores.__getitem__)
+            best.append((combos[winner], scores[winner]))
+
+        test_tasks = [(params, fold.test_start, fold.test_end) for fold, (params, _) in zip(folds, best)]
+        test_results = self._map(strategy_fn, mode, test_tasks)
+
+        rows = []
+        for fold, (_, train_score), result in zip(folds, best, test_results):
+            rows.append({
+                "fold": fold.fold,
+                "train_start": self.candles.timestamp[fold.train_start].item(),
+                "test_start": self.candles.timestamp[fold.test_start].item(),
+                "test_end": self.candles.timestamp[fold.test_end - 1].item(),
+                f"train_{objective}": train_score,
+                **result,
+            })
+        return pd.DataFrame(rows)
@@ -1,43 +1,365 @@
-from typing import List, Dict, Any, Optional
+import os
+import shutil
+import tempfile
+from typing import List, Dict, Any, Optional, Callable, Iterator, Sequence, Union, overload
 from datetime import datetime
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass
 
 from models.market_model import OptionContract, MarketData
+from utils.clock import SimulatedClock
+from services.online_metrics import OnlineMetrics, RoundTripTracker
+from services.trade_ledger import GrowableColumn, Ledger, LedgerView, POSITION_FIELDS, TRADE_FIELDS
+
+_CANDLE_FIELDS = ('price', 'volume', 'high', 'low', 'open', 'close')
+
+class CandleArrays:
+    """
+    Histórico de candles em colunas NumPy somente-leitura. Pode ser montado a
+    partir de List[MarketData] ou diretamente de arrays, sem criar um objeto
+    por candle (necessário para dezenas de milhões de candles).
+    """
+    def __init__(self, timestamp: np.ndarray, price: np.ndarray, volume: Optional[np.ndarray] = None,
+                 high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None,
+                 open: Optional[np.ndarray] = None, close: Optional[np.ndarray] = None) -> None:
+        self.timestamp = np.asarray(timestamp, dtype='datetime64[us]')
+        self.price = np.asarray(price, dtype=np.float64)
+        n = self.price.size
+        self.volume = np.zeros(n) if volume is None else np.asarray(volume, dtype=np.float64)
+        self.high = self.price if high is None else np.asarray(high, dtype=np.float64)
+        self.low = self.price if low is None else np.asarray(low, dtype=np.float64)
+        self.open = self.price if open is None else np.asarray(open, dtype=np.float64)
+        self.close = self.price if close is None else np.asarray(close, dtype=np.float64)
+        # Views próprias marcadas como somente-leitura, sem alterar os arrays do chamador
+        for name in ('timestamp',) + _CANDLE_FIELDS:
+            column = getattr(self, name).view()
+            column.flags.writeable = False
+            setattr(self, name, column)
+
+    @classmethod
+    def from_market_data(cls, data: Sequence[MarketData]) -> 'CandleArrays':
+        return cls(
+            timestamp=np.array([candle.timestamp for candle in data], dtype='datetime64[us]'),
+            **{name: np.fromiter((getattr(candle, name) for candle in data), dtype=np.float64, count=len(data))
+               for name in _CANDLE_FIELDS}
+        )
+
+    def __len__(self) -> int:
+        return int(self.price.size)
+
+    def slice(self, start: int, end: int) -> 'CandleArrays':
+        """
+        Candles [start, end) como views das mesmas colunas, sem cópia
+        """
+        return CandleArrays(self.timestamp[start:end], **{name: getattr(self, name)[start:end] for name in _CANDLE_FIELDS})
+
+    def save(self, directory: str) -> None:
+        """
+        Grava uma coluna por arquivo .npy para que outros processos possam mapeá-las
+        """
+        for name in ('timestamp',) + _CANDLE_FIELDS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'CandleArrays':
+        mode = 'r' if mmap else None
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+                   for name in ('timestamp',) + _CANDLE_FIELDS}
+        return cls(**columns)
+
+def as_candle_arrays(data: Union[Sequence[MarketData], CandleArrays]) -> CandleArrays:
+    """
+    Converte List[MarketData] em colunas; CandleArrays passa direto
+    """
+    if isinstance(data, CandleArrays):
+        return data
+    return CandleArrays.from_market_data(data)
+
+class CandleWindow:
+    """
+    View somente-leitura dos candles [0, end) sobre um CandleArrays. O backtest
+    reaproveita a mesma instância avançando `end`, então cada passo é O(1):
+    os atributos devolvem fatias (views) dos arrays, nunca cópias. A view só
+    é válida durante a chamada da estratégia.
+    """
+    def __init__(self, arrays: CandleArrays, end: int = 0) -> None:
+        self.arrays = arrays
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.arrays.timestamp[:self.end]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self.arrays.price[:self.end]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.arrays.volume[:self.end]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.arrays.high[:self.end]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.arrays.low[:self.end]
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.arrays.open[:self.end]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.arrays.close[:self.end]
+
+    @property
+    def last_price(self) -> float:
+        return float(self.arrays.price[self.end - 1])
+
+class HistoryView(Sequence[MarketData]):
+    """
+    Adaptador para estratégias escritas contra List[MarketData]: expõe os
+    primeiros `length` candles da lista original sem copiá-la. Indexação,
+    fatias, len() e iteração se comportam como na lista truncada. O tamanho
+    é fixo: a estratégia pode guardar a view sem vê-la crescer depois.
+    """
+    __slots__ = ('_data', '_length')
+
+    def __init__(self, data: Sequence[MarketData], length: int) -> None:
+        self._data = data
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> MarketData: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[MarketData]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[MarketData, List[MarketData]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            return list(self._data[start:stop:step]) if step > 0 else [self._data[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("índice fora do histórico disponível")
+        return self._data[index]
+
+    def __iter__(self) -> Iterator[MarketData]:
+        for i in range(self._length):
+            yield self._data[i]
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    cummax = np.maximum.accumulate(equity)
+    return float(((cummax - equity) / cummax).max())
+
+def _performance_metrics(equity: np.ndarray, initial_capital: float, win_rate: float) -> Dict[str, float]:
+    """
+    Equivalente vetorizado de OnlineMetrics para uma curva de equity completa
+    """
+    returns = equity[1:] / equity[:-1] - 1.0
+    std = returns.std(ddof=1) if returns.size > 1 else 0.0
+    sharpe_ratio = returns.mean() / std * np.sqrt(252) if std > 0 else 0.0
+
+    return {
+        "total_return": float((equity[-1] - initial_capital) / initial_capital),
+        "sharpe_ratio": float(sharpe_ratio),
+        "max_drawdown": _max_drawdown(equity),
+        "win_rate": float(win_rate)
+    }
 
 @dataclass
 class BacktestResult:
-    trades: List[Dict[str, Any]]
-    pnl: List[float]
-    equity_curve: List[float]
+    # Views sobre o ledger colunar; trades[i] e positions[i] devolvem a linha como dict
+    trades: LedgerView
+    pnl: np.ndarray
+    equity_curve: np.ndarray
     metrics: Dict[str, float]
-    positions: List[Dict[str, Any]]
+    positions: LedgerView
 
 class BacktestService:
-    def __init__(self) -> None:
+    def __init__(self, clock: Optional[SimulatedClock] = None, ledger_dir: Optional[str] = None,
+                 keep_runs: Optional[int] = None) -> None:
+        # Relógio simulado avançado a cada candle; pode ser compartilhado com o
+        # AnalysisService usado pela estratégia para precificar no tempo do backtest
+        self.clock = clock or SimulatedClock(datetime.now())
+        # Com ledger_dir, trades, posições e equity ficam em arquivos mapeados em memória,
+        # num subdiretório novo por execução (run_dir) para não sobrescrever resultados
+        # anteriores; keep_runs limita quantos run_dirs desta instância ficam em disco
+        if keep_runs is not None and keep_runs < 1:
+            raise ValueError("keep_runs deve ser ao menos 1")
+        self.ledger_dir = ledger_dir
+        self.keep_runs = keep_runs
+        self.run_dir: Optional[str] = None
+        self._run_dirs: List[str] = []
         self.initial_capital: float = 10000.0
+        # Até a primeira execução os históricos ficam em memória: nada é criado em ledger_dir
+        self._reset_state(None)
+
+    def __enter__(self) -> 'BacktestService':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def reset(self) -> None:
+        """
+        Restaura caixa, posição e históricos para reutilizar a instância;
+        com ledger_dir, a nova execução grava num run_dir próprio
+        """
+        self._reset_state(self._new_run_dir() if self.ledger_dir else None)
+
+    def close(self) -> None:
+        """
+        Apaga os run_dirs criados por esta instância; resultados devolvidos
+        por essas execuções não devem mais ser usados
+        """
+        self._reset_state(None)
+        for run_dir in self._run_dirs:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        self._run_dirs.clear()
+
+    def _new_run_dir(self) -> str:
+        run_dir = tempfile.mkdtemp(prefix='run-', dir=self.ledger_dir)
+        self._run_dirs.append(run_dir)
+        if self.keep_runs is not None:
+            while len(self._run_dirs) > self.keep_runs:
+                shutil.rmtree(self._run_dirs.pop(0), ignore_errors=True)
+        return run_dir
+
+    def _reset_state(self, run_dir: Optional[str]) -> None:
         self.position: float = 0.0
         self.cash: float = self.initial_capital
-        self.equity: List[float] = [self.initial_capital]
-        self.trades: List[Dict[str, Any]] = []
-        self.positions: List[Dict[str, Any]] = []
+        # Os memmaps de um resultado já devolvido seguem válidos: cada execução grava em outro diretório
+        self.run_dir = run_dir
+        self.equity = GrowableColumn(np.float64, path=self._ledger_path('equity.bin'))
+        self.equity.append(self.initial_capital)
+        self.trades = Ledger(TRADE_FIELDS, directory=self.run_dir, name='trades')
+        self.positions = Ledger(POSITION_FIELDS, directory=self.run_dir, name='positions')
+        self.metrics = OnlineMetrics(self.initial_capital)
+
+    def _ledger_path(self, filename: str) -> Optional[str]:
+        return os.path.join(self.run_dir, filename) if self.run_dir else None
 
-    def run_backtest(self, data: List[MarketData], strategy_fn: callable) -> BacktestResult:
+    def run_backtest(self, data: List[MarketData], strategy_fn: Callable[[Sequence[MarketData]], float]) -> BacktestResult:
         """
-        Executa o backtest usando os dados históricos e a função de estratégia fornecida
+        Executa o backtest usando os dados históricos e a função de estratégia fornecida.
+        A estratégia recebe o histórico até o candle atual como um HistoryView
+        novo a cada candle (O(1)), que se comporta como a lista truncada sem copiá-la.
         """
+        self.reset()
         for i, candle in enumerate(data):
-            signal = strategy_fn(data[:i+1])
+            self.clock.set(candle.timestamp)
+            signal = strategy_fn(HistoryView(data, i + 1))
             if signal != 0:
                 self._execute_trade(signal, candle.price, candle.timestamp)
 
         return self._generate_results()
 
+    def run_streaming_backtest(self, data: Union[Sequence[MarketData], CandleArrays],
+                               strategy_fn: Callable[[CandleWindow], float],
+                               sync_clock: bool = False) -> BacktestResult:
+        """
+        Backtest em tempo linear: a estratégia recebe um CandleWindow com views
+        NumPy do histórico até o candle atual. Aceita CandleArrays diretamente
+        para séries longas. Com `sync_clock` o relógio simulado acompanha cada
+        candle (converter o timestamp tem custo por passo); sem ele, o relógio
+        só é atualizado nas operações.
+        """
+        self.reset()
+        arrays = as_candle_arrays(data)
+        window = CandleWindow(arrays)
+        prices = arrays.price
+        timestamps = arrays.timestamp
+        for i in range(len(arrays)):
+            window.end = i + 1
+            if sync_clock:
+                self.clock.set(timestamps[i].item())
+            signal = strategy_fn(window)
+            if signal != 0:
+                timestamp = timestamps[i].item()
+                self.clock.set(timestamp)
+                self._execute_trade(signal, float(prices[i]), timestamp)
+
+        return self._generate_results()
+
+    def run_vectorized_backtest(self, data: Union[Sequence[MarketData], CandleArrays],
+                                signal: np.ndarray) -> BacktestResult:
+        """
+        Backtest vetorizado para sinais calculados de antemão. `signal[i]` é a
+        posição-alvo (em unidades) mantida a partir do candle i, executada ao
+        preço desse candle. Posições, caixa e equity saem de somas cumulativas;
+        só os candles em que a posição muda geram registros de trade. Não há
+        validação de caixa: o sinal define a exposição (negativo = vendido).
+        A equity_curve tem um ponto por candle, precedido do capital inicial.
+        Não altera caixa, posição nem históricos da instância; só avança o
+        relógio simulado até o último candle.
+        """
+        arrays = as_candle_arrays(data)
+        prices = arrays.price
+        target = np.asarray(signal, dtype=np.float64)
+        if target.shape != prices.shape:
+            raise ValueError("O sinal deve ter um valor por candle")
+        if not np.isfinite(target).all():
+            raise ValueError("O sinal contém valores não finitos")
+        if prices.size == 0:
+            empty = Ledger(TRADE_FIELDS, capacity=1).view()
+            return BacktestResult(empty, empty['value'], np.array([self.initial_capital]), _performance_metrics(
+                np.array([self.initial_capital]), self.initial_capital, 0.0), Ledger(POSITION_FIELDS, capacity=1).view())
+
+        delta = np.diff(target, prepend=0.0)
+        cash = self.initial_capital - np.cumsum(delta * prices)
+        equity = np.concatenate(([self.initial_capital], cash + target * prices))
+
+        fills = np.flatnonzero(delta)
+        quantity = np.abs(delta[fills])
+        fill_price = prices[fills]
+        value = quantity * fill_price
+        is_buy = delta[fills] > 0
+        timestamps = arrays.timestamp[fills]
+
+        # Os arrays calculados já são as colunas do ledger: nenhum registro é montado por trade
+        trades = LedgerView({
+            "timestamp": timestamps,
+            "side": np.where(is_buy, 0, 1).astype(np.int32),
+            "quantity": quantity,
+            "price": fill_price,
+            "value": value,
+        }, {"side": ["BUY", "SELL"]})
+        positions = LedgerView({
+            "timestamp": timestamps,
+            "position": target[fills],
+            "cash": cash[fills],
+            "equity": equity[fills + 1],
+        }, {})
+        # Mesmo critério de _calculate_win_rate: PnL realizado por ida-e-volta (O(trades))
+        round_trips = RoundTripTracker()
+        for quantity_change, price in zip(delta[fills].tolist(), fill_price.tolist()):
+            round_trips.record("underlying", quantity_change, price)
+        win_rate = round_trips.win_rate
+        self.clock.set(arrays.timestamp[-1].item())
+
+        return BacktestResult(
+            trades=trades,
+            pnl=value,
+            equity_curve=equity,
+            metrics=_performance_metrics(equity, self.initial_capital, win_rate),
+            positions=positions
+        )
+
     def _execute_trade(self, signal: float, price: float, timestamp: datetime) -> None:
         """
         Executa uma operação de compra ou venda
         """
+        previous_position = self.position
         if signal > 0:  # Compra
             if self.position <= 0:
                 qty = min(signal, self.cash / price)
@@ -56,9 +378,13 @@ class BacktestService:
                     self.cash += revenue
                     self._record_trade("SELL", qty, price, timestamp)
 
+        if self.position != previous_position:
+            self.metrics.record_trade("underlying", self.position - previous_position, price)
+
         # Atualiza equity
         current_equity = self.cash + (self.position * price)
         self.equity.append(current_equity)
+        self.metrics.update_equity(current_equity)
 
     def _validate_trade(self, quantity: float, value: float) -> bool:
         """
@@ -76,75 +402,46 @@ class BacktestService:
         """
         Registra uma operação executada
         """
-        trade = {
-            "timestamp": timestamp,
-            "side": side,
-            "quantity": quantity,
-            "price": price,
-            "value": quantity * price
-        }
-        self.trades.append(trade)
-        
-        position = {
-            "timestamp": timestamp,
-            "position": self.position,
-            "cash": self.cash,
-            "equity": self.equity[-1]
-        }
-        self.positions.append(position)
+        self.trades.append(
+            timestamp=timestamp,
+            side=side,
+            quantity=quantity,
+            price=price,
+            value=quantity * price
+        )
+        self.positions.append(
+            timestamp=timestamp,
+            position=self.position,
+            cash=self.cash,
+            equity=self.equity.last
+        )
 
     def _calculate_metrics(self) -> Dict[str, float]:
         """
-        Calcula métricas de performance do backtest
-        """
-        returns = pd.Series(self.equity).pct_change().dropna()
-        
-        total_return = (self.equity[-1] - self.initial_capital) / self.initial_capital
-        sharpe_ratio = returns.mean() / returns.std() * np.sqrt(252) if len(returns) > 0 else 0
-        max_drawdown = self._calculate_max_drawdown()
-        win_rate = self._calculate_win_rate()
-        
-        return {
-            "total_return": float(total_return),
-            "sharpe_ratio": float(sharpe_ratio),
-            "max_drawdown": float(max_drawdown),
-            "win_rate": float(win_rate)
-        }
+        Calcula métricas de performance do backtest a partir dos acumuladores online
+        """
+        return self.metrics.snapshot()
 
     def _calculate_max_drawdown(self) -> float:
         """
         Calcula o máximo drawdown
         """
-        equity_series = pd.Series(self.equity)
-        cummax = equity_series.cummax()
-        drawdown = (cummax - equity_series) / cummax
-        return float(drawdown.max())
+        return self.metrics.drawdown.max_drawdown
 
     def _calculate_win_rate(self) -> float:
         """
-        Calcula o percentual de trades vencedores
+        Calcula o percentual de idas-e-voltas com PnL realizado positivo
         """
-        if not self.trades:
-            return 0.0
-            
-        pnl = []
-        for trade in self.trades:
-            if trade["side"] == "BUY":
-                pnl.append(-trade["value"])
-            else:
-                pnl.append(trade["value"])
-                
-        winning_trades = sum(1 for p in pnl if p > 0)
-        return float(winning_trades / len(pnl))
+        return self.metrics.round_trips.win_rate
 
     def _generate_results(self) -> BacktestResult:
         """
         Gera o resultado final do backtest
         """
         return BacktestResult(
-            trades=self.trades,
-            pnl=[t["value"] for t in self.trades],
-            equity_curve=self.equity,
+            trades=self.trades.view(),
+            pnl=self.trades.column("value"),
+            equity_curve=self.equity.view(),
             metrics=self._calculate_metrics(),
-            positions=self.positions
+            positions=self.positions.view()
         )
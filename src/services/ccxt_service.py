@@ -1,19 +1,48 @@
 import asyncio
 import ccxt.async_support as ccxt
+import ccxt.pro as ccxtpro
 import platform
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from datetime import datetime
 import numpy as np
 
+from services.market_index import MarketIndex
+from services.market_stream import MarketStream
+from services.market_recorder import MarketRecorder
+
 logger = logging.getLogger(__name__)
 
 class CCXTService:
-    def __init__(self, simulation_mode: bool = True) -> None:
+    def __init__(self, simulation_mode: bool = True, ticker_ttl: float = 1.0,
+                 market_ttl: float = 3600.0, market_snapshot_path: Optional[str] = None,
+                 recorder: Optional[MarketRecorder] = None, max_concurrent_requests: int = 8) -> None:
         if platform.system() == 'Windows':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
         
         self.simulation_mode = simulation_mode
+        # Cache de preços por símbolo (instante da busca, preço) e buscas em andamento,
+        # para que pedidos concorrentes do mesmo símbolo façam uma única requisição
+        self.ticker_ttl = ticker_ttl
+        self._ticker_cache: Dict[str, Tuple[float, float]] = {}
+        self._inflight: Dict[str, "asyncio.Future[float]"] = {}
+        # Índice de mercados construído uma vez e atualizado em background após o TTL
+        self.market_ttl = market_ttl
+        self.market_snapshot_path = market_snapshot_path
+        self._market_index: Optional[MarketIndex] = None
+        self._market_refresh: "Optional[asyncio.Task[MarketIndex]]" = None
+        # Feed de streaming opcional; quando ativo, seus tickers têm prioridade sobre o REST
+        self.stream: Optional[MarketStream] = None
+        # Só a exchange de streaming criada aqui é fechada em close(); a do chamador é dele
+        self._owns_stream_exchange = False
+        # Gravador opcional de tudo que o serviço recebe, para replay posterior
+        self.recorder = recorder
+        # Limite de requisições REST simultâneas; o espaçamento entre elas fica com o
+        # throttler do ccxt (enableRateLimit). O semáforo é criado no loop que o usa
+        self.max_concurrent_requests = max_concurrent_requests
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
         if not simulation_mode:
             self.exchange = ccxt.binance({
                 'enableRateLimit': True,
@@ -66,59 +95,295 @@ class CCXTService:
                 symbol_base = symbol.split('/')[0]
                 options = self._generate_simulated_options(symbol_base, expiry)
                 logger.info(f"Gerados {len(options)} contratos de opções simulados")
+                if self.recorder is not None:
+                    self.recorder.record_option_chain(symbol_base, expiry, options)
                 return options
             
-            logger.info(f"Carregando mercados para {symbol}")
-            markets = await self.exchange.load_markets()
-            logger.info(f"Mercados carregados: {len(markets)} pares disponíveis")
-            
-            market_types = set(market['type'] for market in markets.values())
-            logger.info(f"Tipos de mercado disponíveis: {market_types}")
-            
-            options = []
             symbol_base = symbol.split('/')[0]
             
             if symbol == "BTC/USD":
                 symbol = "BTC/USDT"
                 logger.info(f"Convertendo par para {symbol}")
             
-            for market_id, market in markets.items():
-                if market['type'] == 'option' and market['base'] == symbol_base:
-                    logger.info(f"Encontrado mercado de opções: {market_id}")
-                    market_expiry = datetime.fromtimestamp(market['expiry'])
-                    if market_expiry.date() == expiry.date():
-                        options.append(market)
-                        logger.info(f"Opção adicionada: strike={market.get('strike')}, tipo={market.get('type')}")
+            index = await self._get_market_index()
+            options = index.lookup(symbol_base, expiry.date(), 'option')
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                for option in options:
+                    logger.debug(f"Opção adicionada: {option.get('id')} strike={option.get('strike')}")
             
             logger.info(f"Total de opções encontradas: {len(options)}")
+            if self.recorder is not None:
+                self.recorder.record_option_chain(symbol_base, expiry, options)
             return options
             
         except Exception as e:
             logger.error(f"Erro ao buscar dados de opções: {str(e)}", exc_info=True)
             return []
     
+    async def _get_market_index(self) -> MarketIndex:
+        """
+        Retorna o índice de mercados. No cold start usa o snapshot em disco, se
+        existir; índices vencidos continuam servindo enquanto a atualização roda
+        em background.
+        """
+        if self._market_index is None and self.market_snapshot_path:
+            self._market_index = MarketIndex.load(self.market_snapshot_path)
+            if self._market_index is not None:
+                logger.info(f"Snapshot de mercados carregado: {len(self._market_index)} pares")
+        
+        if self._market_index is None:
+            return await self._refresh_market_index()
+        
+        if self._market_index.age() > self.market_ttl and self._market_refresh is None:
+            self._refresh_market_index().add_done_callback(self._log_refresh_failure)
+        return self._market_index
+    
+    @staticmethod
+    def _log_refresh_failure(task: "asyncio.Task[MarketIndex]") -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Erro ao atualizar mercados em background: {str(task.exception())}")
+    
+    def _refresh_market_index(self) -> "asyncio.Task[MarketIndex]":
+        # Atualizações concorrentes compartilham a mesma chamada a load_markets
+        if self._market_refresh is None:
+            self._market_refresh = asyncio.ensure_future(self._load_market_index())
+        return self._market_refresh
+    
+    async def _load_market_index(self) -> MarketIndex:
+        try:
+            logger.info("Carregando mercados")
+            markets = await self.exchange.load_markets(True)
+            index = MarketIndex(markets)
+            logger.info(f"Mercados carregados: {len(index)} pares disponíveis")
+            logger.debug(f"Tipos de mercado disponíveis: {index.market_types}")
+            self._market_index = index
+            if self.market_snapshot_path:
+                try:
+                    index.save(self.market_snapshot_path)
+                except OSError as e:
+                    logger.warning(f"Não foi possível salvar o snapshot de mercados: {str(e)}")
+            return index
+        finally:
+            self._market_refresh = None
+    
+    def _normalize_symbol(self, symbol: str) -> str:
+        # Converte para USDT se necessário
+        if symbol.endswith('/USD'):
+            symbol = symbol.replace('/USD', '/USDT')
+        return symbol
+    
+    def _simulated_price(self, symbol: str) -> float:
+        if symbol.startswith('BTC'):
+            return 45000.0
+        elif symbol.startswith('ETH'):
+            return 3000.0
+        return 100.0
+    
+    def _cached_price(self, symbol: str) -> Optional[float]:
+        if self.stream is not None and self.stream.running:
+            ticker = self.stream.get_ticker(symbol)
+            if ticker and ticker.get('last') is not None:
+                return float(ticker['last'])
+        cached = self._ticker_cache.get(symbol)
+        if cached is not None and time.monotonic() - cached[0] <= self.ticker_ttl:
+            return cached[1]
+        return None
+    
+    def _store_price(self, symbol: str, ticker: Optional[Dict[str, Any]]) -> float:
+        price = ticker['last'] if ticker and ticker.get('last') is not None else 0.0
+        if ticker and self.recorder is not None:
+            self.recorder.record_ticker(symbol, ticker)
+        if price:
+            self._ticker_cache[symbol] = (time.monotonic(), price)
+        return price
+    
+    def _register_inflight(self, symbol: str, future: "asyncio.Future[float]") -> None:
+        self._inflight[symbol] = future
+        
+        def _release(done: "asyncio.Future[float]") -> None:
+            if self._inflight.get(symbol) is done:
+                del self._inflight[symbol]
+        
+        future.add_done_callback(_release)
+    
+    async def _fetch_price(self, symbol: str) -> float:
+        logger.info(f"Buscando preço para {symbol}")
+        ticker = await self.exchange.fetch_ticker(symbol)
+        price = self._store_price(symbol, ticker)
+        logger.info(f"Preço obtido: {price}")
+        return price
+    
     async def get_underlying_price(self, symbol: str) -> float:
         try:
             if self.simulation_mode:
-                if symbol.startswith('BTC'):
-                    return 45000.0
-                elif symbol.startswith('ETH'):
-                    return 3000.0
-                return 100.0
-                
-            # Converte para USDT se necessário
-            if symbol.endswith('/USD'):
-                symbol = symbol.replace('/USD', '/USDT')
+                return self._simulated_price(symbol)
                 
-            logger.info(f"Buscando preço para {symbol}")
-            ticker = await self.exchange.fetch_ticker(symbol)
-            price = ticker['last'] if ticker and 'last' in ticker else 0.0
-            logger.info(f"Preço obtido: {price}")
-            return price
+            symbol = self._normalize_symbol(symbol)
+            cached = self._cached_price(symbol)
+            if cached is not None:
+                return cached
+            
+            # Pedidos concorrentes do mesmo símbolo aguardam a mesma busca
+            inflight = self._inflight.get(symbol)
+            if inflight is None:
+                inflight = asyncio.ensure_future(self._fetch_price(symbol))
+                self._register_inflight(symbol, inflight)
+            return await asyncio.shield(inflight)
         except Exception as e:
             logger.error(f"Erro ao buscar preço do ativo subjacente: {str(e)}", exc_info=True)
             return 0.0
     
+    async def get_underlying_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        Busca os preços de vários ativos com uma única chamada fetch_tickers,
+        reaproveitando o cache e buscas já em andamento. O resultado é indexado
+        pelos símbolos como foram pedidos.
+        """
+        requested = list(dict.fromkeys(symbols))
+        if self.simulation_mode:
+            return {symbol: self._simulated_price(symbol) for symbol in requested}
+        
+        normalized = {symbol: self._normalize_symbol(symbol) for symbol in requested}
+        missing = [
+            symbol for symbol in dict.fromkeys(normalized.values())
+            if self._cached_price(symbol) is None and symbol not in self._inflight
+        ]
+        if len(missing) > 1 and self.exchange.has.get('fetchTickers'):
+            await self._fetch_prices_bulk(missing)
+        
+        prices = await asyncio.gather(*(self.get_underlying_price(normalized[s]) for s in requested))
+        return dict(zip(requested, prices))
+    
+    async def _fetch_prices_bulk(self, symbols: List[str]) -> None:
+        loop = asyncio.get_running_loop()
+        futures: Dict[str, "asyncio.Future[float]"] = {}
+        for symbol in symbols:
+            futures[symbol] = loop.create_future()
+            self._register_inflight(symbol, futures[symbol])
+        
+        try:
+            try:
+                logger.info(f"Buscando preços para {len(symbols)} ativos")
+                tickers = await self.exchange.fetch_tickers(symbols)
+                for symbol, future in futures.items():
+                    future.set_result(self._store_price(symbol, tickers.get(symbol)))
+            except Exception as e:
+                # Sem o endpoint em lote, cai para buscas individuais concorrentes
+                logger.warning(f"Falha no fetch_tickers, buscando individualmente: {str(e)}")
+                results = await asyncio.gather(
+                    *(self._fetch_price(symbol) for symbol in symbols), return_exceptions=True
+                )
+                for (symbol, future), result in zip(futures.items(), results):
+                    future.set_result(0.0 if isinstance(result, BaseException) else result)
+        finally:
+            # Chamador cancelado: resolve as buscas pendentes com erro para liberar
+            # _inflight e acordar quem está esperando por elas
+            for symbol, future in futures.items():
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Busca em lote de {symbol} cancelada"))
+                    future.exception()  # marca como consumida; os waiters ainda recebem o erro
+    
+    def _request_slot(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    @staticmethod
+    def _option_quote(contract_id: str, ticker: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Normaliza um ticker de opção: preço = último negócio, ou o meio do
+        book, ou None sem cotação; IV e Greeks da exchange quando informadas
+        """
+        ticker = ticker or {}
+        info = ticker.get('info') or {}
+        bid, ask = ticker.get('bid'), ticker.get('ask')
+        price = ticker.get('last')
+        if price is None and bid is not None and ask is not None:
+            price = (bid + ask) / 2
+        if price is None and info.get('markPrice') is not None:
+            price = float(info['markPrice'])
+        quote: Dict[str, Any] = {'symbol': contract_id, 'price': price, 'bid': bid, 'ask': ask}
+        for name, key in (('implied_volatility', 'markIV'), ('delta', 'delta'), ('gamma', 'gamma'),
+                          ('theta', 'theta'), ('vega', 'vega')):
+            value = info.get(key)
+            quote[name] = float(value) if value is not None else None
+        return quote
+    
+    async def _fetch_option_ticker(self, contract_id: str) -> Dict[str, Any]:
+        async with self._request_slot():
+            ticker = await self.exchange.fetch_ticker(contract_id)
+        if ticker and self.recorder is not None:
+            self.recorder.record_ticker(contract_id, ticker)
+        return self._option_quote(contract_id, ticker)
+    
+    async def get_option_quote(self, contract_id: str) -> Dict[str, Any]:
+        """
+        Cotação de um contrato de opção. Em simulação, ou se a busca falhar,
+        devolve a cotação sem preço (price=None)
+        """
+        if self.simulation_mode:
+            return self._option_quote(contract_id, None)
+        try:
+            return await self._fetch_option_ticker(contract_id)
+        except Exception as e:
+            logger.error(f"Erro ao buscar cotação de {contract_id}: {str(e)}")
+            return self._option_quote(contract_id, None)
+    
+    async def get_option_quotes(self, contract_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Cotações de vários contratos: uma chamada fetch_tickers quando a
+        exchange suporta; senão, buscas individuais concorrentes limitadas
+        por max_concurrent_requests
+        """
+        requested = list(dict.fromkeys(contract_ids))
+        if self.simulation_mode or not requested:
+            return {contract_id: self._option_quote(contract_id, None) for contract_id in requested}
+        
+        if len(requested) > 1 and self.exchange.has.get('fetchTickers'):
+            try:
+                async with self._request_slot():
+                    tickers = await self.exchange.fetch_tickers(requested)
+                if self.recorder is not None:
+                    for contract_id, ticker in tickers.items():
+                        self.recorder.record_ticker(contract_id, ticker)
+                return {contract_id: self._option_quote(contract_id, tickers.get(contract_id))
+                        for contract_id in requested}
+            except Exception as e:
+                logger.warning(f"Falha no fetch_tickers de opções, buscando individualmente: {str(e)}")
+        
+        quotes = await asyncio.gather(*(self.get_option_quote(contract_id) for contract_id in requested))
+        return dict(zip(requested, quotes))
+    
+    def start_stream(self, symbols: Iterable[str], order_book_depth: Optional[int] = 10,
+                     exchange: Optional[Any] = None) -> MarketStream:
+        """
+        Inicia o modo streaming (ccxt.pro watch_ticker/watch_order_book) para os
+        símbolos dados. `exchange` permite usar um replay local ou stub no lugar
+        da exchange real; nesse caso, fechá-la continua a cargo do chamador.
+        """
+        self._owns_stream_exchange = exchange is None
+        if exchange is None:
+            if self.simulation_mode:
+                raise RuntimeError("Streaming requer uma exchange real ou um replay")
+            exchange = ccxtpro.binance({
+                'enableRateLimit': True,
+                'options': {
+                    'defaultType': 'option'
+                }
+            })
+        self.stream = MarketStream(exchange, order_book_depth=order_book_depth, recorder=self.recorder)
+        self.stream.start([self._normalize_symbol(symbol) for symbol in symbols])
+        return self.stream
+    
     async def close(self) -> None:
+        if self.stream is not None:
+            await self.stream.stop()
+            if self._owns_stream_exchange and hasattr(self.stream.exchange, 'close'):
+                await self.stream.exchange.close()
+        if self._market_refresh is not None:
+            self._market_refresh.cancel()
         if not self.simulation_mode and hasattr(self, 'exchange'):
             await self.exchange.close()
@@ -0,0 +1,185 @@
+from typing import Dict, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+# Jitters somados à diagonal quando a correlação é só semidefinida; acima do último, desiste
+_CHOLESKY_JITTERS = (1e-10, 1e-9, 1e-8, 1e-7, 1e-6, 1e-5, 1e-4)
+
+
+class CorrelationEngine:
+    """
+    Covariância e correlação entre subjacentes (não entre posições) a partir
+    de séries de retornos reais.
+
+    Cada novo candle atualiza momentos ponderados em O(k²) para k subjacentes:
+    com method='ewma' os pesos decaem por `decay` (RiskMetrics); com 'sample'
+    todos os candles pesam igual. `shrinkage` encolhe a covariância em direção
+    à identidade escalada, com intensidade fixa (float) ou estimada por
+    Ledoit-Wolf ('ledoit_wolf'). Matrizes e fatorações de Cholesky ficam em
+    cache até a próxima atualização.
+    """
+
+    def __init__(self, underlyings: Sequence[str], method: str = 'ewma', decay: float = 0.94,
+                 shrinkage: Union[None, float, str] = None, periods_per_year: float = 365.0) -> None:
+        if method not in ('ewma', 'sample'):
+            raise ValueError(f"Estimador desconhecido: {method}")
+        self.underlyings = list(underlyings)
+        self.method = method
+        self.decay = decay
+        self.shrinkage = shrinkage
+        self.periods_per_year = periods_per_year
+        self._index = {name: i for i, name in enumerate(self.underlyings)}
+        k = len(self.underlyings)
+        self._weight = 0.0
+        self._weight_sq = 0.0
+        self._mean = np.zeros(k)
+        self._cross = np.zeros((k, k))
+        self._cross_sq = np.zeros((k, k))
+        self._last_prices: Optional[np.ndarray] = None
+        self.observations = 0
+        self._cache: Dict[Tuple[str, Tuple[str, ...]], np.ndarray] = {}
+
+    def _factors(self) -> Tuple[float, float]:
+        # (decaimento do estado anterior, peso da nova observação)
+        return (self.decay, 1.0 - self.decay) if self.method == 'ewma' else (1.0, 1.0)
+
+    def update(self, returns: Union[ArrayLike, Mapping[str, float]]) -> None:
+        """
+        Incorpora um vetor de retornos (um por subjacente, na ordem de `underlyings`)
+        """
+        if isinstance(returns, Mapping):
+            returns = [returns[name] for name in self.underlyings]
+        x = np.asarray(returns, dtype=np.float64)
+        a, b = self._factors()
+        outer = np.outer(x, x)
+        self._weight = a * self._weight + b
+        self._weight_sq = a * a * self._weight_sq + b * b
+        self._mean = a * self._mean + b * x
+        self._cross = a * self._cross + b * outer
+        self._cross_sq = a * self._cross_sq + b * outer * outer
+        self.observations += 1
+        self._cache.clear()
+
+    def update_prices(self, prices: Union[ArrayLike, Mapping[str, float]]) -> None:
+        """
+        Recebe os preços do novo candle e atualiza com os log-retornos em relação ao anterior
+        """
+        if isinstance(prices, Mapping):
+            prices = [prices[name] for name in self.underlyings]
+        current = np.asarray(prices, dtype=np.float64)
+        if self._last_prices is not None:
+            self.update(np.log(current / self._last_prices))
+        self._last_prices = current
+
+    def fit(self, prices: ArrayLike) -> 'CorrelationEngine':
+        """
+        Inicializa a partir de um histórico de preços (candles x subjacentes)
+        de forma vetorizada; o estado resultante é o mesmo das atualizações uma a uma
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        returns = np.diff(np.log(prices), axis=0)
+        n = returns.shape[0]
+        a, b = self._factors()
+        # Peso de cada observação após as n atualizações recursivas
+        weights = b * a ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        carry = a ** n
+        squared = returns * returns
+        self._weight = carry * self._weight + weights.sum()
+        self._weight_sq = carry * carry * self._weight_sq + (weights * weights).sum()
+        self._mean = carry * self._mean + weights @ returns
+        self._cross = carry * self._cross + (returns * weights[:, None]).T @ returns
+        # (x_i x_j)² = x_i² x_j², sem materializar o produto externo de cada candle
+        self._cross_sq = carry * self._cross_sq + (squared * weights[:, None]).T @ squared
+        self.observations += n
+        self._last_prices = prices[-1].copy()
+        self._cache.clear()
+        return self
+
+    def _shrinkage_intensity(self, covariance: np.ndarray, target: np.ndarray) -> float:
+        if self.shrinkage is None:
+            return 0.0
+        if self.shrinkage != 'ledoit_wolf':
+            return float(np.clip(float(self.shrinkage), 0.0, 1.0))
+        # Ledoit-Wolf com pesos: variância amostral de cada x_i x_j sobre n efetivo
+        n_effective = self._weight ** 2 / self._weight_sq
+        second = self._cross / self._weight
+        pi = float(np.sum(self._cross_sq / self._weight - second * second)) / n_effective
+        gamma = float(np.sum((covariance - target) ** 2))
+        return float(np.clip(pi / gamma, 0.0, 1.0)) if gamma > 0 else 1.0
+
+    def covariance(self) -> np.ndarray:
+        """
+        Covariância por período (não anualizada) entre todos os subjacentes
+        """
+        cached = self._cache.get(('covariance', ()))
+        if cached is not None:
+            return cached
+        if self.observations < 2:
+            raise ValueError("São necessários ao menos dois retornos")
+        mean = self._mean / self._weight
+        covariance = self._cross / self._weight - np.outer(mean, mean)
+        target = np.eye(len(self.underlyings)) * np.trace(covariance) / len(self.underlyings)
+        delta = self._shrinkage_intensity(covariance, target)
+        covariance = (1.0 - delta) * covariance + delta * target
+        covariance.flags.writeable = False
+        self._cache[('covariance', ())] = covariance
+        return covariance
+
+    def correlation(self, underlyings: Optional[Sequence[str]] = None) -> np.ndarray:
+        key = ('correlation', tuple(underlyings or ()))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        covariance = self.covariance()
+        std = np.sqrt(np.maximum(np.diag(covariance), 0.0))
+        # Subjacente sem variação (preço parado) não tem correlação definida: fica com 0 fora da diagonal
+        scale = np.outer(std, std)
+        correlation = np.divide(covariance, scale, out=np.zeros_like(covariance), where=scale > 0)
+        np.fill_diagonal(correlation, 1.0)
+        if underlyings is not None:
+            idx = self.indices(underlyings)
+            correlation = correlation[np.ix_(idx, idx)]
+        correlation.flags.writeable = False
+        self._cache[key] = correlation
+        return correlation
+
+    def volatility(self) -> np.ndarray:
+        """
+        Volatilidade anualizada de cada subjacente
+        """
+        return np.sqrt(np.diag(self.covariance()) * self.periods_per_year)
+
+    def cholesky(self, underlyings: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Fator de Cholesky da correlação (opcionalmente de um subconjunto),
+        reaproveitado entre chamadas até a próxima atualização
+        """
+        key = ('cholesky', tuple(underlyings or ()))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        correlation = self.correlation(underlyings)
+        # Matriz semidefinida (ex.: subjacentes perfeitamente correlacionados): tenta com jitter crescente
+        for jitter in (0.0,) + _CHOLESKY_JITTERS:
+            try:
+                factor = np.linalg.cholesky(correlation + jitter * np.eye(len(correlation)))
+                break
+            except np.linalg.LinAlgError:
+                continue
+        else:
+            raise ValueError("Matriz de correlação não é positiva semidefinida")
+        factor.flags.writeable = False
+        self._cache[key] = factor
+        return factor
+
+    def indices(self, underlyings: Sequence[str]) -> np.ndarray:
+        return np.array([self._index[name] for name in underlyings], dtype=np.intp)
+
+    def expand(self, position_underlyings: Sequence[str]) -> np.ndarray:
+        """
+        Matriz posições x posições montada sob demanda a partir da matriz
+        k x k dos subjacentes (posições no mesmo subjacente têm correlação 1)
+        """
+        idx = self.indices(position_underlyings)
+        return self.correlation()[np.ix_(idx, idx)]
@@ -0,0 +1,284 @@
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+from models.market_model import OptionChain, OptionContract
+from services.analysis_service import AnalysisService, Greeks, GreeksBatch
+from utils.clock import year_fraction
+
+GREEKS = ('delta', 'gamma', 'theta', 'vega', 'rho')
+LADDER_LEVELS = ('underlying', 'expiry', 'strike')
+
+BucketKey = Tuple[str, np.datetime64, float]
+GreeksLike = Union[Greeks, Mapping[str, float], Sequence[float]]
+
+
+def _greeks_vector(greeks: GreeksLike) -> np.ndarray:
+    if isinstance(greeks, Mapping):
+        return np.array([greeks.get(g, 0.0) for g in GREEKS], dtype=np.float64)
+    if hasattr(greeks, 'delta'):
+        return np.array([getattr(greeks, g) for g in GREEKS], dtype=np.float64)
+    return np.asarray(greeks, dtype=np.float64)
+
+
+class GreeksBook:
+    """
+    Livro de Greeks do portfolio com atualização incremental.
+
+    Cada posição ocupa um slot com quantidade assinada (negativa = vendida) e
+    Greeks por contrato; as contribuições quantidade x Greeks são somadas em
+    buckets (subjacente, vencimento, faixa de strike) e no total do livro.
+    Incluir, remover ou reprecificar uma posição altera apenas o seu bucket
+    e o total, em O(1). Sem `strike_width`, cada strike é o seu próprio bucket;
+    `expiry_unit` é a resolução do vencimento (unidade de datetime64).
+    Para montar o livro inteiro de uma vez, use `from_batch`.
+    """
+
+    def __init__(self, strike_width: float = 0.0, expiry_unit: str = 'D', capacity: int = 64) -> None:
+        self.strike_width = strike_width
+        self.expiry_unit = expiry_unit
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._n_slots = 0
+        self._quantity = np.zeros(capacity)
+        self._unit = np.zeros((capacity, len(GREEKS)))
+        self._slot_bucket = np.zeros(capacity, dtype=np.intp)
+        self._strike = np.zeros(capacity)
+        self._expiry = np.zeros(capacity, dtype='datetime64[ms]')
+        self._is_call = np.zeros(capacity, dtype=bool)
+        self._underlying = np.zeros(capacity, dtype=object)
+        self._buckets: Dict[BucketKey, int] = {}
+        self._bucket_keys: List[BucketKey] = []
+        self._bucket_greeks = np.zeros((capacity, len(GREEKS)))
+        self._bucket_count = np.zeros(capacity, dtype=np.int64)
+        self._totals = np.zeros(len(GREEKS))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, contract_id: object) -> bool:
+        return contract_id in self._slots
+
+    def _bucket_for(self, contract: OptionContract) -> int:
+        strike = contract.strike_price
+        if self.strike_width > 0:
+            strike = float(np.floor(strike / self.strike_width) * self.strike_width)
+        key = (contract.underlying, np.datetime64(contract.expiry, self.expiry_unit), strike)
+        index = self._buckets.get(key)
+        if index is None:
+            index = len(self._bucket_keys)
+            if index == len(self._bucket_count):
+                self._bucket_greeks = np.concatenate([self._bucket_greeks, np.zeros_like(self._bucket_greeks)])
+                self._bucket_count = np.concatenate([self._bucket_count, np.zeros_like(self._bucket_count)])
+            self._buckets[key] = index
+            self._bucket_keys.append(key)
+        return index
+
+    def _new_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        slot = self._n_slots
+        if slot == len(self._quantity):
+            # Dobra a capacidade de todas as colunas por slot
+            self._quantity = np.concatenate([self._quantity, np.zeros_like(self._quantity)])
+            self._unit = np.concatenate([self._unit, np.zeros_like(self._unit)])
+            self._slot_bucket = np.concatenate([self._slot_bucket, np.zeros_like(self._slot_bucket)])
+            self._strike = np.concatenate([self._strike, np.zeros_like(self._strike)])
+            self._expiry = np.concatenate([self._expiry, np.zeros_like(self._expiry)])
+            self._is_call = np.concatenate([self._is_call, np.zeros_like(self._is_call)])
+            self._underlying = np.concatenate([self._underlying, np.zeros_like(self._underlying)])
+        self._n_slots += 1
+        return slot
+
+    def _apply(self, slot: int, sign: float) -> None:
+        contribution = sign * self._quantity[slot] * self._unit[slot]
+        self._bucket_greeks[self._slot_bucket[slot]] += contribution
+        self._totals += contribution
+
+    def add(self, contract: OptionContract, quantity: float, greeks: GreeksLike) -> None:
+        """
+        Inclui `quantity` contratos (assinada) com Greeks por contrato; uma
+        posição já existente no mesmo contrato é netada e reprecificada
+        """
+        unit = _greeks_vector(greeks)
+        slot = self._slots.get(contract.contract_id)
+        if slot is None:
+            slot = self._new_slot()
+            self._slots[contract.contract_id] = slot
+            self._underlying[slot] = contract.underlying
+            self._slot_bucket[slot] = self._bucket_for(contract)
+            self._strike[slot] = contract.strike_price
+            self._expiry[slot] = np.datetime64(contract.expiry, 'ms')
+            self._is_call[slot] = contract.is_call
+            self._bucket_count[self._slot_bucket[slot]] += 1
+            self._quantity[slot] = 0.0
+        else:
+            self._apply(slot, -1.0)
+        self._quantity[slot] += quantity
+        self._unit[slot] = unit
+        if self._quantity[slot] == 0:
+            self._release(contract.contract_id, slot)
+        else:
+            self._apply(slot, 1.0)
+
+    def remove(self, contract_id: str) -> None:
+        slot = self._slots[contract_id]
+        self._apply(slot, -1.0)
+        self._release(contract_id, slot)
+
+    def _release(self, contract_id: str, slot: int) -> None:
+        del self._slots[contract_id]
+        self._bucket_count[self._slot_bucket[slot]] -= 1
+        self._underlying[slot] = None
+        self._quantity[slot] = 0.0
+        self._unit[slot] = 0.0
+        self._free.append(slot)
+
+    def reprice(self, contract_id: str, greeks: GreeksLike) -> None:
+        """
+        Substitui as Greeks por contrato de uma posição
+        """
+        slot = self._slots[contract_id]
+        self._apply(slot, -1.0)
+        self._unit[slot] = _greeks_vector(greeks)
+        self._apply(slot, 1.0)
+
+    def reprice_all(self, analysis: AnalysisService, spot: Union[float, Mapping[str, float]],
+                    now: datetime, volatility: Union[float, Mapping[str, float]]) -> None:
+        """
+        Recalcula as Greeks de todas as posições numa chamada vetorizada
+        (um tick de mercado) e reconstrói os buckets
+        """
+        slots = self._active_slots()
+        underlying = self._underlying[slots].tolist()
+
+        def per_slot(value: Union[float, Mapping[str, float]]) -> np.ndarray:
+            if isinstance(value, Mapping):
+                return np.array([value[u] for u in underlying], dtype=np.float64)
+            return np.full(slots.size, float(value))
+
+        batch = analysis.calculate_greeks_batch(
+            per_slot(spot), self._strike[slots], np.maximum(year_fraction(self._expiry[slots], now), 0.0),
+            per_slot(volatility), self._is_call[slots]
+        )
+        self._unit[slots] = np.column_stack([getattr(batch, g) for g in GREEKS])
+        self.rebuild()
+
+    def _active_slots(self) -> np.ndarray:
+        return np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+
+    def rebuild(self) -> None:
+        """
+        Recalcula buckets e total a partir das posições, descartando o erro
+        de arredondamento acumulado pelas atualizações incrementais
+        """
+        slots = self._active_slots()
+        contribution = self._quantity[slots, None] * self._unit[slots]
+        self._bucket_greeks[:] = 0.0
+        np.add.at(self._bucket_greeks, self._slot_bucket[slots], contribution)
+        self._totals = contribution.sum(axis=0)
+
+    def totals(self) -> Dict[str, float]:
+        return dict(zip(GREEKS, self._totals.tolist()))
+
+    def position(self, contract_id: str) -> float:
+        slot = self._slots.get(contract_id)
+        return 0.0 if slot is None else float(self._quantity[slot])
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Greeks por bucket com posições abertas, indexadas por (underlying, expiry, strike)
+        """
+        n = len(self._bucket_keys)
+        live = np.flatnonzero(self._bucket_count[:n] > 0)
+        keys = [self._bucket_keys[i] for i in live.tolist()]
+        index = pd.MultiIndex.from_tuples(keys, names=list(LADDER_LEVELS)) if keys else \
+            pd.MultiIndex.from_arrays([[], [], []], names=list(LADDER_LEVELS))
+        return pd.DataFrame(self._bucket_greeks[live], index=index, columns=list(GREEKS)).sort_index()
+
+    def ladder(self, by: Union[str, Sequence[str]] = ('underlying', 'expiry')) -> pd.DataFrame:
+        """
+        Escada de Greeks agregada por um ou mais níveis do bucket
+        """
+        levels = [by] if isinstance(by, str) else list(by)
+        return self.to_frame().groupby(level=levels).sum()
+
+    @classmethod
+    def from_batch(cls, contracts: Union[Sequence[OptionContract], OptionChain],
+                   greeks: Optional[GreeksBatch] = None, quantity: Optional[ArrayLike] = None,
+                   **kwargs: Any) -> 'GreeksBook':
+        """
+        Monta o livro de uma vez a partir de contratos ou de uma OptionChain,
+        sem passar por `add`: buckets via np.unique e somas via np.add.at.
+        Numa OptionChain, as Greeks da própria cadeia (da exchange ou de
+        analyze_chain) têm precedência e `greeks` só preenche as que faltam.
+        Contratos repetidos são netados com as Greeks da última ocorrência.
+        """
+        if isinstance(contracts, OptionChain):
+            ids = contracts.contract_id
+            underlying = contracts.underlying
+            expiry = contracts.expiry
+            strike = contracts.strike
+            is_call = contracts.is_call
+            unit = np.column_stack([getattr(contracts, g) for g in GREEKS])
+            if greeks is not None:
+                computed = np.column_stack([getattr(greeks, g) for g in GREEKS])
+                unit = np.where(np.isnan(unit), computed, unit)
+        else:
+            if greeks is None:
+                raise ValueError("Informe as Greeks dos contratos")
+            ids = np.array([c.contract_id for c in contracts], dtype=str)
+            underlying = np.array([c.underlying for c in contracts], dtype=str)
+            expiry = np.array([c.expiry for c in contracts], dtype='datetime64[ms]')
+            strike = np.array([c.strike_price for c in contracts], dtype=np.float64)
+            is_call = np.array([c.is_call for c in contracts], dtype=bool)
+            unit = np.column_stack([getattr(greeks, g) for g in GREEKS])
+        n = ids.size
+        qty = np.broadcast_to(np.asarray(1.0 if quantity is None else quantity, dtype=np.float64), (n,))
+        unit = np.nan_to_num(np.asarray(unit, dtype=np.float64).reshape(n, len(GREEKS)))
+
+        # Uma linha por contrato: quantidades somadas, Greeks da última ocorrência
+        unique_ids, last, inverse = np.unique(ids[::-1], return_index=True, return_inverse=True)
+        last = n - 1 - last
+        net = np.zeros(unique_ids.size)
+        np.add.at(net, inverse.ravel(), qty[::-1])
+        open_rows = net != 0
+        rows = last[open_rows]
+        net = net[open_rows]
+
+        book = cls(capacity=max(rows.size, 1), **kwargs)
+        strike = strike[rows]
+        bucket_strike = np.floor(strike / book.strike_width) * book.strike_width if book.strike_width > 0 else strike
+        bucket_expiry = expiry[rows].astype(f'datetime64[{book.expiry_unit}]')
+        bucket_underlying = underlying[rows]
+
+        # Código do bucket combinando os códigos de cada nível
+        codes = np.zeros(rows.size, dtype=np.int64)
+        for level in (bucket_underlying, bucket_expiry, bucket_strike):
+            values, code = np.unique(level, return_inverse=True)
+            codes = codes * len(values) + code.ravel()
+        _, first, slot_bucket = np.unique(codes, return_index=True, return_inverse=True)
+        slot_bucket = slot_bucket.ravel()
+        keys: List[BucketKey] = list(zip(bucket_underlying[first].tolist(), list(bucket_expiry[first]),
+                                         bucket_strike[first].tolist()))
+
+        m = rows.size
+        book._n_slots = m
+        book._slots = dict(zip(ids[rows].tolist(), range(m)))
+        book._quantity[:m] = net
+        book._unit[:m] = unit[rows]
+        book._slot_bucket[:m] = slot_bucket
+        book._strike[:m] = strike
+        book._expiry[:m] = expiry[rows]
+        book._is_call[:m] = is_call[rows]
+        book._underlying[:m] = bucket_underlying.tolist()
+        book._buckets = dict(zip(keys, range(len(keys))))
+        book._bucket_keys = keys
+        book._bucket_count[:len(keys)] = np.bincount(slot_bucket, minlength=len(keys))
+        contribution = net[:, None] * book._unit[:m]
+        np.add.at(book._bucket_greeks, slot_bucket, contribution)
+        book._totals = contribution.sum(axis=0)
+        return book
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Marca de "ausente" em get_or_compute: None também pode ser um valor em cache
+_MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class GreeksCache:
+    """
+    Cache LRU com TTL opcional para preços e Greeks de Black-Scholes.
+
+    As entradas são quantizadas pelos ticks configurados antes de formar a
+    chave, de modo que variações menores que um tick reaproveitam o valor já
+    calculado. Todas as operações são protegidas por um lock e podem ser
+    compartilhadas entre callbacks do Dash e workers em background.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: Optional[float] = None,
+                 spot_tick: float = 0.01, strike_tick: float = 0.01,
+                 time_tick: float = 1.0 / (365 * 24 * 60), volatility_tick: float = 1e-4,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size deve ser positivo")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.spot_tick = spot_tick
+        self.strike_tick = strike_tick
+        self.time_tick = time_tick
+        self.volatility_tick = volatility_tick
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, kind: str, spot: float, strike: float, time_to_expiry: float,
+                 volatility: float, is_call: bool) -> Tuple[Any, ...]:
+        """
+        Monta a chave quantizada para um cálculo (`kind` distingue preço, Greeks, etc.)
+        """
+        return (
+            kind,
+            round(spot / self.spot_tick),
+            round(strike / self.strike_tick),
+            round(time_to_expiry / self.time_tick),
+            round(volatility / self.volatility_tick),
+            bool(is_call),
+        )
+
+    def quantize(self, spot: float, strike: float, time_to_expiry: float,
+                 volatility: float) -> Tuple[float, float, float, float]:
+        """
+        Entradas representativas do bucket: cada valor arredondado ao seu
+        tick. Tempo e volatilidade no bucket zero usam meio tick, já que
+        Black-Scholes não está definido em zero.
+        """
+        return (
+            round(spot / self.spot_tick) * self.spot_tick,
+            round(strike / self.strike_tick) * self.strike_tick,
+            max(round(time_to_expiry / self.time_tick), 0.5) * self.time_tick,
+            max(round(volatility / self.volatility_tick), 0.5) * self.volatility_tick,
+        )
+
+    def compute(self, kind: str, function: Callable[[float, float, float, float, bool], Any],
+                spot: float, strike: float, time_to_expiry: float, volatility: float, is_call: bool) -> Any:
+        """
+        Valor em cache do bucket das entradas ou `function` calculada nas
+        entradas quantizadas; assim o valor não depende de qual chamador
+        preencheu o bucket primeiro
+        """
+        key = self.make_key(kind, spot, strike, time_to_expiry, volatility, is_call)
+        return self.get_or_compute(
+            key, lambda: function(*self.quantize(spot, strike, time_to_expiry, volatility), is_call)
+        )
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Valor em cache da chave, ou `default` se ausente ou expirado
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and self._clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Retorna o valor em cache ou calcula e armazena. O cálculo roda fora do
+        lock; em caso de corrida dois workers podem calcular a mesma chave, o
+        que é inofensivo porque o resultado é determinístico.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Contadores atuais para monitoramento
+        """
+        with self._lock:
+            return {
+                "size": float(len(self._entries)),
+                "hits": float(self.stats.hits),
+                "misses": float(self.stats.misses),
+                "evictions": float(self.stats.evictions),
+                "expirations": float(self.stats.expirations),
+                "hit_rate": self.stats.hit_rate,
+            }
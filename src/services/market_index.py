@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MarketKey = Tuple[str, date, str]
+
+
+class MarketIndex:
+    """
+    Índice dos metadados de mercado do ccxt por (base, data de vencimento, tipo).
+
+    Construído uma vez a partir do resultado de load_markets, permite buscar a
+    cadeia de um vencimento em O(1) mais o tamanho do resultado. Pode ser salvo
+    em disco para que um cold start não precise esperar um load_markets completo.
+    """
+
+    def __init__(self, markets: Dict[str, Dict[str, Any]], built_at: Optional[float] = None) -> None:
+        self.markets = markets
+        self.built_at = time.time() if built_at is None else built_at
+        self.market_types: Set[str] = set()
+        self._by_key: Dict[MarketKey, List[Dict[str, Any]]] = defaultdict(list)
+        for market in markets.values():
+            market_type = market.get('type')
+            self.market_types.add(market_type)
+            expiry_date = self._expiry_date(market)
+            if expiry_date is not None:
+                self._by_key[(market.get('base'), expiry_date, market_type)].append(market)
+
+    @staticmethod
+    def _expiry_date(market: Dict[str, Any]) -> Optional[date]:
+        expiry = market.get('expiry')
+        if not expiry:
+            return None
+        # O ccxt informa o vencimento em milissegundos
+        return datetime.fromtimestamp(expiry / 1000).date()
+
+    def lookup(self, base: str, expiry: date, market_type: str = 'option') -> List[Dict[str, Any]]:
+        return list(self._by_key.get((base, expiry, market_type), ()))
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def __len__(self) -> int:
+        return len(self.markets)
+
+    def save(self, path: str) -> None:
+        """
+        Grava o snapshot de forma atômica (arquivo temporário + rename)
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'built_at': self.built_at, 'markets': self.markets}, f, default=str)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['MarketIndex']:
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            return cls(snapshot['markets'], built_at=snapshot['built_at'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Snapshot de mercados inválido em {path}: {str(e)}")
+            return None
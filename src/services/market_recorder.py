@@ -0,0 +1,338 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.clock import SimulatedClock
+
+logger = logging.getLogger(__name__)
+
+# Formato do log: cabeçalho do arquivo seguido de registros alinhados em 8 bytes.
+# Cada registro: tamanho do payload (u32), tipo (u8), padding, tamanho do
+# símbolo (u16), timestamp em segundos (f64), símbolo UTF-8 e payload.
+_FILE_MAGIC = b'OCMD\x01\x00\x00\x00'
+_RECORD_HEADER = struct.Struct('<IBxHd')
+_BOOK_HEADER = struct.Struct('<II')
+_TICKER_FIELDS = ('last', 'bid', 'ask', 'baseVolume')
+
+KIND_TICKER = 1
+KIND_ORDER_BOOK = 2
+KIND_OPTION_CHAIN = 3
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+@dataclass
+class MarketRecord:
+    kind: int
+    timestamp: float
+    symbol: str
+    payload: memoryview
+
+    def decode(self) -> Any:
+        """
+        Decodifica o payload. Livros de ofertas viram arrays (n, 2) que apontam
+        diretamente para o arquivo mapeado, sem cópia.
+        """
+        if self.kind == KIND_TICKER:
+            values = np.frombuffer(self.payload, dtype='<f8', count=len(_TICKER_FIELDS))
+            ticker: Dict[str, Any] = {'symbol': self.symbol, 'timestamp': self.timestamp * 1000}
+            for name, value in zip(_TICKER_FIELDS, values):
+                ticker[name] = None if np.isnan(value) else float(value)
+            return ticker
+        if self.kind == KIND_ORDER_BOOK:
+            n_bids, n_asks = _BOOK_HEADER.unpack_from(self.payload)
+            levels = np.frombuffer(self.payload, dtype='<f8', count=2 * (n_bids + n_asks),
+                                   offset=_BOOK_HEADER.size).reshape(-1, 2)
+            return {'symbol': self.symbol, 'timestamp': self.timestamp * 1000,
+                    'bids': levels[:n_bids], 'asks': levels[n_bids:]}
+        if self.kind == KIND_OPTION_CHAIN:
+            return json.loads(bytes(self.payload))
+        raise ValueError(f"Tipo de registro desconhecido: {self.kind}")
+
+
+class MarketRecorder:
+    """
+    Grava tickers, livros de ofertas e cadeias de opções em um log binário
+    compacto e somente-append, lido depois pelo MarketLog/ReplayService.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if is_new:
+            self._file.write(_FILE_MAGIC)
+        self.records_written = 0
+
+    def _write(self, kind: int, symbol: str, payload: bytes, timestamp: Optional[float]) -> None:
+        encoded_symbol = symbol.encode('utf-8')
+        timestamp = time.time() if timestamp is None else timestamp
+        self._file.write(_RECORD_HEADER.pack(len(payload), kind, len(encoded_symbol), timestamp))
+        self._file.write(encoded_symbol + b'\0' * _padding(len(encoded_symbol)))
+        self._file.write(payload + b'\0' * _padding(len(payload)))
+        self.records_written += 1
+
+    def record_ticker(self, symbol: str, ticker: Dict[str, Any], timestamp: Optional[float] = None) -> None:
+        values = [ticker.get(name) for name in _TICKER_FIELDS]
+        payload = np.array([np.nan if v is None else v for v in values], dtype='<f8').tobytes()
+        if timestamp is None and ticker.get('timestamp'):
+            timestamp = ticker['timestamp'] / 1000
+        self._write(KIND_TICKER, symbol, payload, timestamp)
+
+    def record_order_book(self, symbol: str, bids: Iterable[Any], asks: Iterable[Any],
+                          timestamp: Optional[float] = None) -> None:
+        bid_levels = np.asarray([level[:2] for level in bids], dtype='<f8').reshape(-1, 2)
+        ask_levels = np.asarray([level[:2] for level in asks], dtype='<f8').reshape(-1, 2)
+        payload = _BOOK_HEADER.pack(len(bid_levels), len(ask_levels)) + bid_levels.tobytes() + ask_levels.tobytes()
+        self._write(KIND_ORDER_BOOK, symbol, payload, timestamp)
+
+    def record_option_chain(self, symbol: str, expiry: datetime, options: List[Dict[str, Any]],
+                            timestamp: Optional[float] = None) -> None:
+        payload = json.dumps({'expiry': expiry.timestamp(), 'options': options},
+                             separators=(',', ':'), default=str).encode('utf-8')
+        self._write(KIND_OPTION_CHAIN, symbol, payload, timestamp)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'MarketRecorder':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class MarketLog:
+    """
+    Leitura de um log gravado pelo MarketRecorder via memory-mapping: os
+    registros são percorridos sobre o mapa sem carregar o arquivo na memória.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if self._map is None or self._map[:len(_FILE_MAGIC)] != _FILE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} não é um log de mercado válido")
+        self._view = memoryview(self._map)
+
+    def __iter__(self) -> Iterator[MarketRecord]:
+        return self.scan()
+
+    def scan(self, kinds: Optional[Iterable[int]] = None, symbols: Optional[Iterable[str]] = None,
+             start: Optional[float] = None, end: Optional[float] = None) -> Iterator[MarketRecord]:
+        """
+        Percorre os registros em ordem, filtrando por tipo, símbolo e intervalo
+        de tempo. Registros descartados nunca têm o payload lido.
+        """
+        kind_filter = set(kinds) if kinds is not None else None
+        symbol_filter = set(symbols) if symbols is not None else None
+        view = self._view
+        offset = len(_FILE_MAGIC)
+        total = len(view)
+        while offset + _RECORD_HEADER.size <= total:
+            length, kind, symbol_length, timestamp = _RECORD_HEADER.unpack_from(view, offset)
+            symbol_start = offset + _RECORD_HEADER.size
+            payload_start = symbol_start + symbol_length + _padding(symbol_length)
+            next_offset = payload_start + length + _padding(length)
+            if next_offset > total:
+                # Registro incompleto no fim do arquivo (gravação em andamento)
+                break
+            offset = next_offset
+            if end is not None and timestamp > end:
+                continue
+            if (kind_filter is not None and kind not in kind_filter) or (start is not None and timestamp < start):
+                continue
+            symbol = bytes(view[symbol_start:symbol_start + symbol_length]).decode('utf-8')
+            if symbol_filter is not None and symbol not in symbol_filter:
+                continue
+            yield MarketRecord(kind, timestamp, symbol, view[payload_start:payload_start + length])
+
+    def close(self) -> None:
+        try:
+            if hasattr(self, '_view'):
+                self._view.release()
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # Arrays decodificados ainda apontam para o mapa; ele é liberado junto com eles
+            pass
+        self._file.close()
+
+    def __enter__(self) -> 'MarketLog':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ReplayService:
+    """
+    Fonte de dados que reproduz um log gravado com a mesma interface do
+    CCXTService (fetch_options_data, get_underlying_price(s), close) e com
+    watch_ticker/watch_order_book, podendo alimentar um MarketStream.
+
+    `speed` controla a reprodução: 1.0 em tempo real, valores maiores
+    acelerados e None o mais rápido possível. O relógio simulado acompanha o
+    timestamp do último registro aplicado. Como no ccxt.pro, watch_* entrega
+    a atualização mais recente ainda não entregue de cada (tipo, símbolo), ou
+    espera a próxima; em replays acelerados atualizações intermediárias podem
+    ser agregadas, mas o estado final é sempre o do log. Ao fim do log, cada
+    watch_* ainda recebe a última atualização pendente antes de
+    StopAsyncIteration.
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = None,
+                 clock: Optional[SimulatedClock] = None) -> None:
+        if speed is not None and speed <= 0:
+            raise ValueError("speed deve ser positivo ou None")
+        self.log = MarketLog(path)
+        self.speed = speed
+        self.clock = clock or SimulatedClock(datetime.fromtimestamp(0))
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.order_books: Dict[str, Dict[str, Any]] = {}
+        self.option_chains: Dict[Tuple[str, Any], List[Dict[str, Any]]] = {}
+        self.finished = False
+        self._records = self.log.scan()
+        self._pending: Optional[MarketRecord] = None
+        self._watchers: Dict[Tuple[int, str], List["asyncio.Future[Dict[str, Any]]"]] = defaultdict(list)
+        # Última atualização de cada (tipo, símbolo) aplicada sem watch_* esperando
+        self._unseen: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+    def _apply(self, record: MarketRecord) -> None:
+        data = record.decode()
+        self.clock.set(datetime.fromtimestamp(record.timestamp))
+        if record.kind == KIND_TICKER:
+            self.tickers[record.symbol] = data
+        elif record.kind == KIND_ORDER_BOOK:
+            self.order_books[record.symbol] = data
+        else:
+            expiry = datetime.fromtimestamp(data['expiry']).date()
+            self.option_chains[(record.symbol, expiry)] = data['options']
+        delivered = False
+        for future in self._watchers.pop((record.kind, record.symbol), []):
+            if not future.done():
+                future.set_result(data)
+                delivered = True
+        if delivered:
+            self._unseen.pop((record.kind, record.symbol), None)
+        else:
+            self._unseen[(record.kind, record.symbol)] = data
+
+    def step(self) -> Optional[MarketRecord]:
+        """
+        Aplica o próximo registro do log; retorna None no fim
+        """
+        record = self._pending or next(self._records, None)
+        self._pending = None
+        if record is None:
+            self._finish()
+            return None
+        self._apply(record)
+        return record
+
+    def advance_to(self, timestamp: float) -> int:
+        """
+        Aplica todos os registros até `timestamp` (uso síncrono, ex. backtests)
+        """
+        applied = 0
+        while True:
+            record = self._pending or next(self._records, None)
+            self._pending = None
+            if record is None:
+                self._finish()
+                return applied
+            if record.timestamp > timestamp:
+                self._pending = record
+                return applied
+            self._apply(record)
+            applied += 1
+
+    async def play(self) -> int:
+        """
+        Reproduz o log respeitando `speed`; retorna o número de registros aplicados
+        """
+        applied = 0
+        first_ts: Optional[float] = None
+        started = time.monotonic()
+        while True:
+            record = self._pending or next(self._records, None)
+            self._pending = None
+            if record is None:
+                break
+            if self.speed is not None:
+                first_ts = record.timestamp if first_ts is None else first_ts
+                due = (record.timestamp - first_ts) / self.speed - (time.monotonic() - started)
+                if due > 0:
+                    await asyncio.sleep(due)
+            self._apply(record)
+            applied += 1
+            if self.speed is None and applied % 1000 == 0:
+                # Cede o loop para que assinantes acompanhem o replay
+                await asyncio.sleep(0)
+        self._finish()
+        return applied
+
+    def _finish(self) -> None:
+        self.finished = True
+        for futures in self._watchers.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(StopAsyncIteration())
+        self._watchers.clear()
+
+    async def _watch(self, kind: int, symbol: str) -> Dict[str, Any]:
+        unseen = self._unseen.pop((kind, symbol), None)
+        if unseen is not None:
+            return unseen
+        if self.finished:
+            raise StopAsyncIteration()
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._watchers[(kind, symbol)].append(future)
+        return await future
+
+    async def watch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return await self._watch(KIND_TICKER, symbol)
+
+    async def watch_order_book(self, symbol: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        return await self._watch(KIND_ORDER_BOOK, symbol)
+
+    async def fetch_options_data(self, symbol: str, expiry: datetime) -> List[Dict[str, Any]]:
+        if symbol == "BTC/USD":
+            symbol = "BTC/USDT"
+        return list(self.option_chains.get((symbol.split('/')[0], expiry.date()), []))
+
+    async def get_underlying_price(self, symbol: str) -> float:
+        if symbol.endswith('/USD'):
+            symbol = symbol.replace('/USD', '/USDT')
+        ticker = self.tickers.get(symbol)
+        return ticker['last'] if ticker and ticker.get('last') is not None else 0.0
+
+    async def get_underlying_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        return {symbol: await self.get_underlying_price(symbol) for symbol in dict.fromkeys(symbols)}
+
+    async def close(self) -> None:
+        self.tickers.clear()
+        self.order_books.clear()
+        self.option_chains.clear()
+        self._unseen.clear()
+        self._records = iter(())
+        self._pending = None
+        self.log.close()
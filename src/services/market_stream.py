@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MarketUpdate:
+    kind: str  # 'ticker' ou 'order_book'
+    symbol: str
+    timestamp: float
+    data: Any  # dict do ticker ou OrderBookSnapshot
+
+
+@dataclass(frozen=True)
+class OrderBookSnapshot:
+    """
+    Cópia imutável dos melhores níveis de um livro no instante `timestamp`;
+    `bids` e `asks` são arrays (níveis, 2) de preço e quantidade, do melhor
+    para o pior. É o que as atualizações de order book publicam, para que
+    uma atualização enfileirada não mude quando o livro vivo muda.
+    """
+    symbol: str
+    timestamp: float
+    bids: np.ndarray
+    asks: np.ndarray
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return float(self.bids[0, 0]) if len(self.bids) else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return float(self.asks[0, 0]) if len(self.asks) else None
+
+    @property
+    def mid(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return (self.best_bid + self.best_ask) / 2
+
+
+class OrderBook:
+    """
+    Livro de ofertas em memória de um contrato, atualizado por snapshots
+    completos (o formato do watch_order_book do ccxt.pro). Cada lado guarda
+    os preços numa lista ordenada (bids negados).
+    """
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+        self.timestamp = 0.0
+        self._amounts: Dict[str, Dict[float, float]] = {'bid': {}, 'ask': {}}
+        self._keys: Dict[str, List[float]] = {'bid': [], 'ask': []}
+
+    @staticmethod
+    def _key(side: str, price: float) -> float:
+        return -price if side == 'bid' else price
+
+    def apply_snapshot(self, bids: Iterable[Any], asks: Iterable[Any],
+                       timestamp: Optional[float] = None) -> None:
+        for side, levels in (('bid', bids), ('ask', asks)):
+            amounts = {float(level[0]): float(level[1]) for level in levels if float(level[1]) > 0}
+            self._amounts[side] = amounts
+            self._keys[side] = sorted(self._key(side, price) for price in amounts)
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    def _levels(self, side: str, depth: Optional[int]) -> List[Tuple[float, float]]:
+        keys = self._keys[side] if depth is None else self._keys[side][:depth]
+        amounts = self._amounts[side]
+        return [(abs(key), amounts[abs(key)]) for key in keys]
+
+    @property
+    def bids(self) -> List[Tuple[float, float]]:
+        return self._levels('bid', None)
+
+    @property
+    def asks(self) -> List[Tuple[float, float]]:
+        return self._levels('ask', None)
+
+    def top(self, depth: int = 5) -> Dict[str, List[Tuple[float, float]]]:
+        return {'bids': self._levels('bid', depth), 'asks': self._levels('ask', depth)}
+
+    def snapshot(self, depth: Optional[int] = None) -> OrderBookSnapshot:
+        """
+        Cópia dos `depth` melhores níveis de cada lado (todos, sem depth)
+        """
+        def side_array(side: str) -> np.ndarray:
+            return np.array(self._levels(side, depth), dtype=np.float64).reshape(-1, 2)
+
+        return OrderBookSnapshot(self.symbol, self.timestamp, side_array('bid'), side_array('ask'))
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return -self._keys['bid'][0] if self._keys['bid'] else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return self._keys['ask'][0] if self._keys['ask'] else None
+
+    @property
+    def mid(self) -> Optional[float]:
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return (self.best_bid + self.best_ask) / 2
+
+
+class MarketStream:
+    """
+    Feed de dados de mercado por streaming sobre a interface do ccxt.pro
+    (watch_ticker / watch_order_book). Mantém o último ticker e o livro de
+    ofertas de cada contrato e publica as atualizações para assinantes via
+    asyncio.Queue. Qualquer objeto com esses métodos serve como exchange, o
+    que permite dirigir o feed por um replay local ou um stub nos testes.
+    """
+
+    def __init__(self, exchange: Any, order_book_depth: Optional[int] = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0,
+                 recorder: Optional[Any] = None) -> None:
+        self.exchange = exchange
+        self.recorder = recorder  # MarketRecorder opcional
+        self.order_book_depth = order_book_depth
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.order_books: Dict[str, OrderBook] = {}
+        self.dropped_updates = 0
+        self._subscribers: Dict["asyncio.Queue[MarketUpdate]", Optional[Set[str]]] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    def subscribe(self, symbols: Optional[Iterable[str]] = None,
+                  maxsize: int = 1000) -> "asyncio.Queue[MarketUpdate]":
+        """
+        Cria uma fila de atualizações, opcionalmente filtrada por símbolos.
+        Quando um assinante lento enche a fila, a atualização mais antiga é
+        descartada para que o feed nunca bloqueie.
+        """
+        queue: "asyncio.Queue[MarketUpdate]" = asyncio.Queue(maxsize=maxsize)
+        self._subscribers[queue] = set(symbols) if symbols is not None else None
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[MarketUpdate]") -> None:
+        self._subscribers.pop(queue, None)
+
+    def start(self, symbols: Iterable[str], tickers: bool = True, order_books: bool = True) -> None:
+        for symbol in symbols:
+            if tickers:
+                self._tasks.append(asyncio.ensure_future(self._watch(symbol, 'ticker')))
+            if order_books:
+                self._tasks.append(asyncio.ensure_future(self._watch(symbol, 'order_book')))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def get_ticker(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self.tickers.get(symbol)
+
+    def get_order_book(self, symbol: str) -> Optional[OrderBook]:
+        return self.order_books.get(symbol)
+
+    async def _watch(self, symbol: str, kind: str) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                if kind == 'ticker':
+                    ticker = await self.exchange.watch_ticker(symbol)
+                    self._on_ticker(symbol, ticker)
+                else:
+                    book = await self.exchange.watch_order_book(symbol, self.order_book_depth)
+                    self._on_order_book(symbol, book)
+                delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except StopAsyncIteration:
+                # Fonte finita (replay) terminou
+                return
+            except Exception as e:
+                logger.warning(f"Erro no stream de {kind} para {symbol}: {str(e)}; reconectando em {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _on_ticker(self, symbol: str, ticker: Dict[str, Any]) -> None:
+        self.tickers[symbol] = ticker
+        timestamp = ticker.get('timestamp') or time.time() * 1000
+        if self.recorder is not None:
+            self.recorder.record_ticker(symbol, ticker, timestamp / 1000)
+        self._publish(MarketUpdate('ticker', symbol, timestamp / 1000, ticker))
+
+    def _on_order_book(self, symbol: str, book: Dict[str, Any]) -> None:
+        order_book = self.order_books.get(symbol)
+        if order_book is None:
+            order_book = self.order_books[symbol] = OrderBook(symbol)
+        timestamp = (book.get('timestamp') or time.time() * 1000) / 1000
+        order_book.apply_snapshot(book.get('bids', []), book.get('asks', []), timestamp)
+        if self.recorder is not None:
+            self.recorder.record_order_book(symbol, book.get('bids', []), book.get('asks', []), timestamp)
+        self._publish(MarketUpdate('order_book', symbol, timestamp, order_book.snapshot(self.order_book_depth)))
+
+    def _publish(self, update: MarketUpdate) -> None:
+        for queue, symbols in self._subscribers.items():
+            if symbols is not None and update.symbol not in symbols:
+                continue
+            if queue.full():
+                queue.get_nowait()
+                self.dropped_updates += 1
+            queue.put_nowait(update)
@@ -0,0 +1,258 @@
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+from numpy.typing import ArrayLike
+from scipy.special import ndtri
+
+from services.analysis_service import AnalysisService
+from services.scenario_engine import DAYS_PER_YEAR, ScenarioLegs
+
+UnderlyingParam = Union[float, Mapping[str, float]]
+
+
+@dataclass
+class MonteCarloModel:
+    """
+    Dinâmica dos subjacentes no horizonte: GBM correlacionado, com saltos de
+    Merton opcionais (`jump_intensity` por ano, tamanho log-normal) e choque
+    log-normal opcional na volatilidade implícita (`vol_of_vol`), correlacionado
+    ao retorno do próprio subjacente por `spot_vol_correlation`.
+    """
+    volatility: np.ndarray       # por subjacente, anualizada
+    correlation: np.ndarray      # (subjacentes, subjacentes)
+    drift: np.ndarray
+    jump_intensity: float = 0.0
+    jump_mean: float = 0.0
+    jump_std: float = 0.0
+    vol_of_vol: float = 0.0
+    spot_vol_correlation: float = 0.0
+    cholesky: Optional[np.ndarray] = None  # fator pré-calculado da correlação, se houver
+
+    def sample(self, rng: np.random.Generator, n_paths: int, horizon: float,
+               cholesky: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Log-retornos (caminhos x subjacentes) e multiplicadores da volatilidade implícita
+        """
+        n_underlyings = self.volatility.size
+        z = rng.standard_normal((n_paths, n_underlyings)) @ cholesky.T
+        compensator = self.jump_intensity * (math.exp(self.jump_mean + 0.5 * self.jump_std ** 2) - 1.0)
+        log_returns = ((self.drift - 0.5 * self.volatility ** 2 - compensator) * horizon
+                       + self.volatility * math.sqrt(horizon) * z)
+        if self.jump_intensity > 0:
+            n_jumps = rng.poisson(self.jump_intensity * horizon, (n_paths, n_underlyings))
+            log_returns += n_jumps * self.jump_mean + np.sqrt(n_jumps) * self.jump_std * rng.standard_normal(n_jumps.shape)
+        vol_multiplier = np.ones((n_paths, n_underlyings))
+        if self.vol_of_vol > 0:
+            rho = self.spot_vol_correlation
+            z_vol = rho * z + math.sqrt(1.0 - rho * rho) * rng.standard_normal(z.shape)
+            vol_multiplier = np.exp(self.vol_of_vol * math.sqrt(horizon) * z_vol - 0.5 * self.vol_of_vol ** 2 * horizon)
+        return log_returns, vol_multiplier
+
+
+@dataclass
+class MonteCarloRisk:
+    """
+    VaR e ES no mesmo sinal de RiskService._calculate_var: quantil do PnL
+    (negativo = perda), com intervalos de confiança aproximados
+    """
+    value_at_risk: float
+    expected_shortfall: float
+    var_interval: Tuple[float, float]
+    es_interval: Tuple[float, float]
+    confidence_level: float
+    n_paths: int
+    base_value: float
+    pnl: Optional[np.ndarray] = None
+
+
+def _simulate_chunk(seed: np.random.SeedSequence, n_paths: int, state: Dict[str, Any]) -> np.ndarray:
+    """
+    PnL do portfolio em `n_paths` caminhos; reprecifica em blocos para que a
+    matriz caminhos x pernas não passe de `max_block_elements`
+    """
+    legs: ScenarioLegs = state['legs']
+    model: MonteCarloModel = state['model']
+    analysis: AnalysisService = state['analysis']
+    horizon: float = state['horizon']
+    leg_index: np.ndarray = state['leg_index']
+    base: np.ndarray = state['base']
+
+    rng = np.random.default_rng(seed)
+    log_returns, vol_multiplier = model.sample(rng, n_paths, horizon, state['cholesky'])
+    t = np.maximum(legs.time_to_expiry - horizon, 0.0)
+    block = max(1, state['max_block_elements'] // max(len(legs), 1))
+    pnl = np.empty(n_paths)
+    for start in range(0, n_paths, block):
+        rows = slice(start, start + block)
+        spot = legs.spot * np.exp(log_returns[rows][:, leg_index])
+        vol = legs.volatility * vol_multiplier[rows][:, leg_index]
+        prices = analysis.calculate_price_batch(spot, legs.strike, t, vol, legs.is_call)
+        pnl[rows] = (prices - base) @ legs.quantity
+    return pnl
+
+
+def _simulate_batch(state: Dict[str, Any], seeds: List[np.random.SeedSequence], sizes: List[int]) -> List[np.ndarray]:
+    """
+    Vários chunks numa tarefa do pool, para o estado ser enviado uma vez por worker
+    """
+    return [_simulate_chunk(seed, n, state) for seed, n in zip(seeds, sizes)]
+
+
+class MonteCarloEngine:
+    """
+    VaR/ES por Monte Carlo com reavaliação completa das opções no horizonte.
+
+    Os caminhos são gerados em chunks de tamanho fixo, cada um com sua própria
+    semente derivada de um SeedSequence; o resultado depende apenas de `seed`
+    e `chunk_size`, não do número de workers. Com mais de um worker e pelo
+    menos `min_parallel_paths` caminhos, os chunks rodam num pool de processos
+    criado na primeira chamada e reaproveitado pelas seguintes, que recebe as
+    pernas uma vez por worker a cada simulação; `close()` encerra o pool.
+    Simulações menores rodam no próprio processo, onde subir e alimentar o
+    pool custaria mais que a simulação.
+    """
+
+    def __init__(self, analysis: Optional[AnalysisService] = None, chunk_size: int = 50_000,
+                 max_workers: Optional[int] = None, max_block_elements: int = 1_000_000,
+                 min_parallel_paths: int = 200_000) -> None:
+        self.analysis = analysis or AnalysisService()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_block_elements = max_block_elements
+        self.min_parallel_paths = min_parallel_paths
+        self._executor: Optional[Executor] = None
+
+    def __enter__(self) -> 'MonteCarloEngine':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def build_model(self, legs: ScenarioLegs, underlying_volatility: Optional[UnderlyingParam] = None,
+                    correlation: Optional[ArrayLike] = None, drift: UnderlyingParam = 0.0,
+                    cholesky: Optional[np.ndarray] = None,
+                    **dynamics: float) -> Tuple[MonteCarloModel, List[str], np.ndarray]:
+        """
+        Modelo por subjacente e o índice subjacente de cada perna. Sem
+        `underlying_volatility`, usa a média das volatilidades das pernas de cada subjacente.
+        """
+        underlying = legs.underlying if legs.underlying is not None else np.zeros(len(legs), dtype=str)
+        names, leg_index = np.unique(underlying, return_inverse=True)
+        names_list = [str(name) for name in names]
+
+        def per_underlying(value: Optional[UnderlyingParam], default: np.ndarray) -> np.ndarray:
+            if value is None:
+                return default
+            if isinstance(value, Mapping):
+                return np.array([value[name] for name in names_list], dtype=np.float64)
+            return np.full(len(names_list), float(value))
+
+        mean_vol = np.bincount(leg_index, weights=legs.volatility) / np.bincount(leg_index)
+        corr = np.eye(len(names_list)) if correlation is None else np.asarray(correlation, dtype=np.float64)
+        if corr.shape != (len(names_list), len(names_list)):
+            raise ValueError("A matriz de correlação deve ter um elemento por par de subjacentes")
+        model = MonteCarloModel(
+            volatility=per_underlying(underlying_volatility, mean_vol),
+            correlation=corr,
+            drift=per_underlying(drift, np.zeros(len(names_list))),
+            cholesky=cholesky,
+            **dynamics
+        )
+        return model, names_list, leg_index
+
+    def simulate_pnl(self, legs: ScenarioLegs, model: MonteCarloModel, leg_index: np.ndarray,
+                     horizon_days: float = 1.0, n_paths: int = 1_000_000,
+                     seed: Optional[int] = None) -> Tuple[np.ndarray, float]:
+        horizon = horizon_days / DAYS_PER_YEAR
+        base = self.analysis.calculate_price_batch(legs.spot, legs.strike, legs.time_to_expiry,
+                                                   legs.volatility, legs.is_call)
+        # Cópia sem cache nem relógio externo: o estado precisa ser serializável para o pool
+        analysis = AnalysisService()
+        analysis.risk_free_rate = self.analysis.risk_free_rate
+        state = {
+            'legs': legs,
+            'model': model,
+            'analysis': analysis,
+            'horizon': horizon,
+            'leg_index': leg_index,
+            'base': base,
+            'cholesky': model.cholesky if model.cholesky is not None else np.linalg.cholesky(model.correlation),
+            'max_block_elements': self.max_block_elements,
+        }
+        sizes = [min(self.chunk_size, n_paths - start) for start in range(0, n_paths, self.chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        if self.max_workers == 1 or len(sizes) == 1 or n_paths < self.min_parallel_paths:
+            chunks = _simulate_batch(state, seeds, sizes)
+        else:
+            # Chunks contíguos por tarefa: a ordem (e o resultado) não depende do número de workers
+            n_tasks = min(self.max_workers, len(sizes))
+            bounds = np.linspace(0, len(sizes), n_tasks + 1).astype(int).tolist()
+            executor = self._get_executor()
+            futures = [executor.submit(_simulate_batch, state, seeds[a:b], sizes[a:b])
+                       for a, b in zip(bounds[:-1], bounds[1:])]
+            chunks = [chunk for future in futures for chunk in future.result()]
+        return np.concatenate(chunks), float(base @ legs.quantity)
+
+    def value_at_risk(self, legs: ScenarioLegs, confidence_level: float = 0.95,
+                      horizon_days: float = 1.0, n_paths: int = 1_000_000,
+                      underlying_volatility: Optional[UnderlyingParam] = None,
+                      correlation: Optional[ArrayLike] = None, drift: UnderlyingParam = 0.0,
+                      cholesky: Optional[np.ndarray] = None,
+                      seed: Optional[int] = None, keep_paths: bool = False,
+                      **dynamics: float) -> MonteCarloRisk:
+        """
+        Simula `n_paths` caminhos até `horizon_days`, reprecifica as pernas e
+        resume a cauda do PnL; `keep_paths` devolve também o PnL de cada caminho
+        """
+        model, _, leg_index = self.build_model(legs, underlying_volatility, correlation, drift, cholesky, **dynamics)
+        pnl, base_value = self.simulate_pnl(legs, model, leg_index, horizon_days, n_paths, seed)
+        risk = tail_statistics(pnl, confidence_level)
+        risk.base_value = base_value
+        if keep_paths:
+            risk.pnl = pnl
+        return risk
+
+
+def tail_statistics(pnl: np.ndarray, confidence_level: float = 0.95, ci_level: float = 0.95) -> MonteCarloRisk:
+    """
+    VaR como quantil (1 - confiança) do PnL e ES como média abaixo dele.
+    O intervalo do VaR vem das estatísticas de ordem (binomial); o do ES,
+    da variância assintótica do estimador de média da cauda.
+    """
+    n = pnl.size
+    tail_prob = 1.0 - confidence_level
+    z = float(ndtri(0.5 + ci_level / 2))
+    sorted_pnl = np.sort(pnl)
+    k = int(math.floor(n * tail_prob))
+    var = float(sorted_pnl[max(k - 1, 0)])
+    half_width = z * math.sqrt(n * tail_prob * (1 - tail_prob))
+    lower = sorted_pnl[max(int(math.floor(k - half_width)) - 1, 0)]
+    upper = sorted_pnl[min(int(math.ceil(k + half_width)) - 1, n - 1)]
+
+    tail = sorted_pnl[:max(k, 1)]
+    es = float(tail.mean())
+    es_std = math.sqrt((tail.var() + confidence_level * (es - var) ** 2) / (n * tail_prob)) if n * tail_prob >= 1 else 0.0
+    return MonteCarloRisk(
+        value_at_risk=var,
+        expected_shortfall=es,
+        var_interval=(float(lower), float(upper)),
+        es_interval=(es - z * es_std, es + z * es_std),
+        confidence_level=confidence_level,
+        n_paths=n,
+        base_value=0.0,
+    )
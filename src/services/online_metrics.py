@@ -0,0 +1,138 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Tuple
+
+
+@dataclass
+class RunningStats:
+    """
+    Média e variância amostral pelo algoritmo de Welford, O(1) por observação
+    """
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+@dataclass
+class DrawdownTracker:
+    """
+    Pico corrente e máximo drawdown relativo da curva de equity
+    """
+    peak: float = -math.inf
+    max_drawdown: float = 0.0
+
+    def update(self, equity: float) -> float:
+        if equity > self.peak:
+            self.peak = equity
+        drawdown = (self.peak - equity) / self.peak if self.peak > 0 else 0.0
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+        return drawdown
+
+
+@dataclass
+class RoundTripTracker:
+    """
+    PnL realizado por instrumento com preço médio de entrada. Cada operação
+    que reduz ou inverte uma posição fecha uma ida-e-volta e conta como ganho
+    ou perda conforme o PnL realizado daquela parcela.
+    """
+    wins: int = 0
+    losses: int = 0
+    realized_pnl: float = 0.0
+    _positions: Dict[Hashable, Tuple[float, float]] = field(default_factory=dict)
+
+    def record(self, instrument: Hashable, quantity: float, price: float) -> float:
+        """
+        Registra uma execução com quantidade assinada (positiva = compra) e
+        devolve o PnL realizado por ela
+        """
+        position, average = self._positions.get(instrument, (0.0, 0.0))
+        realized = 0.0
+        if position != 0 and (position > 0) != (quantity > 0):
+            closed = min(abs(quantity), abs(position))
+            realized = closed * (price - average) * (1.0 if position > 0 else -1.0)
+            self.realized_pnl += realized
+            if realized > 0:
+                self.wins += 1
+            elif realized < 0:
+                self.losses += 1
+
+        new_position = position + quantity
+        if abs(new_position) < 1e-12:
+            self._positions.pop(instrument, None)
+            return realized
+        if position == 0 or (position > 0) != (new_position > 0):
+            # Posição nova ou invertida: o restante entra ao preço desta execução
+            average = price
+        elif (position > 0) == (quantity > 0):
+            average = (position * average + quantity * price) / new_position
+        self._positions[instrument] = (new_position, average)
+        return realized
+
+    def position(self, instrument: Hashable) -> float:
+        return self._positions.get(instrument, (0.0, 0.0))[0]
+
+    @property
+    def round_trips(self) -> int:
+        return self.wins + self.losses
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.round_trips if self.round_trips else 0.0
+
+
+class OnlineMetrics:
+    """
+    Métricas de performance atualizadas incrementalmente a cada ponto de
+    equity e a cada execução, sem reprocessar o histórico. Serve tanto ao
+    BacktestService quanto a um monitor de PnL ao vivo: snapshot() devolve
+    as mesmas chaves de BacktestResult.metrics a qualquer momento.
+    """
+
+    def __init__(self, initial_capital: float, periods_per_year: float = 252.0) -> None:
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+        self.returns = RunningStats()
+        self.drawdown = DrawdownTracker()
+        self.round_trips = RoundTripTracker()
+        self.equity = initial_capital
+        self.drawdown.update(initial_capital)
+
+    def update_equity(self, equity: float) -> None:
+        if self.equity != 0:
+            self.returns.update(equity / self.equity - 1.0)
+        self.equity = equity
+        self.drawdown.update(equity)
+
+    def record_trade(self, instrument: Hashable, quantity: float, price: float) -> float:
+        return self.round_trips.record(instrument, quantity, price)
+
+    @property
+    def sharpe_ratio(self) -> float:
+        std = self.returns.std
+        if self.returns.count < 2 or std == 0:
+            return 0.0
+        return self.returns.mean / std * math.sqrt(self.periods_per_year)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "total_return": (self.equity - self.initial_capital) / self.initial_capital,
+            "sharpe_ratio": self.sharpe_ratio,
+            "max_drawdown": self.drawdown.max_drawdown,
+            "win_rate": self.round_trips.win_rate,
+        }
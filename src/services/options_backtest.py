@@ -0,0 +1,279 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from models.market_model import MarketData, OptionContract
+from services.analysis_service import AnalysisService
+from services.backtest_service import (
+    BacktestResult, CandleArrays, CandleWindow, _performance_metrics, as_candle_arrays
+)
+from services.online_metrics import RoundTripTracker
+from services.trade_ledger import CATEGORY, POSITION_FIELDS, Ledger, LedgerView
+from utils.clock import SimulatedClock, year_fraction
+
+Order = Tuple[OptionContract, float]
+
+OPTION_TRADE_FIELDS: List[Tuple[str, str]] = [
+    ('timestamp', 'datetime64[us]'),
+    ('contract_id', CATEGORY),
+    ('side', CATEGORY),
+    ('quantity', 'float64'),
+    ('price', 'float64'),
+    ('value', 'float64'),
+    ('cash', 'float64'),
+]
+
+# Um registro por candle: os campos de POSITION_FIELDS (position = quantidade
+# líquida das pernas abertas) mais o número de pernas e o valor marcado delas
+OPTION_POSITION_FIELDS: List[Tuple[str, str]] = POSITION_FIELDS + [
+    ('open_legs', 'int64'),
+    ('position_value', 'float64'),
+]
+
+SETTLEMENT_FIELDS: List[Tuple[str, str]] = [
+    ('timestamp', 'datetime64[us]'),
+    ('contract_id', CATEGORY),
+    ('quantity', 'float64'),
+    ('spot', 'float64'),
+    ('value', 'float64'),
+]
+
+
+class OptionLegs:
+    """
+    Pernas abertas em colunas NumPy (uma linha por contrato). Ordens no mesmo
+    contract_id somam quantidade à linha existente; linhas zeradas ou vencidas
+    são removidas, de modo que o tamanho acompanha o número de pernas abertas.
+    """
+
+    def __init__(self) -> None:
+        self.contracts: List[OptionContract] = []
+        self.strike = np.empty(0)
+        self.expiry = np.empty(0, dtype='datetime64[ms]')
+        self.is_call = np.empty(0, dtype=bool)
+        self.quantity = np.empty(0)
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def add(self, contracts: Sequence[OptionContract], quantities: np.ndarray) -> None:
+        """
+        Soma as quantidades às pernas; o mesmo contrato repetido no lote é agregado antes
+        """
+        ids, first, inverse = np.unique([c.contract_id for c in contracts], return_index=True, return_inverse=True)
+        totals = np.zeros(len(ids))
+        np.add.at(totals, inverse.ravel(), quantities)
+        new_contracts = []
+        new_quantities = []
+        for index, quantity in zip(first.tolist(), totals.tolist()):
+            contract = contracts[index]
+            row = self._rows.get(contract.contract_id)
+            if row is not None:
+                self.quantity[row] += quantity
+            else:
+                self._rows[contract.contract_id] = len(self.contracts) + len(new_contracts)
+                new_contracts.append(contract)
+                new_quantities.append(quantity)
+        if new_contracts:
+            self.contracts.extend(new_contracts)
+            self.strike = np.concatenate([self.strike, [c.strike_price for c in new_contracts]])
+            self.expiry = np.concatenate([self.expiry, np.array([c.expiry for c in new_contracts], dtype='datetime64[ms]')])
+            self.is_call = np.concatenate([self.is_call, [c.is_call for c in new_contracts]])
+            self.quantity = np.concatenate([self.quantity, new_quantities])
+        self.remove(self.quantity == 0)
+
+    def remove(self, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        keep = ~mask
+        self.contracts = [c for c, k in zip(self.contracts, keep.tolist()) if k]
+        self.strike = self.strike[keep]
+        self.expiry = self.expiry[keep]
+        self.is_call = self.is_call[keep]
+        self.quantity = self.quantity[keep]
+        self._rows = {c.contract_id: i for i, c in enumerate(self.contracts)}
+
+
+@dataclass
+class OptionsBacktestState:
+    """
+    O que a estratégia enxerga a cada passo. `window` é a view dos candles do
+    subjacente até o passo atual; `legs` não deve ser alterado diretamente.
+    """
+    window: CandleWindow
+    legs: OptionLegs
+    timestamp: datetime
+    spot: float
+    volatility: float
+    cash: float
+    equity: float
+
+    def close_all(self) -> List[Order]:
+        """
+        Ordens que zeram todas as pernas abertas
+        """
+        return [(contract, -float(q)) for contract, q in zip(self.legs.contracts, self.legs.quantity)]
+
+
+@dataclass
+class OptionsBacktestResult(BacktestResult):
+    timestamps: np.ndarray = field(default_factory=lambda: np.empty(0, dtype='datetime64[us]'))
+    position_value: np.ndarray = field(default_factory=lambda: np.empty(0))
+    net_delta: np.ndarray = field(default_factory=lambda: np.empty(0))
+    settlements: Optional[LedgerView] = None
+
+
+class OptionsBacktestService:
+    """
+    Backtest de posições em opções com várias pernas. A cada candle as pernas
+    vencidas são liquidadas pelo valor intrínseco, as ordens da estratégia são
+    executadas ao preço teórico e todas as pernas abertas são reprecificadas em
+    uma única chamada de calculate_greeks_batch.
+    """
+
+    def __init__(self, analysis: Optional[AnalysisService] = None, clock: Optional[SimulatedClock] = None,
+                 initial_capital: float = 10000.0, contract_multiplier: float = 1.0) -> None:
+        self.clock = clock or SimulatedClock(datetime.now())
+        self.analysis = analysis or AnalysisService(clock=self.clock)
+        self.initial_capital = initial_capital
+        self.contract_multiplier = contract_multiplier
+        self.reset()
+
+    def reset(self) -> None:
+        self.cash: float = self.initial_capital
+        self.legs = OptionLegs()
+        self.trades = Ledger(OPTION_TRADE_FIELDS, name='option_trades')
+        self.settlements = Ledger(SETTLEMENT_FIELDS, name='settlements')
+        self.round_trips = RoundTripTracker()
+
+    def run_backtest(self, data: Union[Sequence[MarketData], CandleArrays],
+                     strategy_fn: Callable[[OptionsBacktestState], Optional[List[Order]]],
+                     volatility: Union[float, ArrayLike] = 0.6) -> OptionsBacktestResult:
+        """
+        Executa o backtest sobre os candles do subjacente. `volatility` é a
+        volatilidade usada na precificação: um valor fixo ou um por candle.
+        A estratégia devolve ordens (contrato, quantidade assinada) ou None.
+        """
+        self.reset()
+        arrays = as_candle_arrays(data)
+        n = len(arrays)
+        vols = np.broadcast_to(np.asarray(volatility, dtype=np.float64), (n,))
+        window = CandleWindow(arrays)
+        equity = np.empty(n)
+        cash = np.empty(n)
+        net_quantity = np.zeros(n)
+        open_legs = np.zeros(n, dtype=np.int64)
+        position_value = np.zeros(n)
+        net_delta = np.zeros(n)
+
+        for i in range(n):
+            now = arrays.timestamp[i].item()
+            spot = float(arrays.price[i])
+            vol = float(vols[i])
+            self.clock.set(now)
+            window.end = i + 1
+
+            self._settle_expired(now, spot)
+            state = OptionsBacktestState(window, self.legs, now, spot, vol, self.cash,
+                                         float(equity[i - 1]) if i else self.initial_capital)
+            orders = strategy_fn(state)
+            if orders:
+                self._execute_orders(orders, now, spot, vol)
+
+            if len(self.legs):
+                marks = self._reprice(now, spot, vol)
+                scaled = self.legs.quantity * self.contract_multiplier
+                position_value[i] = float(scaled @ marks.price)
+                net_delta[i] = float(scaled @ marks.delta)
+                net_quantity[i] = float(self.legs.quantity.sum())
+                open_legs[i] = len(self.legs)
+            cash[i] = self.cash
+            equity[i] = self.cash + position_value[i]
+
+        curve = np.concatenate(([self.initial_capital], equity))
+        trades = self.trades.view()
+        return OptionsBacktestResult(
+            trades=trades,
+            pnl=trades["value"],
+            equity_curve=curve,
+            metrics=_performance_metrics(curve, self.initial_capital, self.round_trips.win_rate),
+            positions=LedgerView({
+                'timestamp': arrays.timestamp.astype('datetime64[us]'),
+                'position': net_quantity,
+                'cash': cash,
+                'equity': equity,
+                'open_legs': open_legs,
+                'position_value': position_value,
+            }, {}),
+            timestamps=arrays.timestamp,
+            position_value=position_value,
+            net_delta=net_delta,
+            settlements=self.settlements.view(),
+        )
+
+    def _reprice(self, now: datetime, spot: float, volatility: float) -> Any:
+        legs = self.legs
+        return self.analysis.calculate_greeks_batch(
+            spot, legs.strike, year_fraction(legs.expiry, now), volatility, legs.is_call
+        )
+
+    def _settle_expired(self, now: datetime, spot: float) -> None:
+        """
+        Liquida pelo valor intrínseco as pernas com vencimento até `now`
+        """
+        legs = self.legs
+        if not len(legs):
+            return
+        expired = legs.expiry <= np.datetime64(now, 'ms')
+        if not expired.any():
+            return
+        intrinsic = np.where(legs.is_call[expired], np.maximum(spot - legs.strike[expired], 0.0),
+                             np.maximum(legs.strike[expired] - spot, 0.0))
+        payoff = legs.quantity[expired] * intrinsic * self.contract_multiplier
+        self.cash += float(payoff.sum())
+        for contract, quantity, price, value in zip([c for c, e in zip(legs.contracts, expired.tolist()) if e],
+                                                    legs.quantity[expired].tolist(), intrinsic.tolist(), payoff.tolist()):
+            self.round_trips.record(contract.contract_id, -quantity, price * self.contract_multiplier)
+            self.settlements.append(
+                timestamp=now,
+                contract_id=contract.contract_id,
+                quantity=quantity,
+                spot=spot,
+                value=value,
+            )
+        legs.remove(expired)
+
+    def _execute_orders(self, orders: List[Order], now: datetime, spot: float, volatility: float) -> None:
+        """
+        Executa as ordens ao preço teórico, precificadas em lote
+        """
+        contracts = [contract for contract, _ in orders]
+        quantities = np.array([quantity for _, quantity in orders], dtype=np.float64)
+        prices = self.analysis.calculate_greeks_batch(
+            spot,
+            [c.strike_price for c in contracts],
+            year_fraction([c.expiry for c in contracts], now),
+            volatility,
+            [c.is_call for c in contracts],
+        ).price
+        values = quantities * prices * self.contract_multiplier
+        # Pernas primeiro: se a atualização falhar, o caixa fica intacto
+        self.legs.add(contracts, quantities)
+        self.cash -= float(values.sum())
+        for contract, quantity, price, value in zip(contracts, quantities.tolist(), prices.tolist(), values.tolist()):
+            if quantity == 0:
+                continue
+            self.round_trips.record(contract.contract_id, quantity, price * self.contract_multiplier)
+            self.trades.append(
+                timestamp=now,
+                contract_id=contract.contract_id,
+                side="BUY" if quantity > 0 else "SELL",
+                quantity=abs(quantity),
+                price=price,
+                value=abs(value),
+                cash=self.cash,
+            )
@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from services.analysis_service import AnalysisService
+from services.scenario_engine import DAYS_PER_YEAR, ScenarioLegs
+
+
+def expiry_payoff(spot: ArrayLike, strike: ArrayLike, is_call: ArrayLike, quantity: ArrayLike) -> np.ndarray:
+    """
+    Payoff bruto no vencimento de várias pernas em cada ponto de `spot`.
+
+    O payoff é linear por partes com quebras nos strikes: com os strikes
+    ordenados e somas acumuladas de quantidade e quantidade x strike, cada
+    ponto custa uma busca binária, em vez de pontos x pernas máximos.
+    """
+    x = np.asarray(spot, dtype=np.float64)
+    strike = np.asarray(strike, dtype=np.float64)
+    order = np.argsort(strike, kind='stable')
+    k = strike[order]
+    call = np.asarray(is_call, dtype=bool)[order]
+    q = np.broadcast_to(np.asarray(quantity, dtype=np.float64), strike.shape)[order]
+    q_call = np.where(call, q, 0.0)
+    q_put = np.where(call, 0.0, q)
+
+    def cumulative(values: np.ndarray) -> np.ndarray:
+        return np.concatenate([[0.0], np.cumsum(values)])
+
+    # Calls com strike abaixo de x valem q(x - K); puts com strike acima, q(K - x)
+    below = np.searchsorted(k, x, side='left')
+    call_q, call_qk = cumulative(q_call), cumulative(q_call * k)
+    put_q, put_qk = cumulative(q_put), cumulative(q_put * k)
+    calls = x * call_q[below] - call_qk[below]
+    puts = (put_qk[-1] - put_qk[below]) - x * (put_q[-1] - put_q[below])
+    return calls + puts
+
+
+@dataclass
+class PayoffSurface:
+    """
+    PnL de uma estratégia ou portfolio sobre a grade spot x tempo x vol,
+    líquido do custo de montagem. `pnl[v, t, s]` é o PnL teórico com a
+    volatilidade multiplicada por (1 + vol_shift[v]), `days[t]` dias à frente
+    e o subjacente em `spot[s]`; `expiry` é o PnL no vencimento.
+    """
+    spot: np.ndarray
+    days: np.ndarray
+    vol_shift: np.ndarray
+    net_cost: float
+    expiry: np.ndarray
+    pnl: np.ndarray
+
+    def curve(self, days: float = 0.0, vol_shift: float = 0.0) -> np.ndarray:
+        """
+        Curva de PnL no ponto da grade mais próximo de (days, vol_shift)
+        """
+        t = int(np.abs(self.days - days).argmin())
+        v = int(np.abs(self.vol_shift - vol_shift).argmin())
+        return self.pnl[v, t]
+
+    def break_evens(self) -> List[float]:
+        """
+        Pontos de equilíbrio no vencimento, interpolados entre os pontos da grade
+        """
+        y = self.expiry
+        crossing = np.flatnonzero(np.signbit(y[:-1]) != np.signbit(y[1:]))
+        x0, x1, y0, y1 = self.spot[crossing], self.spot[crossing + 1], y[crossing], y[crossing + 1]
+        return (x0 - y0 * (x1 - x0) / (y1 - y0)).tolist()
+
+
+class PayoffEngine:
+    """
+    Payoff no vencimento e PnL teórico T+n de estratégias inteiras, recebidas
+    como pernas em arrays (ScenarioLegs).
+
+    A grade spot x tempo x vol é achatada em linhas e reprecificada contra
+    todas as pernas numa passada com broadcasting (linhas x pernas), em
+    blocos de até `max_chunk_elements` para limitar a memória; cada bloco é
+    reduzido a uma coluna pelo produto com as quantidades.
+
+    Com vários subjacentes, a grade é o preço do subjacente da primeira perna
+    e as demais se movem na mesma proporção.
+    """
+
+    def __init__(self, analysis: Optional[AnalysisService] = None,
+                 max_chunk_elements: int = 2_000_000) -> None:
+        self.analysis = analysis or AnalysisService()
+        self.max_chunk_elements = max_chunk_elements
+
+    def net_cost(self, legs: ScenarioLegs, premium: Optional[ArrayLike] = None) -> float:
+        """
+        Custo de montagem (negativo = crédito); sem `premium`, usa o preço teórico das pernas
+        """
+        if premium is None:
+            premium = self.analysis.calculate_price_batch(legs.spot, legs.strike, legs.time_to_expiry,
+                                                          legs.volatility, legs.is_call)
+        return float(np.asarray(premium, dtype=np.float64) @ legs.quantity)
+
+    def expiry(self, legs: ScenarioLegs, spot: ArrayLike, premium: Optional[ArrayLike] = None) -> np.ndarray:
+        """
+        PnL no vencimento em cada ponto de `spot`, líquido do custo de montagem
+        """
+        return self._gross_expiry(legs, spot) - self.net_cost(legs, premium)
+
+    def _gross_expiry(self, legs: ScenarioLegs, spot: ArrayLike) -> np.ndarray:
+        # max(a·x - K, 0) = a·max(x - K/a, 0): o movimento proporcional vira strike e quantidade efetivos
+        scale = legs.spot / legs.spot[0]
+        return expiry_payoff(spot, legs.strike / scale, legs.is_call, legs.quantity * scale)
+
+    def surface(self, legs: ScenarioLegs, spot: ArrayLike, days: ArrayLike = (0.0,),
+                vol_shifts: ArrayLike = (0.0,), premium: Optional[ArrayLike] = None) -> PayoffSurface:
+        """
+        PnL teórico em toda a grade spot x dias à frente x choque relativo
+        de volatilidade; pernas já vencidas valem o intrínseco
+        """
+        spot = np.asarray(spot, dtype=np.float64)
+        days = np.atleast_1d(np.asarray(days, dtype=np.float64))
+        vol_shifts = np.atleast_1d(np.asarray(vol_shifts, dtype=np.float64))
+        net_cost = self.net_cost(legs, premium)
+        scale = legs.spot / legs.spot[0]
+
+        vol_grid, day_grid, spot_grid = (np.ravel(a) for a in np.meshgrid(vol_shifts, days, spot, indexing='ij'))
+        pnl = np.empty(spot_grid.size)
+        price = self.analysis.calculate_price_batch
+        chunk = max(1, self.max_chunk_elements // max(len(legs), 1))
+        for start in range(0, pnl.size, chunk):
+            rows = slice(start, start + chunk)
+            leg_spot = spot_grid[rows, None] * scale
+            t = np.maximum(legs.time_to_expiry - day_grid[rows, None] / DAYS_PER_YEAR, 0.0)
+            vol = legs.volatility * (1.0 + vol_grid[rows, None])
+            value = price(leg_spot, legs.strike, t, vol, legs.is_call)
+            expired = t <= 0
+            if expired.any():
+                # O preço com t mínimo ainda tem valor no dinheiro; perna vencida vale o intrínseco exato
+                intrinsic = np.maximum(np.where(legs.is_call, leg_spot - legs.strike, legs.strike - leg_spot), 0.0)
+                value = np.where(expired, intrinsic, value)
+            pnl[rows] = value @ legs.quantity
+        return PayoffSurface(
+            spot=spot,
+            days=days,
+            vol_shift=vol_shifts,
+            net_cost=net_cost,
+            expiry=self._gross_expiry(legs, spot) - net_cost,
+            pnl=pnl.reshape(vol_shifts.size, days.size, spot.size) - net_cost,
+        )
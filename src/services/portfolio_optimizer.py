@@ -0,0 +1,220 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import ArrayLike
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+from models.market_model import OptionContract
+from services.analysis_service import GreeksBatch
+from services.scenario_engine import DAYS_PER_YEAR
+
+# Linhas da matriz de restrições: exposições por contrato usadas pelo otimizador
+_ROWS = ('delta', 'vega', 'theta', 'cost')
+# Negociações de um contrato que servem de base para a busca de pares de pernas
+_PAIR_SEEDS = 8
+
+
+@dataclass
+class OptimizationResult:
+    """
+    Quantidades assinadas finais por candidato, negociações em relação ao
+    livro atual e exposições do portfolio resultante (vega por ponto de
+    volatilidade, theta por dia)
+    """
+    quantity: np.ndarray
+    trades: np.ndarray
+    exposure: Dict[str, float]
+    success: bool
+    message: str
+
+    def positions(self, contracts: Sequence[OptionContract]) -> List[Tuple[OptionContract, float]]:
+        return [(contracts[i], float(self.quantity[i])) for i in np.flatnonzero(self.quantity).tolist()]
+
+
+class PortfolioOptimizer:
+    """
+    Escolhe quantidades de um universo de contratos candidatos com um
+    programa linear (inteiro, para contratos inteiros) resolvido pelo HiGHS
+    do scipy.
+
+    As variáveis são compras e vendas em relação ao livro atual, mais uma
+    folga para o desvio do delta alvo. O objetivo minimiza esse desvio e,
+    com peso `turnover_cost`, o número de contratos negociados; assim, se o
+    livro atual já atende às restrições, ele próprio é a solução. A matriz de
+    exposições do universo é montada uma vez em `set_universe` e reaproveitada
+    em cada reotimização, e `max_trade` limita o tamanho do rebalanceamento.
+
+    Em universos grandes, o problema inteiro é resolvido só sobre as colunas
+    mais promissoras da relaxação linear (suporte da solução, livro atual e
+    as `candidate_limit` de menor custo reduzido); se essa restrição ficar
+    inviável, resolve o problema completo. candidate_limit=None desliga o atalho.
+    """
+
+    def __init__(self, max_contracts: float = 100.0, turnover_cost: float = 1e-3,
+                 delta_tolerance: float = 0.01, candidate_limit: Optional[int] = 32,
+                 time_limit: Optional[float] = None) -> None:
+        self.max_contracts = max_contracts
+        self.delta_tolerance = delta_tolerance
+        self.candidate_limit = candidate_limit
+        self.turnover_cost = turnover_cost
+        self.time_limit = time_limit
+        self.contracts: List[OptionContract] = []
+        self._index: Dict[str, int] = {}
+        self._exposure = np.zeros((len(_ROWS), 0))
+
+    def set_universe(self, contracts: Sequence[OptionContract], greeks: GreeksBatch,
+                     price: Optional[ArrayLike] = None) -> None:
+        """
+        Define os candidatos com suas Greeks por contrato; `price` é o prêmio
+        usado no orçamento (por padrão, o preço teórico)
+        """
+        self.contracts = list(contracts)
+        self._index = {c.contract_id: i for i, c in enumerate(self.contracts)}
+        premium = greeks.price if price is None else np.asarray(price, dtype=np.float64)
+        # Vega e theta nas convenções de mesa: por ponto de volatilidade e por dia
+        self._exposure = np.vstack([greeks.delta, greeks.vega / 100.0, greeks.theta / DAYS_PER_YEAR, premium])
+
+    def current_quantity(self, current: Optional[Sequence[Tuple[OptionContract, float]]]) -> np.ndarray:
+        """
+        Livro atual projetado no universo; posições fora dele são ignoradas
+        """
+        quantity = np.zeros(len(self.contracts))
+        for contract, qty in current or ():
+            index = self._index.get(contract.contract_id)
+            if index is not None:
+                quantity[index] += qty
+        return quantity
+
+    def solve(self, target_delta: float, max_vega: float, max_theta: float, budget: float,
+              current: Optional[Sequence[Tuple[OptionContract, float]]] = None,
+              integer: bool = True, max_trade: Optional[float] = None,
+              max_contracts: Optional[float] = None) -> OptimizationResult:
+        """
+        Minimiza o desvio de |delta - target_delta| além de delta_tolerance,
+        sujeito a |vega| <= max_vega (por ponto de volatilidade), theta diário
+        >= max_theta (negativo = decaimento máximo) e prêmio líquido <= budget,
+        com |quantidade| <= max_contracts por contrato (por padrão, o do otimizador)
+        """
+        limit = self.max_contracts if max_contracts is None else max_contracts
+        n = len(self.contracts)
+        q0 = self.current_quantity(current)
+        base = self._exposure @ q0
+
+        # x = [compras (n), vendas (n), folga do delta]; quantidade final = q0 + compras - vendas
+        trade = np.hstack([self._exposure, -self._exposure, np.zeros((len(_ROWS), 1))])
+        slack = np.zeros(2 * n + 1)
+        slack[-1] = 1.0
+        matrix = np.vstack([
+            trade[0] - slack,
+            -trade[0] - slack,
+            trade[1],
+            trade[2],
+            trade[3],
+        ])
+        lower = np.array([-np.inf, -np.inf, -max_vega - base[1], max_theta - base[2], -np.inf])
+        # Desvio dentro de delta_tolerance não é penalizado: evita que o branch-and-bound
+        # persiga a combinação inteira exata do alvo
+        tolerance = self.delta_tolerance
+        upper = np.array([target_delta + tolerance - base[0], base[0] - target_delta + tolerance,
+                          max_vega - base[1], np.inf, budget - base[3]])
+
+        # Com custo de giro positivo, compra e venda do mesmo contrato nunca coexistem,
+        # então os limites de posição viram limites das próprias variáveis
+        buy_limit = np.maximum(limit - q0, 0.0)
+        sell_limit = np.maximum(limit + q0, 0.0)
+        if max_trade is not None:
+            buy_limit = np.minimum(buy_limit, max_trade)
+            sell_limit = np.minimum(sell_limit, max_trade)
+        objective = np.concatenate([np.full(2 * n, self.turnover_cost), [1.0]])
+        integrality = np.concatenate([np.full(2 * n, 1 if integer else 0), [0]])
+        upper_bound = np.concatenate([buy_limit, sell_limit, [np.inf]])
+        constraints = (matrix, lower, upper)
+
+        columns = np.arange(2 * n + 1)
+        if integer and self.candidate_limit is not None and 2 * n > self.candidate_limit:
+            columns = self._candidate_columns(objective, constraints, upper_bound, q0)
+        x = self._solve(columns, objective, constraints, upper_bound, integrality)
+        if x is None and columns.size < 2 * n + 1:
+            x = self._solve(np.arange(2 * n + 1), objective, constraints, upper_bound, integrality, presolve=True)
+        if x is None:
+            return OptimizationResult(q0, np.zeros(n), dict(zip(_ROWS, base.tolist())), False,
+                                      "Nenhuma carteira atende às restrições")
+        trades = x[:n] - x[n:2 * n]
+        if integer:
+            trades = np.round(trades)
+        quantity = q0 + trades
+        return OptimizationResult(
+            quantity=quantity,
+            trades=trades,
+            exposure=dict(zip(_ROWS, (self._exposure @ quantity).tolist())),
+            success=True,
+            message="Solução ótima" if columns.size == 2 * n + 1 else "Solução ótima entre os candidatos",
+        )
+
+    def _solve(self, columns: np.ndarray, objective: np.ndarray, constraints: Tuple[np.ndarray, np.ndarray, np.ndarray],
+               upper_bound: np.ndarray, integrality: np.ndarray, presolve: Optional[bool] = None) -> Optional[np.ndarray]:
+        matrix, lower, upper = constraints
+        # Com poucas colunas e cinco linhas densas, o presolve do HiGHS custa mais que o
+        # próprio branch-and-bound; no problema completo ele compensa
+        if presolve is None:
+            presolve = columns.size == objective.size
+        options: Dict[str, Any] = {'presolve': presolve}
+        if self.time_limit is not None:
+            options['time_limit'] = self.time_limit
+        result = milp(
+            objective[columns],
+            constraints=LinearConstraint(matrix[:, columns], lower, upper),
+            bounds=Bounds(np.zeros(columns.size), upper_bound[columns]),
+            integrality=integrality[columns],
+            options=options,
+        )
+        if result.x is None:
+            return None
+        x = np.zeros(objective.size)
+        x[columns] = result.x
+        return x
+
+    def _candidate_columns(self, objective: np.ndarray, constraints: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                           upper_bound: np.ndarray, q0: np.ndarray) -> np.ndarray:
+        """
+        Colunas para o problema inteiro reduzido, escolhidas pela relaxação linear
+        """
+        matrix, lower, upper = constraints
+        finite_upper = np.isfinite(upper)
+        finite_lower = np.isfinite(lower)
+        relaxed = linprog(
+            objective,
+            A_ub=np.vstack([matrix[finite_upper], -matrix[finite_lower]]),
+            b_ub=np.concatenate([upper[finite_upper], -lower[finite_lower]]),
+            bounds=np.column_stack([np.zeros(objective.size), upper_bound]),
+            method='highs',
+            options={'presolve': False},
+        )
+        n = q0.size
+        keep = np.zeros(objective.size, dtype=bool)
+        keep[-1] = True
+        keep[:2 * n] |= np.tile(q0 != 0, 2)
+        if relaxed.x is None:
+            keep[:2 * n] = True
+            return np.flatnonzero(keep)
+        keep |= relaxed.x > 1e-9
+        # Custo reduzido: quanto o objetivo piora por unidade de cada coluna hoje fora da base
+        reduced_cost = relaxed.lower.marginals[:2 * n]
+        keep[np.argsort(reduced_cost, kind='stable')[:self.candidate_limit]] = True
+        # A relaxação prefere frações de contratos; inclui também as negociações de
+        # um contrato que mais aproximam o livro das restrições e, partindo das
+        # melhores delas, as que corrigem o que ainda falta (pares de pernas)
+        activity = matrix[:, :2 * n].T
+        scale = np.maximum(np.abs(activity).max(axis=0), 1e-12)
+
+        def violation(rows: np.ndarray) -> np.ndarray:
+            excess = np.maximum(rows - upper, 0.0) + np.maximum(lower - rows, 0.0)
+            return (excess / scale).sum(axis=-1)
+
+        k = min(self.candidate_limit, 2 * n)
+        singles = np.argsort(violation(activity), kind='stable')[:k]
+        pairs = violation(activity[singles[:_PAIR_SEEDS], None, :] + activity[None, :, :])
+        keep[singles] = True
+        keep[np.argpartition(pairs, k - 1, axis=1)[:, :k].ravel()] = True
+        return np.flatnonzero(keep)
@@ -1,40 +1,105 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Mapping, Optional, Sequence, Tuple, Union
 import numpy as np
+from numpy.typing import ArrayLike
 from datetime import datetime
 from dataclasses import dataclass
 
-from models.market_model import OptionContract
+from models.market_model import OptionContract, OptionChain
+from services.analysis_service import AnalysisService, Greeks
+from services.correlation_engine import CorrelationEngine
+from services.greeks_book import GREEKS, GreeksBook
+from services.monte_carlo import MonteCarloEngine, MonteCarloRisk
+from services.portfolio_optimizer import PortfolioOptimizer
+from services.scenario_engine import ScenarioEngine, ScenarioLegs, ScenarioResult, ScenarioSet, SpotLike
+from utils.clock import Clock, SystemClock
+
+Positions = Union[List[OptionContract], OptionChain]
 
 @dataclass
 class PortfolioRisk:
-    value_at_risk: float
+    value_at_risk: float        # PnL de um dia do portfolio, em moeda (negativo = perda)
     expected_shortfall: float
     option_greeks: Dict[str, float]
     stress_test_results: Dict[str, float]
     correlation_matrix: Optional[np.ndarray] = None
 
+# Cenários padrão de _run_stress_tests; vol 1.0 = volatilidade dobrada
+STRESS_SCENARIOS = ScenarioSet.custom({
+    'down_20_percent': {'spot': -0.20},
+    'up_20_percent': {'spot': 0.20},
+    'double_volatility': {'vol': 1.0},
+})
+
 class RiskService:
-    def __init__(self) -> None:
+    def __init__(self, analysis: Optional[AnalysisService] = None, clock: Optional[Clock] = None,
+                 correlation_engine: Optional[CorrelationEngine] = None) -> None:
         self.confidence_level: float = 0.95
         self.lookback_period: int = 252  # Dias úteis em um ano
+        self.clock = clock or SystemClock()
+        self.analysis = analysis or AnalysisService(clock=self.clock)
+        self.scenario_engine = ScenarioEngine(self.analysis)
+        self.monte_carlo = MonteCarloEngine(self.analysis)
+        self.portfolio_optimizer = PortfolioOptimizer()
+        # Correlações entre subjacentes alimentadas por retornos reais; opcional
+        self.correlation_engine = correlation_engine
+        # Chave do universo carregado no otimizador, para pular set_universe nas reotimizações
+        self._universe_key: Optional[Tuple[Any, ...]] = None
+
+    def close(self) -> None:
+        """
+        Encerra o pool de processos do Monte Carlo, se tiver sido criado
+        """
+        self.monte_carlo.close()
         
-    def calculate_portfolio_risk(self, positions: List[OptionContract], 
-                               historical_prices: List[float]) -> PortfolioRisk:
+    def calculate_portfolio_risk(self, positions: Positions, 
+                               historical_prices: List[float],
+                               volatility: Optional[ArrayLike] = None,
+                               quantity: Optional[ArrayLike] = None,
+                               var_method: str = 'historical',
+                               n_paths: int = 100_000,
+                               spot: Optional[SpotLike] = None) -> PortfolioRisk:
         """
-        Calcula métricas de risco para um portfolio de opções
+        Calcula métricas de risco para um portfolio de opções, recebido como
+        lista de contratos ou como OptionChain já analisada. Sem `spot`, o
+        último preço histórico é o spot do subjacente, o que só vale para
+        portfolios de um único subjacente; com vários, informe `spot` como
+        dict por subjacente. Sem `volatility` (e sem IVs na cadeia), usa a
+        volatilidade realizada anualizada do histórico.
+
+        VaR/ES são sempre quantis do PnL de um dia do portfolio, em moeda
+        (negativo = perda). Com var_method='historical', cada retorno diário
+        do histórico vira um cenário de spot (ScenarioSet.historical) e o
+        portfolio é reprecificado nele; com 'monte_carlo', o PnL vem de
+        `n_paths` caminhos simulados.
         """
         # Calcula retornos históricos
-        returns = np.diff(historical_prices) / historical_prices[:-1]
+        prices = np.asarray(historical_prices, dtype=np.float64)
+        returns = np.diff(prices) / prices[:-1]
+        realized_vol = float(returns.std(ddof=1) * np.sqrt(self.lookback_period)) if returns.size > 1 else 0.0
+        if volatility is None and isinstance(positions, list):
+            volatility = realized_vol
+        legs = self._scenario_legs(positions, float(prices[-1]) if spot is None else spot, volatility, quantity)
+        if spot is None and np.unique(legs.underlying).size > 1:
+            raise ValueError("Portfolio com vários subjacentes: informe o spot de cada um em `spot`")
         
         # Calcula VaR e Expected Shortfall
-        var = self._calculate_var(returns)
-        es = self._calculate_expected_shortfall(returns)
+        if var_method == 'monte_carlo':
+            mc = self.monte_carlo.value_at_risk(legs, self.confidence_level, n_paths=n_paths,
+                                                underlying_volatility=realized_vol or None)
+            var, es = mc.value_at_risk, mc.expected_shortfall
+        elif var_method == 'historical':
+            pnl = (self.scenario_engine.revalue(legs, ScenarioSet.historical(prices, horizon_days=1)).total
+                   if returns.size else returns)
+            var = self._calculate_var(pnl)
+            es = self._calculate_expected_shortfall(pnl)
+        else:
+            raise ValueError(f"Método de VaR desconhecido: {var_method}")
         
         # Calcula Greeks agregados do portfolio
-        greeks = self._aggregate_greeks(positions)
+        greeks = self._aggregate_greeks(positions, legs)
         
-        # Executa testes de stress
-        stress_results = self._run_stress_tests(positions)
+        # Executa testes de stress com reprecificação completa
+        stress_results = self._run_stress_tests(legs)
         
         # Calcula matriz de correlação se houver mais de uma posição
         correlation = self._calculate_correlation(positions) if len(positions) > 1 else None
@@ -49,7 +114,7 @@ class RiskService:
         
     def _calculate_var(self, returns: np.ndarray) -> float:
         """
-        Calcula Value at Risk usando método histórico
+        Calcula Value at Risk usando método histórico (quantil da amostra de retornos ou PnL)
         """
         if len(returns) == 0:
             return 0.0
@@ -67,89 +132,161 @@ class RiskService:
         var = self._calculate_var(returns)
         return float(returns[returns <= var].mean())
         
-    def _aggregate_greeks(self, positions: List[OptionContract]) -> Dict[str, float]:
+    def _aggregate_greeks(self, positions: Positions, legs: ScenarioLegs) -> Dict[str, float]:
         """
-        Agrega os Greeks do portfolio
+        Agrega os Greeks do portfolio, ponderados pela quantidade assinada de cada perna
         """
-        total_delta: float = 0.0
-        total_gamma: float = 0.0
-        total_theta: float = 0.0
-        total_vega: float = 0.0
-        
-        for position in positions:
-            # Assumindo que os Greeks estão armazenados no objeto OptionContract
-            if hasattr(position, 'greeks'):
-                total_delta += position.greeks.get('delta', 0.0)
-                total_gamma += position.greeks.get('gamma', 0.0)
-                total_theta += position.greeks.get('theta', 0.0)
-                total_vega += position.greeks.get('vega', 0.0)
-        
-        return {
-            'delta': total_delta,
-            'gamma': total_gamma,
-            'theta': total_theta,
-            'vega': total_vega
-        }
-        
-    def _run_stress_tests(self, positions: List[OptionContract]) -> Dict[str, float]:
+        return self.build_greeks_book(positions, legs).totals()
+
+    def build_greeks_book(self, positions: Positions, legs: ScenarioLegs, **kwargs: Any) -> GreeksBook:
         """
-        Executa cenários de stress test
+        Livro de Greeks por (subjacente, vencimento, strike) calculado em lote
+        sobre as pernas; depois de montado, é atualizado incrementalmente.
+        Numa OptionChain, as Greeks já presentes na cadeia são usadas e só as
+        que faltam são calculadas
         """
-        results: Dict[str, float] = {}
-        
-        # Cenário de queda de 20%
-        down_scenario = self._calculate_portfolio_value(positions, price_change=-0.20)
-        results['down_20_percent'] = down_scenario
-        
-        # Cenário de alta de 20%
-        up_scenario = self._calculate_portfolio_value(positions, price_change=0.20)
-        results['up_20_percent'] = up_scenario
+        greeks = None
+        if not isinstance(positions, OptionChain) or any(np.isnan(getattr(positions, g)).any() for g in GREEKS):
+            greeks = self.analysis.calculate_greeks_batch(legs.spot, legs.strike, legs.time_to_expiry,
+                                                          legs.volatility, legs.is_call)
+        return GreeksBook.from_batch(positions, greeks, legs.quantity, **kwargs)
         
-        # Cenário de volatilidade dobrada
-        vol_scenario = self._calculate_portfolio_value(positions, vol_change=1.0)
-        results['double_volatility'] = vol_scenario
-        
-        return results
+    def run_scenarios(self, positions: Positions, scenarios: ScenarioSet, spot: SpotLike,
+                      volatility: Optional[ArrayLike] = None,
+                      quantity: Optional[ArrayLike] = None) -> ScenarioResult:
+        """
+        Reprecifica todas as posições em todos os cenários (grade, definidos
+        pelo usuário ou históricos) e devolve a matriz de PnL cenários x pernas
+        """
+        return self.scenario_engine.revalue(self._scenario_legs(positions, spot, volatility, quantity), scenarios)
+
+    def calculate_monte_carlo_risk(self, positions: Positions, spot: SpotLike,
+                                   volatility: Optional[ArrayLike] = None,
+                                   quantity: Optional[ArrayLike] = None,
+                                   horizon_days: float = 1.0, n_paths: int = 1_000_000,
+                                   correlation: Optional[ArrayLike] = None,
+                                   seed: Optional[int] = None, **dynamics: Any) -> MonteCarloRisk:
+        """
+        VaR/ES por Monte Carlo com reavaliação completa no horizonte. `dynamics`
+        repassa a dinâmica dos subjacentes ao MonteCarloEngine (underlying_volatility,
+        drift, jump_intensity, jump_mean, jump_std, vol_of_vol,
+        spot_vol_correlation).
+        """
+        legs = self._scenario_legs(positions, spot, volatility, quantity)
+        cholesky = None
+        if correlation is None and self.correlation_engine is not None:
+            # Mesma ordem de subjacentes de MonteCarloEngine.build_model
+            names = [str(name) for name in np.unique(legs.underlying)]
+            correlation = self.correlation_engine.correlation(names)
+            cholesky = self.correlation_engine.cholesky(names)
+            if 'underlying_volatility' not in dynamics:
+                volatility_by_name = dict(zip(self.correlation_engine.underlyings, self.correlation_engine.volatility()))
+                dynamics['underlying_volatility'] = {name: float(volatility_by_name[name]) for name in names}
+        return self.monte_carlo.value_at_risk(legs, self.confidence_level, horizon_days, n_paths,
+                                              correlation=correlation, cholesky=cholesky, seed=seed, **dynamics)
+
+    def optimize_portfolio(self, available_options: Sequence[OptionContract], target_delta: float,
+                           max_vega: float, max_theta: float, budget: float, spot_price: SpotLike,
+                           volatility: Optional[ArrayLike] = None,
+                           current_positions: Optional[Sequence[Tuple[OptionContract, float]]] = None,
+                           integer: bool = True, max_contracts: float = 100.0,
+                           max_trade: Optional[float] = None) -> List[Tuple[OptionContract, float]]:
+        """
+        Quantidades dos contratos disponíveis que aproximam o delta alvo
+        respeitando limites de vega, theta diário e orçamento de prêmio.
+        `current_positions` é o livro atual: a otimização parte dele e só
+        negocia o necessário. Sem `volatility`, usa a IV implícita no
+        current_price de cada contrato.
+
+        As Greeks do universo só são recalculadas quando mudam os contratos,
+        o spot, a volatilidade (ou os preços, sem `volatility`) ou o minuto
+        do relógio; reotimizações no mesmo mercado custam apenas o solver
+        (~20-25 ms com 2.000 contratos em benchmarks/bench_risk.py). Se o
+        problema reduzido ficar inviável e o completo precisar ser resolvido,
+        a chamada pode passar de 100 ms.
+        """
+        contracts = list(available_options)
+        optimizer = self.portfolio_optimizer
+        key = self._universe_cache_key(contracts, spot_price, volatility)
+        if key != self._universe_key:
+            legs = self._scenario_legs(contracts, spot_price,
+                                       self._contract_volatility(contracts, spot_price, volatility), None)
+            greeks = self.analysis.calculate_greeks_batch(legs.spot, legs.strike, legs.time_to_expiry,
+                                                          legs.volatility, legs.is_call)
+            optimizer.set_universe(contracts, greeks)
+            self._universe_key = key
+        result = optimizer.solve(target_delta, max_vega, max_theta, budget, current_positions, integer,
+                                 max_trade, max_contracts)
+        if not result.success:
+            raise ValueError(f"Otimização sem solução viável: {result.message}")
+        return result.positions(contracts)
+
+    def _universe_cache_key(self, contracts: List[OptionContract], spot: SpotLike,
+                            volatility: Optional[ArrayLike]) -> Tuple[Any, ...]:
+        spot_key = tuple(sorted(spot.items())) if isinstance(spot, Mapping) else float(spot)
+        if volatility is None:
+            vol_key: Any = ('price', tuple(c.current_price for c in contracts))
+        else:
+            vol = np.asarray(volatility, dtype=np.float64)
+            vol_key = (vol.shape, vol.tobytes())
+        return (tuple(c.contract_id for c in contracts), spot_key, vol_key,
+                np.datetime64(self.clock.now(), 'm'))
+
+    def _calculate_portfolio_greeks(self, positions: Sequence[Tuple[OptionContract, float]], spot_price: SpotLike,
+                                    volatility: Optional[ArrayLike] = None) -> Greeks:
+        """
+        Greeks do portfolio dado como pares (contrato, quantidade assinada)
+        """
+        contracts = [contract for contract, _ in positions]
+        quantity = np.array([qty for _, qty in positions], dtype=np.float64)
+        legs = self._scenario_legs(contracts, spot_price, self._contract_volatility(contracts, spot_price, volatility), quantity)
+        totals = self._aggregate_greeks(contracts, legs)
+        return Greeks(**totals)
+
+    def _contract_volatility(self, contracts: List[OptionContract], spot: SpotLike,
+                             volatility: Optional[ArrayLike]) -> ArrayLike:
+        if volatility is not None:
+            return volatility
+        legs = self._scenario_legs(contracts, spot, 0.0, None)
+        price = np.array([c.current_price for c in contracts], dtype=np.float64)
+        implied = self.analysis.calculate_implied_volatility_batch(price, legs.spot, legs.strike,
+                                                                   legs.time_to_expiry, legs.is_call).volatility
+        if not ((price > 0) & np.isfinite(implied)).all():
+            raise ValueError("Informe a volatilidade: há contratos sem preço para calcular a IV")
+        return implied
+
+    def _scenario_legs(self, positions: Positions, spot: SpotLike, volatility: Optional[ArrayLike],
+                       quantity: Optional[ArrayLike]) -> ScenarioLegs:
+        return ScenarioLegs.from_positions(positions, spot, self.clock.now(), volatility, quantity)
+
+    def _run_stress_tests(self, legs: ScenarioLegs) -> Dict[str, float]:
+        """
+        Executa os cenários de stress padrão e devolve o PnL de cada um
+        """
+        result = self.scenario_engine.revalue(legs, STRESS_SCENARIOS)
+        return {str(name): float(pnl) for name, pnl in zip(result.scenarios.name, result.total)}
         
-    def _calculate_portfolio_value(self, positions: List[OptionContract], 
+    def _calculate_portfolio_value(self, legs: ScenarioLegs,
                                  price_change: float = 0.0,
                                  vol_change: float = 0.0) -> float:
         """
-        Calcula o valor do portfolio em um cenário específico
+        Calcula o valor do portfolio em um cenário específico por reprecificação completa
         """
-        total_value: float = 0.0
+        scenario = ScenarioSet.from_arrays(['scenario'], price_change, vol_change)
+        result = self.scenario_engine.revalue(legs, scenario)
+        return result.base_value + float(result.total[0])
         
-        for position in positions:
-            # Ajusta o preço do ativo subjacente
-            new_price = position.current_price * (1 + price_change)
-            
-            # Recalcula o valor da opção com os novos parâmetros
-            # Esta é uma simplificação - em um caso real você usaria
-            # um modelo de precificação completo como Black-Scholes
-            value_change = (
-                position.greeks.get('delta', 0.0) * new_price +
-                position.greeks.get('gamma', 0.0) * new_price * new_price * 0.5 +
-                position.greeks.get('vega', 0.0) * vol_change
-            )
-            
-            total_value += value_change
-            
-        return total_value
-        
-    def _calculate_correlation(self, positions: List[OptionContract]) -> np.ndarray:
+    def _calculate_correlation(self, positions: Positions) -> np.ndarray:
         """
-        Calcula matriz de correlação entre as posições
+        Calcula matriz de correlação entre as posições a partir da matriz entre
+        subjacentes. Sem CorrelationEngine, só se sabe que posições no mesmo
+        subjacente têm correlação 1; os demais pares ficam NaN.
         """
-        n = len(positions)
-        correlation_matrix = np.ones((n, n))
-        
-        # Em um caso real, você usaria dados históricos para calcular
-        # as correlações entre os ativos subjacentes
-        # Esta é uma simplificação
-        for i in range(n):
-            for j in range(i+1, n):
-                correlation = 0.5  # Valor exemplo
-                correlation_matrix[i,j] = correlation
-                correlation_matrix[j,i] = correlation
-                
-        return correlation_matrix
+        if isinstance(positions, list):
+            underlyings = np.array([p.underlying for p in positions], dtype=str)
+        else:
+            underlyings = np.asarray(positions.underlying, dtype=str)
+        engine = self.correlation_engine
+        if engine is not None and set(underlyings.tolist()) <= set(engine.underlyings):
+            return engine.expand(underlyings.tolist())
+        return np.where(underlyings[:, None] == underlyings[None, :], 1.0, np.nan)
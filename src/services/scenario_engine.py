@@ -0,0 +1,213 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+from models.market_model import OptionContract, OptionChain
+from services.analysis_service import AnalysisService
+from utils.clock import year_fraction
+
+DAYS_PER_YEAR = 365.0
+
+Positions = Union[Sequence[OptionContract], OptionChain]
+SpotLike = Union[float, Mapping[str, float]]
+
+
+@dataclass
+class ScenarioSet:
+    """
+    Conjunto de cenários: choque relativo no spot, choque relativo na
+    volatilidade (1.0 = dobra) e passagem de tempo em anos, um valor por cenário
+    """
+    name: np.ndarray
+    spot_shock: np.ndarray
+    vol_shock: np.ndarray
+    time_shift: np.ndarray
+
+    def __post_init__(self) -> None:
+        n = len(self.name)
+        for column in (self.spot_shock, self.vol_shock, self.time_shift):
+            if column.shape != (n,):
+                raise ValueError("Todas as colunas do cenário devem ter o mesmo tamanho")
+        if (self.spot_shock <= -1).any() or (self.vol_shock <= -1).any():
+            raise ValueError("Choques de spot e volatilidade devem ser maiores que -100%")
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    @classmethod
+    def from_arrays(cls, name: Sequence[str], spot_shock: ArrayLike, vol_shock: ArrayLike = 0.0,
+                    time_shift_days: ArrayLike = 0.0) -> 'ScenarioSet':
+        n = len(name)
+        return cls(
+            name=np.asarray(name, dtype=object),
+            spot_shock=np.broadcast_to(np.asarray(spot_shock, dtype=np.float64), (n,)).copy(),
+            vol_shock=np.broadcast_to(np.asarray(vol_shock, dtype=np.float64), (n,)).copy(),
+            time_shift=np.broadcast_to(np.asarray(time_shift_days, dtype=np.float64), (n,)) / DAYS_PER_YEAR,
+        )
+
+    @classmethod
+    def grid(cls, spot_shocks: ArrayLike, vol_shocks: ArrayLike = (0.0,),
+             time_shifts_days: ArrayLike = (0.0,)) -> 'ScenarioSet':
+        """
+        Produto cartesiano spot x vol x tempo
+        """
+        spot, vol, days = (np.ravel(a) for a in np.meshgrid(
+            np.asarray(spot_shocks, dtype=np.float64),
+            np.asarray(vol_shocks, dtype=np.float64),
+            np.asarray(time_shifts_days, dtype=np.float64),
+            indexing='ij'
+        ))
+        names = [f"spot{s:+.1%}/vol{v:+.1%}/{d:g}d" for s, v, d in zip(spot.tolist(), vol.tolist(), days.tolist())]
+        return cls.from_arrays(names, spot, vol, days)
+
+    @classmethod
+    def custom(cls, scenarios: Mapping[str, Mapping[str, float]]) -> 'ScenarioSet':
+        """
+        Cenários definidos pelo usuário: {nome: {'spot': .., 'vol': .., 'days': ..}}
+        """
+        names = list(scenarios)
+        return cls.from_arrays(
+            names,
+            [scenarios[n].get('spot', 0.0) for n in names],
+            [scenarios[n].get('vol', 0.0) for n in names],
+            [scenarios[n].get('days', 0.0) for n in names],
+        )
+
+    @classmethod
+    def historical(cls, prices: ArrayLike, horizon_days: int = 1,
+                   volatility: Optional[ArrayLike] = None,
+                   dates: Optional[Sequence[datetime]] = None) -> 'ScenarioSet':
+        """
+        Cenários históricos: cada janela de `horizon_days` observações da série
+        de preços (diária) vira um choque de spot; com uma série de volatilidade
+        implícita alinhada, a variação relativa dela vira o choque de vol
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        h = horizon_days
+        if prices.size <= h:
+            raise ValueError("Histórico menor que o horizonte do cenário")
+        spot = prices[h:] / prices[:-h] - 1.0
+        vol = 0.0 if volatility is None else np.asarray(volatility, dtype=np.float64)
+        if volatility is not None:
+            vol = vol[h:] / vol[:-h] - 1.0
+        names = ([f"{d:%Y-%m-%d}" for d in dates[h:]] if dates is not None
+                 else [f"hist_{i}" for i in range(spot.size)])
+        return cls.from_arrays(names, spot, vol, float(h))
+
+    def concat(self, *others: 'ScenarioSet') -> 'ScenarioSet':
+        sets = (self,) + others
+        return ScenarioSet(
+            name=np.concatenate([s.name for s in sets]),
+            spot_shock=np.concatenate([s.spot_shock for s in sets]),
+            vol_shock=np.concatenate([s.vol_shock for s in sets]),
+            time_shift=np.concatenate([s.time_shift for s in sets]),
+        )
+
+
+@dataclass
+class ScenarioLegs:
+    """
+    Parâmetros de precificação das posições, um array por campo
+    """
+    spot: np.ndarray
+    strike: np.ndarray
+    time_to_expiry: np.ndarray
+    volatility: np.ndarray
+    is_call: np.ndarray
+    quantity: np.ndarray
+    underlying: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.strike.size)
+
+    @classmethod
+    def from_positions(cls, positions: Positions, spot: SpotLike, now: datetime,
+                       volatility: Optional[ArrayLike] = None,
+                       quantity: Optional[ArrayLike] = None) -> 'ScenarioLegs':
+        """
+        Monta as pernas a partir de contratos ou de uma OptionChain. `spot` é um
+        valor único ou um dict por subjacente; sem `volatility`, usa a coluna
+        implied_volatility da cadeia.
+        """
+        if isinstance(positions, list) or isinstance(positions, tuple):
+            underlying = np.array([p.underlying for p in positions], dtype=str)
+            strike = np.array([p.strike_price for p in positions], dtype=np.float64)
+            expiry = np.array([p.expiry for p in positions], dtype='datetime64[ms]')
+            is_call = np.array([p.is_call for p in positions], dtype=bool)
+            chain_vol = None
+        else:
+            underlying, strike, expiry, is_call = positions.underlying, positions.strike, positions.expiry, positions.is_call
+            chain_vol = positions.implied_volatility
+        if volatility is None:
+            if chain_vol is None:
+                raise ValueError("Informe a volatilidade das posições")
+            volatility = chain_vol
+
+        n = strike.size
+        if isinstance(spot, Mapping):
+            spots = np.array([spot[u] for u in underlying.tolist()], dtype=np.float64)
+        else:
+            spots = np.full(n, float(spot))
+        return cls(
+            spot=spots,
+            strike=strike,
+            time_to_expiry=np.maximum(year_fraction(expiry, now), 0.0),
+            volatility=np.broadcast_to(np.asarray(volatility, dtype=np.float64), (n,)),
+            is_call=is_call,
+            quantity=np.broadcast_to(np.asarray(1.0 if quantity is None else quantity, dtype=np.float64), (n,)),
+            underlying=np.asarray(underlying, dtype=str),
+        )
+
+
+@dataclass
+class ScenarioResult:
+    scenarios: ScenarioSet
+    base_value: float
+    pnl: np.ndarray  # (cenários, pernas)
+
+    @property
+    def total(self) -> np.ndarray:
+        return self.pnl.sum(axis=1)
+
+    def worst(self, n: int = 5) -> pd.Series:
+        total = self.total
+        order = np.argsort(total)[:n]
+        return pd.Series(total[order], index=self.scenarios.name[order])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'spot_shock': self.scenarios.spot_shock,
+            'vol_shock': self.scenarios.vol_shock,
+            'time_shift_days': self.scenarios.time_shift * DAYS_PER_YEAR,
+            'pnl': self.total,
+        }, index=pd.Index(self.scenarios.name, name='scenario'))
+
+
+class ScenarioEngine:
+    """
+    Reavaliação completa (Black-Scholes) de todas as pernas em todos os
+    cenários numa computação com broadcasting (cenários x pernas). Os cenários
+    são processados em blocos para limitar a memória intermediária.
+    """
+
+    def __init__(self, analysis: Optional[AnalysisService] = None,
+                 max_chunk_elements: int = 2_000_000) -> None:
+        self.analysis = analysis or AnalysisService()
+        self.max_chunk_elements = max_chunk_elements
+
+    def revalue(self, legs: ScenarioLegs, scenarios: ScenarioSet) -> ScenarioResult:
+        price = self.analysis.calculate_price_batch
+        base = price(legs.spot, legs.strike, legs.time_to_expiry, legs.volatility, legs.is_call)
+        pnl = np.empty((len(scenarios), len(legs)))
+        chunk = max(1, self.max_chunk_elements // max(len(legs), 1))
+        for start in range(0, len(scenarios), chunk):
+            rows = slice(start, start + chunk)
+            spot = legs.spot * (1.0 + scenarios.spot_shock[rows, None])
+            vol = legs.volatility * (1.0 + scenarios.vol_shock[rows, None])
+            t = np.maximum(legs.time_to_expiry - scenarios.time_shift[rows, None], 0.0)
+            pnl[rows] = (price(spot, legs.strike, t, vol, legs.is_call) - base) * legs.quantity
+        return ScenarioResult(scenarios=scenarios, base_value=float(base @ legs.quantity), pnl=pnl)
@@ -0,0 +1,347 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+
+from models.market_model import OptionChain, OptionContract
+from services.analysis_service import AnalysisService, Greeks
+from services.greeks_book import GREEKS
+from utils.clock import year_fraction
+
+STRIKE_SELECTORS = ('strike', 'moneyness', 'delta')
+SEARCH_METRICS = ('net_cost', 'max_profit', 'max_loss', 'reward_risk') + GREEKS
+
+
+@dataclass(frozen=True)
+class LegSpec:
+    """
+    Perna de uma estratégia: tipo, lado, proporção, seletor de strike e de
+    vencimento. `strike` é interpretado conforme `strike_by`: strike absoluto,
+    moneyness K/S ou delta alvo (com sinal, puts negativas). O vencimento é o
+    listado mais próximo de hoje + `expiry_days`.
+    """
+    option_type: str
+    side: str = 'buy'
+    ratio: int = 1
+    strike_by: str = 'moneyness'
+    strike: float = 1.0
+    expiry_days: float = 30.0
+
+    def __post_init__(self) -> None:
+        if self.option_type not in ('call', 'put'):
+            raise ValueError(f"Tipo de opção desconhecido: {self.option_type}")
+        if self.side not in ('buy', 'sell'):
+            raise ValueError(f"Lado desconhecido: {self.side}")
+        if self.strike_by not in STRIKE_SELECTORS:
+            raise ValueError(f"Seletor de strike desconhecido: {self.strike_by}")
+
+    @property
+    def is_call(self) -> bool:
+        return self.option_type == 'call'
+
+    @property
+    def quantity(self) -> float:
+        return float(self.ratio if self.side == 'buy' else -self.ratio)
+
+
+@dataclass(frozen=True)
+class StrategySpec:
+    """
+    Estratégia declarativa; com `ordered`, a busca só considera combinações
+    com strikes crescentes na ordem das pernas (não decrescentes se `strict` for falso)
+    """
+    name: str
+    legs: Tuple[LegSpec, ...]
+    ordered: bool = True
+    strict: bool = True
+
+    @property
+    def quantity(self) -> np.ndarray:
+        return np.array([leg.quantity for leg in self.legs])
+
+    @property
+    def is_call(self) -> np.ndarray:
+        return np.array([leg.is_call for leg in self.legs])
+
+
+def bull_call_spread(lower: float = 0.95, upper: float = 1.05, expiry_days: float = 30.0,
+                     strike_by: str = 'moneyness') -> StrategySpec:
+    return StrategySpec('bull_call_spread', (
+        LegSpec('call', 'buy', 1, strike_by, lower, expiry_days),
+        LegSpec('call', 'sell', 1, strike_by, upper, expiry_days),
+    ))
+
+
+def iron_condor(put_strikes: Tuple[float, float] = (0.85, 0.90), call_strikes: Tuple[float, float] = (1.10, 1.15),
+                expiry_days: float = 30.0, strike_by: str = 'moneyness') -> StrategySpec:
+    return StrategySpec('iron_condor', (
+        LegSpec('put', 'buy', 1, strike_by, put_strikes[0], expiry_days),
+        LegSpec('put', 'sell', 1, strike_by, put_strikes[1], expiry_days),
+        LegSpec('call', 'sell', 1, strike_by, call_strikes[0], expiry_days),
+        LegSpec('call', 'buy', 1, strike_by, call_strikes[1], expiry_days),
+    ))
+
+
+def butterfly(width: float = 0.05, center: float = 1.0, expiry_days: float = 30.0) -> StrategySpec:
+    return StrategySpec('butterfly', (
+        LegSpec('call', 'buy', 1, 'moneyness', center - width, expiry_days),
+        LegSpec('call', 'sell', 2, 'moneyness', center, expiry_days),
+        LegSpec('call', 'buy', 1, 'moneyness', center + width, expiry_days),
+    ))
+
+
+def straddle(expiry_days: float = 30.0) -> StrategySpec:
+    return StrategySpec('straddle', (
+        LegSpec('put', 'buy', 1, 'moneyness', 1.0, expiry_days),
+        LegSpec('call', 'buy', 1, 'moneyness', 1.0, expiry_days),
+    ), strict=False)
+
+
+def payoff_extremes(strikes: np.ndarray, is_call: np.ndarray, quantity: np.ndarray,
+                    net_cost: np.ndarray, block: int = 200_000) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lucro máximo e perda máxima (negativa) no vencimento de m combinações
+    (strikes m x pernas). O payoff é linear por partes com quebras nos
+    strikes, então basta avaliá-lo neles, em zero e na inclinação final.
+    As combinações são processadas em blocos de `block` linhas.
+    """
+    strikes = np.atleast_2d(strikes)
+    net_cost = np.asarray(net_cost, dtype=np.float64)
+    tail_slope = float(quantity[is_call].sum())
+    max_profit = np.empty(strikes.shape[0])
+    max_loss = np.empty(strikes.shape[0])
+    for start in range(0, strikes.shape[0], block):
+        rows = slice(start, start + block)
+        k = strikes[rows]
+        points = np.concatenate([np.zeros((k.shape[0], 1)), k], axis=1)
+        moves = points[:, :, None] - k[:, None, :]
+        intrinsic = np.where(is_call, np.maximum(moves, 0.0), np.maximum(-moves, 0.0))
+        profit = intrinsic @ quantity - net_cost[rows, None]
+        max_profit[rows] = profit.max(axis=1)
+        max_loss[rows] = profit.min(axis=1)
+    if tail_slope > 0:
+        max_profit[:] = np.inf
+    if tail_slope < 0:
+        max_loss[:] = -np.inf
+    return max_profit, max_loss
+
+
+def break_even_points(strikes: ArrayLike, is_call: ArrayLike, quantity: ArrayLike, net_cost: float) -> List[float]:
+    """
+    Preços do subjacente no vencimento em que o lucro da estratégia é zero
+    """
+    k = np.asarray(strikes, dtype=np.float64)
+    call = np.asarray(is_call, dtype=bool)
+    q = np.asarray(quantity, dtype=np.float64)
+    points = np.unique(np.concatenate([[0.0], k, [2.0 * k.max() + 1.0]]))
+    moves = points[:, None] - k[None, :]
+    profit = np.where(call, np.maximum(moves, 0.0), np.maximum(-moves, 0.0)) @ q - net_cost
+    result = []
+    for i in np.flatnonzero(np.sign(profit[:-1]) * np.sign(profit[1:]) < 0).tolist():
+        x0, x1, y0, y1 = points[i], points[i + 1], profit[i], profit[i + 1]
+        result.append(float(x0 - y0 * (x1 - x0) / (y1 - y0)))
+    return result
+
+
+@dataclass
+class ResolvedStrategy:
+    """
+    Estratégia resolvida contra a cadeia listada: linhas da cadeia, contratos e
+    quantidades assinadas de cada perna
+    """
+    spec: StrategySpec
+    rows: np.ndarray
+    contracts: List[OptionContract]
+    quantity: np.ndarray
+    strike: np.ndarray
+    premium: np.ndarray
+    greeks: np.ndarray  # (pernas, 5)
+
+    def metrics(self) -> Dict[str, object]:
+        net_cost = float(self.premium @ self.quantity)
+        is_call = self.spec.is_call
+        max_profit, max_loss = payoff_extremes(self.strike[None, :], is_call, self.quantity, np.array([net_cost]))
+        break_evens = break_even_points(self.strike, is_call, self.quantity, net_cost)
+        totals = self.greeks.T @ self.quantity
+        return {
+            'net_cost': net_cost,
+            'net_credit': -net_cost,
+            'max_profit': float(max_profit[0]),
+            'max_loss': float(max_loss[0]),
+            'break_even': break_evens[0] if break_evens else float('nan'),
+            'break_evens': break_evens,
+            'greeks': Greeks(**dict(zip(GREEKS, totals.tolist()))),
+        }
+
+
+class StrategyBuilder:
+    """
+    Resolve estratégias declarativas contra os strikes e vencimentos listados
+    de uma OptionChain. Cada (tipo, vencimento) é uma fatia da cadeia ordenada
+    por strike, então a escolha do strike é uma busca binária (searchsorted)
+    por strike, moneyness ou delta, que também é monótono no strike.
+
+    Preço e Greeks de todos os contratos são calculados uma vez na construção,
+    com a IV da cadeia onde existe e `volatility` no restante; o preço de
+    mercado é usado quando positivo.
+    """
+
+    def __init__(self, chain: OptionChain, spot: float, analysis: Optional[AnalysisService] = None,
+                 now: Optional[datetime] = None, volatility: float = 0.6) -> None:
+        self.chain = chain
+        self.spot = spot
+        self.analysis = analysis or AnalysisService()
+        self.now = now or self.analysis.clock.now()
+        vol = np.where(np.isfinite(chain.implied_volatility), chain.implied_volatility, volatility)
+        t = np.maximum(year_fraction(chain.expiry, self.now), 0.0)
+        batch = self.analysis.calculate_greeks_batch(spot, chain.strike, t, vol, chain.is_call)
+        self.premium = np.where(chain.price > 0, chain.price, batch.price)
+        self.greeks = np.column_stack([getattr(batch, greek) for greek in GREEKS])
+        self.delta = np.where(np.isfinite(chain.delta), chain.delta, batch.delta)
+        self.expiries = chain.expiries
+        self._contracts: Optional[List[OptionContract]] = None
+
+    def _expiry_for(self, days: float) -> np.datetime64:
+        if self.expiries.size == 0:
+            raise ValueError("Cadeia vazia")
+        target = np.datetime64(self.now + timedelta(days=days), 'ms')
+        i = int(np.searchsorted(self.expiries, target))
+        if i == self.expiries.size or (i > 0 and target - self.expiries[i - 1] <= self.expiries[i] - target):
+            i -= 1
+        return self.expiries[i]
+
+    def _rows(self, leg: LegSpec) -> np.ndarray:
+        """
+        Linhas da cadeia do tipo e vencimento da perna, ordenadas por strike
+        """
+        expiry = self._expiry_for(leg.expiry_days)
+        offset = 0 if leg.is_call else self.chain.n_calls
+        side = self.chain.calls if leg.is_call else self.chain.puts
+        start = int(np.searchsorted(side.expiry, expiry, side='left'))
+        end = int(np.searchsorted(side.expiry, expiry, side='right'))
+        return np.arange(offset + start, offset + end)
+
+    def _select(self, leg: LegSpec, rows: np.ndarray) -> int:
+        """
+        Posição, dentro de `rows`, do strike escolhido pelo seletor da perna
+        """
+        if rows.size == 0:
+            raise ValueError(f"Nenhum contrato listado para a perna {leg}")
+        if leg.strike_by == 'delta':
+            # Delta decresce com o strike (calls e puts): busca sobre -delta, crescente
+            keys, target = -self.delta[rows], -leg.strike
+        else:
+            keys = self.chain.strike[rows]
+            target = leg.strike * self.spot if leg.strike_by == 'moneyness' else leg.strike
+        i = int(np.searchsorted(keys, target))
+        if i == keys.size or (i > 0 and target - keys[i - 1] <= keys[i] - target):
+            return i - 1
+        return i
+
+    def contracts(self) -> List[OptionContract]:
+        if self._contracts is None:
+            self._contracts = self.chain.to_contracts()
+        return self._contracts
+
+    def resolve(self, spec: StrategySpec) -> ResolvedStrategy:
+        """
+        Escolhe o contrato listado de cada perna; com `ordered`, cada perna só
+        pode usar strikes acima do da anterior, para que grades esparsas não
+        colapsem duas pernas no mesmo strike
+        """
+        rows: List[int] = []
+        for leg in spec.legs:
+            candidates = self._rows(leg)
+            if spec.ordered and rows:
+                previous = self.chain.strike[rows[-1]]
+                strikes = self.chain.strike[candidates]
+                candidates = candidates[strikes > previous] if spec.strict else candidates[strikes >= previous]
+            rows.append(int(candidates[self._select(leg, candidates)]))
+        return self._resolved(spec, np.array(rows, dtype=np.intp))
+
+    def _resolved(self, spec: StrategySpec, rows: np.ndarray) -> ResolvedStrategy:
+        contracts = self.contracts()
+        return ResolvedStrategy(
+            spec=spec,
+            rows=rows,
+            contracts=[contracts[i] for i in rows.tolist()],
+            quantity=spec.quantity,
+            strike=self.chain.strike[rows],
+            premium=self.premium[rows],
+            greeks=self.greeks[rows],
+        )
+
+    def _combinations(self, spec: StrategySpec, window: Optional[int]) -> np.ndarray:
+        """
+        Todas as combinações de linhas (combinações x pernas), montadas perna a
+        perna e já filtradas pela ordem dos strikes
+        """
+        combos = np.zeros((1, 0), dtype=np.intp)
+        strike = self.chain.strike
+        for leg in spec.legs:
+            candidates = self._rows(leg)
+            if window is not None and candidates.size:
+                center = self._select(leg, candidates)
+                candidates = candidates[max(center - window, 0):center + window + 1]
+            combos = np.concatenate([
+                np.repeat(combos, candidates.size, axis=0),
+                np.tile(candidates, combos.shape[0])[:, None]
+            ], axis=1)
+            if spec.ordered and combos.shape[1] > 1:
+                previous, current = strike[combos[:, -2]], strike[combos[:, -1]]
+                combos = combos[current > previous] if spec.strict else combos[current >= previous]
+        return combos
+
+    def search(self, spec: StrategySpec, rank_by: str = 'reward_risk', ascending: bool = False,
+               top: Optional[int] = 20, window: Optional[int] = None,
+               max_cost: Optional[float] = None) -> pd.DataFrame:
+        """
+        Avalia todas as combinações de strikes listados para o template e
+        ordena pela métrica escolhida. `window` limita cada perna aos
+        `window` strikes de cada lado do seu seletor; sem ele, usa a fatia
+        inteira. O índice do resultado é a posição da combinação na busca.
+        """
+        frame, _ = self._search(spec, rank_by, ascending, window, max_cost, top)
+        return frame
+
+    def best(self, spec: StrategySpec, rank_by: str = 'reward_risk', ascending: bool = False,
+             window: Optional[int] = None, max_cost: Optional[float] = None) -> ResolvedStrategy:
+        """
+        Melhor combinação da busca, resolvida como estratégia
+        """
+        frame, combos = self._search(spec, rank_by, ascending, window, max_cost, top=1)
+        if frame.empty:
+            raise ValueError("Nenhuma combinação atende aos filtros")
+        return self._resolved(spec, combos[frame.index[0]])
+
+    def _search(self, spec: StrategySpec, rank_by: str, ascending: bool, window: Optional[int],
+                max_cost: Optional[float], top: Optional[int] = None) -> Tuple[pd.DataFrame, np.ndarray]:
+        if rank_by not in SEARCH_METRICS:
+            raise ValueError(f"Métrica desconhecida: {rank_by}")
+        combos = self._combinations(spec, window)
+        quantity = spec.quantity
+        net_cost = self.premium[combos] @ quantity
+        max_profit, max_loss = payoff_extremes(self.chain.strike[combos], spec.is_call, quantity, net_cost)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reward_risk = np.where(max_loss < 0, max_profit / -max_loss, np.inf)
+        metrics: Dict[str, np.ndarray] = dict(net_cost=net_cost, max_profit=max_profit, max_loss=max_loss,
+                                              reward_risk=reward_risk)
+        metrics.update({greek: self.greeks[combos, j] @ quantity for j, greek in enumerate(GREEKS)})
+
+        # Ordena sobre os arrays e só monta o DataFrame das linhas devolvidas
+        key = metrics[rank_by]
+        order = np.argsort(key if ascending else -key, kind='stable')
+        if max_cost is not None:
+            order = order[net_cost[order] <= max_cost]
+        if top is not None:
+            order = order[:top]
+        chosen = combos[order]
+        columns: Dict[str, np.ndarray] = {
+            f'strike_{i}': self.chain.strike[chosen[:, i]] for i in range(len(spec.legs))
+        }
+        columns.update({f'contract_{i}': self.chain.contract_id[chosen[:, i]] for i in range(len(spec.legs))})
+        columns.update({name: values[order] for name, values in metrics.items()})
+        return pd.DataFrame(columns, index=pd.Index(order, name='combination')), combos
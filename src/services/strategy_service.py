@@ -1,134 +1,157 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from models.market_model import OptionContract, OptionAnalysis
+import numpy as np
+from numpy.typing import ArrayLike
+from models.market_model import OptionContract, OptionAnalysis, OptionChain
+from services import strategy_builder
+from services.analysis_service import AnalysisService
 from services.ccxt_service import CCXTService
+from services.greeks_book import GREEKS
+from services.strategy_builder import ResolvedStrategy, StrategyBuilder, StrategySpec
+from utils.clock import year_fraction
 
 class StrategyService:
-    def __init__(self) -> None:
-        self.ccxt_service = CCXTService()
+    def __init__(self, ccxt_service: Optional[CCXTService] = None,
+                 analysis: Optional[AnalysisService] = None) -> None:
+        self.ccxt_service = ccxt_service or CCXTService()
+        self.analysis = analysis or AnalysisService()
+        # Volatilidade das pernas sem cotação (nem IV informada pela exchange)
+        self.default_volatility = 0.6
 
-    async def iron_condor(self, symbol: str, expiry: datetime, width: float = 0.1) -> List[OptionContract]:
+    async def iron_condor(self, symbol: str, expiry: datetime, width: float = 0.1) -> ResolvedStrategy:
         """
-        Cria uma estratégia Iron Condor para o símbolo e data de expiração especificados
+        Cria uma estratégia Iron Condor para o símbolo e data de expiração
+        especificados, com strikes resolvidos na grade listada da exchange
+        (asas compradas em 1 ± width, corpo vendido em 1 ± width/2 do spot).
+        Devolve contratos e quantidades assinadas de cada perna.
         """
-        spot_price = await self.ccxt_service.get_underlying_price(symbol)
-        
-        # Definir strikes (convertendo para float explicitamente)
-        lower_put = float(spot_price * (1 - width))
-        upper_put = float(spot_price * (1 - width/2))
-        lower_call = float(spot_price * (1 + width/2))
-        upper_call = float(spot_price * (1 + width))
-        
-        # Criar contratos
-        contracts = [
-            OptionContract(
-                symbol=symbol,
-                strike_price=lower_put,
-                expiry=expiry,
-                contract_id=f"{symbol}-P-{lower_put}",
-                underlying=symbol,
-                is_call=False,
-                current_price=0.0
-            ),
-            OptionContract(
-                symbol=symbol,
-                strike_price=upper_put,
-                expiry=expiry,
-                contract_id=f"{symbol}-P-{upper_put}",
-                underlying=symbol,
-                is_call=False,
-                current_price=0.0
-            ),
-            OptionContract(
-                symbol=symbol,
-                strike_price=lower_call,
-                expiry=expiry,
-                contract_id=f"{symbol}-C-{lower_call}",
-                underlying=symbol,
-                is_call=True,
-                current_price=0.0
-            ),
-            OptionContract(
-                symbol=symbol,
-                strike_price=upper_call,
-                expiry=expiry,
-                contract_id=f"{symbol}-C-{upper_call}",
-                underlying=symbol,
-                is_call=True,
-                current_price=0.0
-            )
-        ]
-        
-        return contracts
+        spec = strategy_builder.iron_condor((1 - width, 1 - width / 2), (1 + width / 2, 1 + width),
+                                            self._days_until(expiry))
+        return await self._resolve_listed(symbol, expiry, spec)
 
-    async def butterfly(self, symbol: str, expiry: datetime, width: float = 0.05) -> List[OptionContract]:
+    async def butterfly(self, symbol: str, expiry: datetime, width: float = 0.05) -> ResolvedStrategy:
         """
-        Cria uma estratégia Butterfly para o símbolo e data de expiração especificados
+        Cria uma estratégia Butterfly para o símbolo e data de expiração
+        especificados, com strikes resolvidos na grade listada da exchange.
+        Devolve contratos e quantidades assinadas de cada perna.
         """
-        spot_price = await self.ccxt_service.get_underlying_price(symbol)
-        
-        # Definir strikes (convertendo para float explicitamente)
-        lower_strike = float(spot_price * (1 - width))
-        middle_strike = float(spot_price)
-        upper_strike = float(spot_price * (1 + width))
-        
-        # Criar contratos
-        contracts = [
-            OptionContract(
-                symbol=symbol,
-                strike_price=lower_strike,
-                expiry=expiry,
-                contract_id=f"{symbol}-C-{lower_strike}",
-                underlying=symbol,
-                is_call=True,
-                current_price=0.0
-            ),
-            OptionContract(
-                symbol=symbol,
-                strike_price=middle_strike,
-                expiry=expiry,
-                contract_id=f"{symbol}-C-{middle_strike}",
-                underlying=symbol,
-                is_call=True,
-                current_price=0.0
-            ),
-            OptionContract(
-                symbol=symbol,
-                strike_price=upper_strike,
-                expiry=expiry,
-                contract_id=f"{symbol}-C-{upper_strike}",
-                underlying=symbol,
-                is_call=True,
-                current_price=0.0
-            )
-        ]
-        
-        return contracts
+        spec = strategy_builder.butterfly(width, expiry_days=self._days_until(expiry))
+        return await self._resolve_listed(symbol, expiry, spec)
+
+    def create_bull_spread(self, spot_price: float, expiry: datetime, lower_strike: float, upper_strike: float,
+                           underlying: str, volatility: Optional[float] = None,
+                           chain: Optional[OptionChain] = None) -> Tuple[List[OptionContract], Dict[str, Any]]:
+        """
+        Bull call spread (compra lower_strike, vende upper_strike) com métricas
+        teóricas: custo líquido, lucro e perda máximos, break-even e Greeks.
+        Com `chain`, os strikes são ajustados para os listados mais próximos.
+        """
+        spec = strategy_builder.bull_call_spread(lower_strike, upper_strike, self._days_until(expiry), 'strike')
+        chain = chain if chain is not None else self._strike_grid(underlying, expiry, spec)
+        resolved = StrategyBuilder(chain, spot_price, self.analysis,
+                                   volatility=volatility or self.default_volatility).resolve(spec)
+        return resolved.contracts, resolved.metrics()
+
+    def create_iron_condor(self, spot_price: float, expiry: datetime, put_strikes: Tuple[float, float],
+                           call_strikes: Tuple[float, float], underlying: str, volatility: Optional[float] = None,
+                           chain: Optional[OptionChain] = None) -> Tuple[List[OptionContract], Dict[str, Any]]:
+        """
+        Iron condor (puts compra/vende, calls vende/compra, strikes crescentes)
+        com as mesmas métricas de create_bull_spread; net_credit é o prêmio recebido
+        """
+        spec = strategy_builder.iron_condor(put_strikes, call_strikes, self._days_until(expiry), 'strike')
+        chain = chain if chain is not None else self._strike_grid(underlying, expiry, spec)
+        resolved = StrategyBuilder(chain, spot_price, self.analysis,
+                                   volatility=volatility or self.default_volatility).resolve(spec)
+        return resolved.contracts, resolved.metrics()
+
+    async def _resolve_listed(self, symbol: str, expiry: datetime, spec: StrategySpec) -> ResolvedStrategy:
+        spot_price, options = await asyncio.gather(
+            self.ccxt_service.get_underlying_price(symbol),
+            self.ccxt_service.fetch_options_data(symbol, expiry)
+        )
+        chain = self._chain_from_markets(options, symbol)
+        if len(chain) == 0:
+            raise ValueError(f"Nenhuma opção listada para {symbol} em {expiry:%Y-%m-%d}")
+        return StrategyBuilder(chain, spot_price, self.analysis, volatility=self.default_volatility).resolve(spec)
+
+    def _days_until(self, expiry: datetime) -> float:
+        return (expiry - self.analysis.clock.now()).total_seconds() / 86400
+
+    @staticmethod
+    def _strike_grid(underlying: str, expiry: datetime, spec: StrategySpec) -> OptionChain:
+        """
+        Cadeia mínima com exatamente os strikes pedidos, para quando não há grade listada
+        """
+        ids = [f"{underlying}-{expiry:%d%b%y}-{leg.strike:g}-{'C' if leg.is_call else 'P'}".upper() for leg in spec.legs]
+        return OptionChain.from_arrays(
+            contract_id=ids,
+            symbol=ids,
+            underlying=[underlying] * len(ids),
+            expiry=[expiry] * len(ids),
+            is_call=[leg.is_call for leg in spec.legs],
+            strike=[leg.strike for leg in spec.legs],
+        )
+
+    @staticmethod
+    def _chain_from_markets(options: List[Dict[str, Any]], underlying: str) -> OptionChain:
+        """
+        Cadeia a partir dos mercados de opção do ccxt (ou dos simulados do CCXTService)
+        """
+        ids = [str(o.get('id') or o.get('symbol')) for o in options]
+        kinds = [str(o.get('optionType') or o.get('type') or '').lower() for o in options]
+        # Vencimentos em ms nos mercados do ccxt, em segundos nos simulados
+        expiry = np.array([o['expiry'] for o in options], dtype=np.float64)
+        expiry_ms = np.where(expiry < 1e11, expiry * 1000, expiry).astype('int64').astype('datetime64[ms]')
+        return OptionChain.from_arrays(
+            contract_id=ids,
+            symbol=[str(o.get('symbol') or i) for o, i in zip(options, ids)],
+            underlying=[underlying] * len(ids),
+            expiry=expiry_ms,
+            is_call=[kind == 'call' or (kind not in ('call', 'put') and i.endswith('-C')) for kind, i in zip(kinds, ids)],
+            strike=[float(o['strike']) for o in options],
+            price=[float(o.get('price') or 0.0) for o in options],
+        )
 
-    async def calculate_strategy_metrics(self, positions: List[OptionContract]) -> Dict[str, Any]:
+    async def calculate_strategy_metrics(self, positions: List[OptionContract],
+                                         quantity: Optional[ArrayLike] = None) -> Dict[str, Any]:
         """
-        Calcula métricas para uma estratégia, incluindo gregas e custo total
+        Calcula métricas para uma estratégia: custo líquido (positivo = débito)
+        e Greeks completas, ponderados pela quantidade assinada de cada perna
+        (negativa = vendida; padrão +1). As cotações e os preços dos
+        subjacentes são buscados em paralelo e as Greeks saem de uma única
+        chamada em lote; pernas sem cotação usam o preço teórico.
         """
-        total_cost = 0.0
-        total_delta = 0.0
-        total_gamma = 0.0
+        qty = np.broadcast_to(np.asarray(1.0 if quantity is None else quantity, dtype=np.float64), (len(positions),))
+        quotes, spots = await asyncio.gather(
+            self.ccxt_service.get_option_quotes(p.contract_id for p in positions),
+            self.ccxt_service.get_underlying_prices(p.underlying for p in positions)
+        )
+        leg_quotes = [quotes[p.contract_id] for p in positions]
+        spot = np.array([spots[p.underlying] for p in positions], dtype=np.float64)
+        strike = np.array([p.strike_price for p in positions], dtype=np.float64)
+        is_call = np.array([p.is_call for p in positions], dtype=bool)
+        t = np.maximum(year_fraction([p.expiry for p in positions], self.analysis.clock.now()), 0.0)
+        market_price = np.array([np.nan if q['price'] is None else q['price'] for q in leg_quotes], dtype=np.float64)
         
-        for position in positions:
-            # Atualizar preço atual
-            quote = await self.ccxt_service.get_option_quote(position.contract_id)
-            total_cost += quote['price']
-            
-            # Calcular gregas
-            delta = quote.get('delta', 0.0)
-            gamma = quote.get('gamma', 0.0)
-            
-            total_delta += delta
-            total_gamma += gamma
+        # IV da exchange; senão, implícita no preço cotado; senão, a volatilidade padrão
+        volatility = np.array([np.nan if q.get('implied_volatility') is None else q['implied_volatility']
+                               for q in leg_quotes], dtype=np.float64)
+        missing = np.isnan(volatility) & ~np.isnan(market_price)
+        if missing.any():
+            volatility[missing] = self.analysis.calculate_implied_volatility_batch(
+                market_price[missing], spot[missing], strike[missing], t[missing], is_call[missing]
+            ).volatility
+        volatility = np.where(np.isnan(volatility), self.default_volatility, volatility)
         
+        batch = self.analysis.calculate_greeks_batch(spot, strike, t, volatility, is_call)
+        price = np.where(np.isnan(market_price), batch.price, market_price)
         return {
-            'total_cost': total_cost,
-            'greeks': {
-                'delta': total_delta,
-                'gamma': total_gamma
-            }
+            'total_cost': float(price @ qty),
+            'greeks': {greek: float(getattr(batch, greek) @ qty) for greek in GREEKS},
+            'legs': [
+                {'contract_id': p.contract_id, 'quantity': float(q), 'price': float(pr), 'implied_volatility': float(v)}
+                for p, q, pr, v in zip(positions, qty.tolist(), price.tolist(), volatility.tolist())
+            ]
         }
@@ -0,0 +1,220 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike, DTypeLike
+
+# Campos 'category' guardam códigos int32 e uma lista de categorias por ledger
+CATEGORY = 'category'
+_CATEGORY_DTYPE = np.int32
+
+TRADE_FIELDS: List[Tuple[str, str]] = [
+    ('timestamp', 'datetime64[us]'),
+    ('side', CATEGORY),
+    ('quantity', 'float64'),
+    ('price', 'float64'),
+    ('value', 'float64'),
+]
+
+POSITION_FIELDS: List[Tuple[str, str]] = [
+    ('timestamp', 'datetime64[us]'),
+    ('position', 'float64'),
+    ('cash', 'float64'),
+    ('equity', 'float64'),
+]
+
+
+class GrowableColumn:
+    """
+    Array NumPy pré-alocado que dobra de capacidade quando enche. Com `path`,
+    os dados ficam num arquivo mapeado em memória em vez de na heap.
+    """
+
+    def __init__(self, dtype: DTypeLike, capacity: int = 1024, path: Optional[str] = None) -> None:
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self._size = 0
+        self._data = self._allocate(max(capacity, 1), None)
+
+    def _allocate(self, capacity: int, old: Optional[np.ndarray]) -> np.ndarray:
+        if self.path is None:
+            data = np.empty(capacity, dtype=self.dtype)
+            if old is not None:
+                data[:self._size] = old[:self._size]
+            return data
+        if old is not None:
+            # Estende o arquivo e remapeia; views antigas continuam válidas
+            old.flush()  # type: ignore[attr-defined]
+            with open(self.path, 'r+b') as f:
+                f.truncate(capacity * self.dtype.itemsize)
+            return np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(capacity,))
+        return np.memmap(self.path, dtype=self.dtype, mode='w+', shape=(capacity,))
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        if needed > len(self._data):
+            self._data = self._allocate(max(needed, 2 * len(self._data)), self._data)
+
+    def append(self, value: Any) -> None:
+        self._reserve(1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: ArrayLike) -> None:
+        values = np.asarray(values, dtype=self.dtype)
+        self._reserve(values.size)
+        self._data[self._size:self._size + values.size] = values
+        self._size += values.size
+
+    def view(self) -> np.ndarray:
+        view = self._data[:self._size].view(np.ndarray)
+        view.flags.writeable = False
+        return view
+
+    @property
+    def last(self) -> Any:
+        return self._data[self._size - 1]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._data.nbytes)
+
+
+class LedgerView:
+    """
+    Retrato somente-leitura de um Ledger (views das colunas até o tamanho do
+    momento). Indexar por inteiro devolve a linha como dict, como as listas de
+    dicts usadas antes; indexar por nome devolve a coluna inteira.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], categories: Dict[str, List[str]]) -> None:
+        self.columns = columns
+        self.categories = categories
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _row(self, index: int) -> Dict[str, Any]:
+        row: Dict[str, Any] = {}
+        for name, column in self.columns.items():
+            if name in self.categories:
+                row[name] = self.categories[name][column[index]]
+            else:
+                row[name] = column[index].item()
+        return row
+
+    def __getitem__(self, key: Union[int, str, slice]) -> Any:
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return LedgerView({name: column[key] for name, column in self.columns.items()}, self.categories)
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("índice fora do ledger")
+        return self._row(key)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._length):
+            yield self._row(i)
+
+    def decoded(self, name: str) -> np.ndarray:
+        """
+        Coluna categórica convertida de volta para strings (gera cópia)
+        """
+        return np.asarray(self.categories[name], dtype=object)[self.columns[name]]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        DataFrame sobre as mesmas colunas, sem cópia; campos categóricos viram pd.Categorical
+        """
+        data: Dict[str, Any] = {}
+        for name, column in self.columns.items():
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(column, categories=self.categories[name])
+            else:
+                data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self) -> Any:
+        """
+        Tabela pyarrow sobre as mesmas colunas (requer pyarrow instalado)
+        """
+        import pyarrow as pa
+
+        arrays = []
+        for name, column in self.columns.items():
+            if name in self.categories:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(column), pa.array(self.categories[name])))
+            else:
+                arrays.append(pa.array(column))
+        return pa.Table.from_arrays(arrays, names=list(self.columns))
+
+
+class Ledger:
+    """
+    Registro colunar de eventos (trades, snapshots de posição) em arrays
+    NumPy crescentes. Com `directory`, cada coluna é gravada num arquivo
+    .bin mapeado em memória, para execuções longas que não cabem na RAM.
+    """
+
+    def __init__(self, fields: Sequence[Tuple[str, str]], capacity: int = 1024,
+                 directory: Optional[str] = None, name: str = 'ledger') -> None:
+        self.fields = list(fields)
+        self.categories: Dict[str, List[str]] = {}
+        self._codes: Dict[str, Dict[str, int]] = {}
+        self._columns: Dict[str, GrowableColumn] = {}
+        for field_name, dtype in self.fields:
+            path = os.path.join(directory, f"{name}.{field_name}.bin") if directory else None
+            if dtype == CATEGORY:
+                self.categories[field_name] = []
+                self._codes[field_name] = {}
+                dtype = _CATEGORY_DTYPE
+            self._columns[field_name] = GrowableColumn(dtype, capacity, path)
+
+    def _encode(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return code
+
+    def append(self, **values: Any) -> None:
+        for name, column in self._columns.items():
+            value = values[name]
+            column.append(self._encode(name, value) if name in self._codes else value)
+
+    def extend(self, **columns: ArrayLike) -> None:
+        """
+        Acrescenta várias linhas de uma vez a partir de arrays por coluna
+        """
+        for name, column in self._columns.items():
+            values = columns[name]
+            if name in self._codes:
+                uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+                mapping = np.array([self._encode(name, str(u)) for u in uniques], dtype=_CATEGORY_DTYPE)
+                values = mapping[inverse]
+            column.extend(values)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name].view()
+
+    def view(self) -> LedgerView:
+        return LedgerView({name: column.view() for name, column in self._columns.items()},
+                          {name: list(categories) for name, categories in self.categories.items()})
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()))) if self._columns else 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._columns.values())
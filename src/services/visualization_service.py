@@ -1,59 +1,118 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import plotly.graph_objects as go
+import plotly.io as pio
 import plotly.subplots as sp
 import numpy as np
-from typing import List, Dict, Any
-from models.market_model import OptionContract, OptionAnalysis
+from typing import List, Dict, Any, Mapping, Optional, Sequence, Tuple, Union
+from numpy.typing import ArrayLike
+from models.market_model import OptionContract, OptionAnalysis, OptionChain
+from services.payoff_engine import PayoffSurface, expiry_payoff
+
+ChainLike = Union[List[OptionContract], OptionChain]
+Figure = Union[go.Figure, Dict[str, Any]]
+
+# Greek, linha e coluna de cada painel de plot_greeks_surface
+GREEK_PANELS = (("delta", 1, 1), ("gamma", 1, 2), ("theta", 2, 1), ("vega", 2, 2))
+
+
+def _write_figure(figure: Dict[str, Any], path: str, file_format: str) -> str:
+    """
+    Grava uma figura em arquivo; roda nos workers de export_figures
+    """
+    if file_format == "html":
+        pio.write_html(figure, path, include_plotlyjs="cdn", auto_open=False)
+    elif file_format == "json":
+        # Mantém os uids para que a figura recarregada aceite update_figure
+        pio.write_json(figure, path, remove_uids=False)
+    else:
+        # Formatos estáticos (png, svg, pdf...) dependem do pacote opcional kaleido
+        pio.write_image(figure, path, format=file_format)
+    return path
+
 
 class VisualizationService:
-    def __init__(self) -> None:
+    """
+    Monta as figuras sem exibi-las: cada método devolve um go.Figure ou, com
+    as_dict=True, o dict serializável {'data': [...], 'layout': {...}} que o
+    Dash aceita diretamente, sem o custo de validação dos objetos do plotly.
+
+    Os traços têm `uid` estável, então update_figure pode trocar só os
+    arrays x/y de uma figura existente. Séries com pelo menos `webgl_threshold`
+    pontos usam Scattergl (None desliga; `webgl` força por chamada).
+    """
+
+    def __init__(self, webgl_threshold: Optional[int] = 2000, max_workers: Optional[int] = None) -> None:
         self.default_layout = {
             "template": "plotly_dark",
             "margin": dict(l=50, r=50, t=50, b=50)
         }
+        self.webgl_threshold = webgl_threshold
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._subplot_layout: Optional[Dict[str, Any]] = None
 
-    def plot_volatility_surface(self, options: List[OptionContract], analysis: Dict[str, OptionAnalysis]) -> None:
-        # Separa calls e puts
-        calls = [opt for opt in options if opt.is_call]
-        puts = [opt for opt in options if not opt.is_call]
-        
-        # Ordena as opções por strike para criar linhas contínuas
-        calls = sorted(calls, key=lambda x: x.strike_price)
-        puts = sorted(puts, key=lambda x: x.strike_price)
-        
-        # Cria o gráfico
-        fig = go.Figure()
-        
-        if calls:
-            strikes_c = [opt.strike_price for opt in calls]
-            vols_c = [analysis[opt.contract_id].implied_volatility * 100 for opt in calls]  # Converte para porcentagem
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=strikes_c,
-                    y=vols_c,
-                    mode="lines+markers",
-                    name="Calls",
-                    line=dict(color="#00ff00", width=2),
-                    marker=dict(size=8)
-                )
-            )
-        
-        if puts:
-            strikes_p = [opt.strike_price for opt in puts]
-            vols_p = [analysis[opt.contract_id].implied_volatility * 100 for opt in puts]  # Converte para porcentagem
-            
-            fig.add_trace(
-                go.Scatter(
-                    x=strikes_p,
-                    y=vols_p,
+    def _split_chain(self, options: ChainLike,
+                     analysis: Optional[Dict[str, OptionAnalysis]]) -> Tuple[OptionChain, OptionChain]:
+        """
+        Separa calls e puts como views colunares ordenadas por strike
+        """
+        chain = OptionChain.from_contracts(options, analysis) if isinstance(options, list) else options
+        calls, puts = chain.calls, chain.puts
+        # Com um único vencimento a cadeia já está ordenada por strike
+        if len(chain.expiries) > 1:
+            calls = calls.take(np.argsort(calls.strike, kind="stable"))
+            puts = puts.take(np.argsort(puts.strike, kind="stable"))
+        return calls, puts
+
+    def _scatter(self, uid: str, x: ArrayLike, y: ArrayLike, webgl: Optional[bool] = None,
+                 **style: Any) -> Dict[str, Any]:
+        if webgl is None:
+            webgl = self.webgl_threshold is not None and len(x) >= self.webgl_threshold
+        return {"type": "scattergl" if webgl else "scatter", "uid": uid, "x": x, "y": y, **style}
+
+    def _figure(self, data: List[Dict[str, Any]], layout: Dict[str, Any], as_dict: bool) -> Figure:
+        if not as_dict:
+            return go.Figure({"data": data, "layout": layout})
+        # O plotly.js não conhece templates por nome: resolve o template no próprio dict
+        template = layout.get("template")
+        if isinstance(template, str):
+            layout = {**layout, "template": pio.templates[template].to_plotly_json()}
+        return {"data": data, "layout": layout}
+
+    def _greeks_layout(self) -> Dict[str, Any]:
+        """
+        Eixos e títulos da grade 2x2, montados pelo make_subplots uma única vez
+        """
+        if self._subplot_layout is None:
+            layout = sp.make_subplots(
+                rows=2, cols=2,
+                subplot_titles=tuple(greek.capitalize() for greek, _, _ in GREEK_PANELS)
+            ).layout.to_plotly_json()
+            layout.pop("template", None)
+            self._subplot_layout = layout
+        return copy.deepcopy(self._subplot_layout)
+
+    def plot_volatility_surface(self, options: ChainLike, analysis: Optional[Dict[str, OptionAnalysis]] = None,
+                                as_dict: bool = False, webgl: Optional[bool] = None) -> Figure:
+        # Separa calls e puts, ordenados por strike para criar linhas contínuas
+        calls, puts = self._split_chain(options, analysis)
+
+        data = []
+        for uid, name, side, color in (("calls", "Calls", calls, "#00ff00"), ("puts", "Puts", puts, "#ff0000")):
+            if len(side):
+                data.append(self._scatter(
+                    uid,
+                    side.strike,
+                    side.implied_volatility * 100,  # Converte para porcentagem
+                    webgl,
                     mode="lines+markers",
-                    name="Puts",
-                    line=dict(color="#ff0000", width=2),
+                    name=name,
+                    line=dict(color=color, width=2),
                     marker=dict(size=8)
-                )
-            )
+                ))
 
-        # Atualiza o layout
         layout = {
             **self.default_layout,
             "title": "Smile de Volatilidade",
@@ -66,119 +125,153 @@ class VisualizationService:
                 ticksuffix="%"     # Adiciona % nos valores do eixo Y
             )
         }
-        fig.update_layout(**layout)
-        fig.show()
+        return self._figure(data, layout, as_dict)
 
-    def plot_greeks_surface(self, options: List[OptionContract], analysis: Dict[str, OptionAnalysis]) -> None:
+    def plot_greeks_surface(self, options: ChainLike, analysis: Optional[Dict[str, OptionAnalysis]] = None,
+                            as_dict: bool = False, webgl: Optional[bool] = None) -> Figure:
         # Separa calls e puts
-        calls = [opt for opt in options if opt.is_call]
-        puts = [opt for opt in options if not opt.is_call]
-        
-        # Cria subplots para cada Greek
-        fig = sp.make_subplots(
-            rows=2, cols=2,
-            subplot_titles=("Delta", "Gamma", "Theta", "Vega")
-        )
-        
-        greek_positions = {
-            "delta": (1, 1),
-            "gamma": (1, 2),
-            "theta": (2, 1),
-            "vega": (2, 2)
-        }
-        
-        for greek, (row, col) in greek_positions.items():
-            if calls:
-                strikes_c = [opt.strike_price for opt in calls]
-                values_c = [analysis[opt.contract_id].greeks[greek] for opt in calls]
-                
-                fig.add_trace(
-                    go.Scatter(
-                        x=strikes_c,
-                        y=values_c,
-                        mode="lines+markers",
-                        name=f"Calls - {greek.capitalize()}",
-                        line=dict(color="#00ff00", width=2),
-                        marker=dict(size=8)
-                    ),
-                    row=row, col=col
-                )
-            
-            if puts:
-                strikes_p = [opt.strike_price for opt in puts]
-                values_p = [analysis[opt.contract_id].greeks[greek] for opt in puts]
-                
-                fig.add_trace(
-                    go.Scatter(
-                        x=strikes_p,
-                        y=values_p,
+        calls, puts = self._split_chain(options, analysis)
+
+        data = []
+        layout = self._greeks_layout()
+        for greek, row, col in GREEK_PANELS:
+            # Eixos do make_subplots numerados por linha: x, x2, x3, x4
+            panel = (row - 1) * 2 + col
+            suffix = "" if panel == 1 else str(panel)
+            for uid, name, side, color in (("calls", "Calls", calls, "#00ff00"), ("puts", "Puts", puts, "#ff0000")):
+                if len(side):
+                    data.append(self._scatter(
+                        f"{uid}-{greek}",
+                        side.strike,
+                        getattr(side, greek),
+                        webgl,
                         mode="lines+markers",
-                        name=f"Puts - {greek.capitalize()}",
-                        line=dict(color="#ff0000", width=2),
-                        marker=dict(size=8)
-                    ),
-                    row=row, col=col
-                )
-
-        # Atualiza o layout
-        layout = {
+                        name=f"{name} - {greek.capitalize()}",
+                        line=dict(color=color, width=2),
+                        marker=dict(size=8),
+                        xaxis=f"x{suffix}",
+                        yaxis=f"y{suffix}"
+                    ))
+            layout[f"xaxis{suffix}"]["title"] = {"text": "Preço de Exercício"}
+            layout[f"yaxis{suffix}"]["title"] = {"text": greek.capitalize()}
+
+        layout.update({
             **self.default_layout,
             "title": "Greeks vs Strike",
             "showlegend": True,
-            "height": 800,
-            "xaxis_title": "Preço de Exercício",
-            "xaxis2_title": "Preço de Exercício",
-            "xaxis3_title": "Preço de Exercício",
-            "xaxis4_title": "Preço de Exercício",
-            "yaxis_title": "Delta",
-            "yaxis2_title": "Gamma",
-            "yaxis3_title": "Theta",
-            "yaxis4_title": "Vega"
-        }
-        fig.update_layout(**layout)
-        fig.show()
+            "height": 800
+        })
+        return self._figure(data, layout, as_dict)
+
+    def plot_option_payoff(self, option: Union[OptionContract, Sequence[OptionContract]],
+                           price_range: Tuple[float, float], analysis: Dict[str, OptionAnalysis],
+                           quantity: Optional[ArrayLike] = None, points: int = 1000,
+                           as_dict: bool = False, webgl: Optional[bool] = None) -> Figure:
+        """
+        Payoff no vencimento de uma opção ou de uma estratégia (lista de
+        contratos com quantidades assinadas), calculado de uma vez sobre a grade
+        """
+        options = list(option) if isinstance(option, Sequence) else [option]
+        qty = np.broadcast_to(np.asarray(1.0 if quantity is None else quantity, dtype=np.float64), (len(options),))
+        strikes = np.array([o.strike_price for o in options], dtype=np.float64)
 
-    def plot_option_payoff(self, option: OptionContract, price_range: tuple[float, float], analysis: Dict[str, OptionAnalysis]) -> None:
         # Gera pontos para o gráfico
-        prices = np.linspace(price_range[0], price_range[1], 100)
-        if option.is_call:
-            payoffs = np.maximum(0, prices - option.strike_price)
-        else:
-            payoffs = np.maximum(0, option.strike_price - prices)
-        
-        # Adiciona o prêmio da opção
-        current_price = analysis[option.contract_id].theoretical_price
-        net_payoffs = payoffs - current_price
-        
-        # Cria o gráfico
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=prices, 
-            y=payoffs, 
-            name="Payoff Bruto",
-            line=dict(color="#00ff00", width=2)
-        ))
-        fig.add_trace(go.Scatter(
-            x=prices, 
-            y=net_payoffs, 
-            name="Payoff Líquido",
-            line=dict(color="#ff0000", width=2)
-        ))
-        
-        # Adiciona linha vertical no preço de exercício
-        fig.add_vline(
-            x=option.strike_price,
-            line_dash="dash",
-            annotation_text=f"Strike: {option.strike_price:,.2f}"
-        )
-        
+        prices = np.linspace(price_range[0], price_range[1], points)
+        payoffs = expiry_payoff(prices, strikes, [o.is_call for o in options], qty)
+
+        # Desconta o prêmio líquido da estratégia
+        premium = np.array([analysis[o.contract_id].theoretical_price for o in options])
+        net_payoffs = payoffs - premium @ qty
+
+        data = [
+            self._scatter("gross", prices, payoffs, webgl, name="Payoff Bruto",
+                          line=dict(color="#00ff00", width=2)),
+            self._scatter("net", prices, net_payoffs, webgl, name="Payoff Líquido",
+                          line=dict(color="#ff0000", width=2)),
+        ]
+
+        # Linha vertical em cada preço de exercício, direto no layout
+        unique_strikes = np.unique(strikes).tolist()
+        title = f"Payoff da Opção {options[0].symbol}" if len(options) == 1 else "Payoff da Estratégia"
         layout = {
             **self.default_layout,
-            "title": f"Payoff da Opção {option.symbol}",
+            "title": title,
             "xaxis_title": "Preço do Ativo",
             "yaxis_title": "Payoff",
             "showlegend": True,
-            "hovermode": "x unified"
+            "hovermode": "x unified",
+            "shapes": [
+                dict(type="line", x0=k, x1=k, y0=0, y1=1, xref="x", yref="paper", line=dict(dash="dash"))
+                for k in unique_strikes
+            ],
+            "annotations": [
+                dict(x=k, y=1, xref="x", yref="paper", text=f"Strike: {k:,.2f}", showarrow=False,
+                     xanchor="left", yanchor="top")
+                for k in unique_strikes
+            ]
+        }
+        return self._figure(data, layout, as_dict)
+
+    def plot_strategy_pnl(self, surface: PayoffSurface, vol_shift: float = 0.0,
+                          as_dict: bool = False, webgl: Optional[bool] = None) -> Figure:
+        """
+        PnL no vencimento e PnL teórico em cada horizonte T+n da superfície
+        """
+        data = [self._scatter("expiry", surface.spot, surface.expiry, webgl, name="Vencimento",
+                              line=dict(color="#ff0000", width=2))]
+        for days in surface.days.tolist():
+            data.append(self._scatter(f"t+{days:g}", surface.spot, surface.curve(days, vol_shift), webgl,
+                                      name=f"T+{days:g}", line=dict(width=1.5)))
+
+        layout = {
+            **self.default_layout,
+            "title": "PnL da Estratégia",
+            "xaxis_title": "Preço do Ativo",
+            "yaxis_title": "PnL",
+            "showlegend": True,
+            "hovermode": "x unified",
+            "shapes": [dict(type="line", x0=0, x1=1, y0=0, y1=0, xref="paper", yref="y", line=dict(dash="dot"))]
         }
-        fig.update_layout(**layout)
-        fig.show()
+        return self._figure(data, layout, as_dict)
+
+    def update_figure(self, figure: Figure, new: Figure) -> Figure:
+        """
+        Copia os arrays x/y dos traços de `new` para os traços de mesmo uid
+        de `figure`, sem reconstruir eixos e subplots. Se o conjunto de
+        traços mudou (ex.: a cadeia passou a ter puts), devolve `new`.
+        """
+        new_traces = new["data"] if isinstance(new, dict) else [trace.to_plotly_json() for trace in new.data]
+        traces = figure["data"] if isinstance(figure, dict) else figure.data
+        by_uid = {trace.get("uid"): trace for trace in new_traces}
+        uids = [trace.get("uid") if isinstance(trace, dict) else trace.uid for trace in traces]
+        if None in by_uid or len(uids) != len(by_uid) or set(uids) != set(by_uid):
+            return new
+        if isinstance(figure, dict):
+            for trace in traces:
+                trace["x"] = by_uid[trace["uid"]]["x"]
+                trace["y"] = by_uid[trace["uid"]]["y"]
+        else:
+            with figure.batch_update():
+                for trace in traces:
+                    trace.x = by_uid[trace.uid]["x"]
+                    trace.y = by_uid[trace.uid]["y"]
+        return figure
+
+    def export_figures(self, figures: Mapping[str, Figure], directory: Union[str, Path],
+                       file_format: str = "png", max_workers: Optional[int] = None) -> List[str]:
+        """
+        Grava várias figuras em `directory` ({nome}.{file_format}) num pool
+        de processos; 'html' e 'json' não precisam do kaleido, os formatos
+        estáticos sim. Devolve os caminhos na ordem de `figures`.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        names = list(figures)
+        payloads = [figures[n] if isinstance(figures[n], dict) else figures[n].to_plotly_json() for n in names]
+        paths = [str(directory / f"{name}.{file_format}") for name in names]
+        formats = [file_format] * len(names)
+        workers = min(max_workers or self.max_workers, len(names))
+        if workers <= 1:
+            return [_write_figure(f, p, fmt) for f, p, fmt in zip(payloads, paths, formats)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_write_figure, payloads, paths, formats))
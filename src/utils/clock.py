@@ -0,0 +1,66 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Union, overload
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+_MS_PER_YEAR = SECONDS_PER_YEAR * 1000
+
+
+class Clock(ABC):
+    """
+    Fonte do instante de avaliação. Serviços recebem um Clock em vez de chamar
+    datetime.now() diretamente, o que permite fixar um único timestamp por
+    passada de análise e simular o tempo em backtests.
+    """
+
+    @abstractmethod
+    def now(self) -> datetime:
+        ...
+
+
+class SystemClock(Clock):
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class SimulatedClock(Clock):
+    """
+    Relógio controlado manualmente, para backtests e testes determinísticos
+    """
+
+    def __init__(self, start: datetime) -> None:
+        self._now = start
+
+    def now(self) -> datetime:
+        return self._now
+
+    def set(self, moment: datetime) -> None:
+        self._now = moment
+
+    def advance(self, delta: Union[timedelta, float]) -> datetime:
+        if not isinstance(delta, timedelta):
+            delta = timedelta(seconds=delta)
+        self._now += delta
+        return self._now
+
+
+@overload
+def year_fraction(expiry: datetime, now: datetime) -> float: ...
+@overload
+def year_fraction(expiry: ArrayLike, now: datetime) -> np.ndarray: ...
+
+
+def year_fraction(expiry: Union[datetime, ArrayLike], now: datetime) -> Union[float, np.ndarray]:
+    """
+    Tempo até o vencimento em anos (base 365 dias). Aceita um datetime ou um
+    array de vencimentos (datetime64 ou datetimes), calculado de forma
+    vetorizada contra o mesmo instante `now`.
+    """
+    if isinstance(expiry, datetime):
+        return (expiry - now).total_seconds() / SECONDS_PER_YEAR
+    expiries = np.asarray(expiry, dtype='datetime64[ms]')
+    elapsed = (expiries - np.datetime64(now, 'ms')) / np.timedelta64(1, 'ms')
+    return elapsed / _MS_PER_YEAR
@@ -1,7 +1,7 @@
 from typing import List, Dict, Any, Tuple, Optional, Union
 import dash
 from dash import html, dcc
-from dash._callback import Output, Input
+from dash._callback import Output, Input, State
 from dash._utils import Options
 import dash_bootstrap_components as dbc  # type: ignore
 import plotly.graph_objects as go
@@ -12,20 +12,23 @@ from services.ccxt_service import CCXTService
 from services.analysis_service import AnalysisService
 from services.visualization_service import VisualizationService
 from services.strategy_service import StrategyService
-from models.market_model import OptionContract, OptionAnalysis
+from services.greeks_cache import GreeksCache
+from models.market_model import OptionChain, OptionContract, OptionAnalysis
 
 # Inicializa app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 # Serviços
 ccxt_service = CCXTService()
-analysis_service = AnalysisService()
-visualization_service = VisualizationService()
+analysis_service = AnalysisService(cache=GreeksCache(ttl=60.0))
+# Milhares de strikes: acima do limiar, os traços usam Scattergl
+visualization_service = VisualizationService(webgl_threshold=1000)
 strategy_service = StrategyService()
 
 # Estado global
 positions: List[OptionContract] = []
 analysis_results: Dict[str, OptionAnalysis] = {}
+spot_prices: Dict[str, float] = {}
 
 # Layout
 symbol_options: List[Options] = [
@@ -134,6 +137,7 @@ async def update_market_data(symbol: str) -> Tuple[go.Figure, html.Table]:
         
         # Cria gráfico de preço
         spot_price = await ccxt_service.get_underlying_price(symbol)
+        spot_prices[symbol] = spot_price
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=[datetime.now()], y=[spot_price], mode='lines+markers'))
         
@@ -165,17 +169,24 @@ async def update_market_data(symbol: str) -> Tuple[go.Figure, html.Table]:
 
 @app.callback(
     Output('greeks-chart', 'figure'),
-    [Input('symbol-dropdown', 'value')]
+    [Input('option-chain', 'children')],
+    [State('symbol-dropdown', 'value'),
+     State('greeks-chart', 'figure')]
 )
-def update_greeks(symbol: str) -> go.Figure:
+def update_greeks(_: Any, symbol: str, current: Optional[Dict[str, Any]]) -> Union[go.Figure, Dict[str, Any]]:
     """
-    Atualiza gráfico dos Greeks quando o símbolo muda
+    Atualiza gráfico dos Greeks depois que a cadeia do símbolo é carregada.
+    A cadeia é analisada em lote; se o gráfico atual tem os mesmos traços,
+    só os arrays x/y são trocados.
     """
     try:
-        if not positions:
+        if not positions or symbol not in spot_prices:
             return go.Figure()
-            
-        fig = visualization_service.plot_greeks_surface(positions, analysis_results)
+
+        chain = analysis_service.analyze_chain(OptionChain.from_contracts(positions), spot_prices[symbol])
+        fig = visualization_service.plot_greeks_surface(chain, as_dict=True)
+        if current and current.get('data'):
+            return visualization_service.update_figure(current, fig)
         return fig
         
     except Exception as e:
@@ -194,8 +205,8 @@ async def update_strategy(strategy: str) -> Tuple[html.Div, html.Div]:
     try:
         if strategy == 'iron_condor':
             expiry = datetime.now() + timedelta(days=30)
-            positions = await strategy_service.iron_condor("BTC/USD", expiry)
-            metrics = await strategy_service.calculate_strategy_metrics(positions)
+            resolved = await strategy_service.iron_condor("BTC/USD", expiry)
+            metrics = await strategy_service.calculate_strategy_metrics(resolved.contracts, resolved.quantity)
             
             return (
                 html.Div([
@@ -206,14 +217,16 @@ async def update_strategy(strategy: str) -> Tuple[html.Div, html.Div]:
                     html.H5("Strategy Metrics"),
                     html.P(f"Total Cost: ${metrics['total_cost']:.2f}"),
                     html.P(f"Delta: {metrics['greeks']['delta']:.2f}"),
-                    html.P(f"Gamma: {metrics['greeks']['gamma']:.2f}")
+                    html.P(f"Gamma: {metrics['greeks']['gamma']:.2f}"),
+                    html.P(f"Theta: {metrics['greeks']['theta']:.2f}"),
+                    html.P(f"Vega: {metrics['greeks']['vega']:.2f}")
                 ])
             )
         
         elif strategy == 'butterfly':
             expiry = datetime.now() + timedelta(days=30)
-            positions = await strategy_service.butterfly("BTC/USD", expiry)
-            metrics = await strategy_service.calculate_strategy_metrics(positions)
+            resolved = await strategy_service.butterfly("BTC/USD", expiry)
+            metrics = await strategy_service.calculate_strategy_metrics(resolved.contracts, resolved.quantity)
             
             return (
                 html.Div([
@@ -224,7 +237,9 @@ async def update_strategy(strategy: str) -> Tuple[html.Div, html.Div]:
                     html.H5("Strategy Metrics"),
                     html.P(f"Total Cost: ${metrics['total_cost']:.2f}"),
                     html.P(f"Delta: {metrics['greeks']['delta']:.2f}"),
-                    html.P(f"Gamma: {metrics['greeks']['gamma']:.2f}")
+                    html.P(f"Gamma: {metrics['greeks']['gamma']:.2f}"),
+                    html.P(f"Theta: {metrics['greeks']['theta']:.2f}"),
+                    html.P(f"Vega: {metrics['greeks']['vega']:.2f}")
                 ])
             )
             
@@ -1,7 +1,56 @@
+import asyncio
 import os
 import sys
 from pathlib import Path
 
 # Adiciona o diretório raiz do projeto ao PYTHONPATH
 project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
\ No newline at end of file
+sys.path.insert(0, str(project_root))
+# Os serviços importam `models` e `services` relativos a src/
+sys.path.insert(1, str(project_root / "src"))
+
+from services.ccxt_service import CCXTService
+
+
+# Exchanges falsas compartilhadas pelos testes que usam o CCXTService
+class StubExchange:
+    def __init__(self, has_fetch_tickers=True):
+        self.has = {'fetchTickers': has_fetch_tickers}
+        self.ticker_calls = []
+        self.tickers_calls = []
+    
+    async def fetch_ticker(self, symbol):
+        self.ticker_calls.append(symbol)
+        await asyncio.sleep(0.01)
+        return {'symbol': symbol, 'last': 45000.0 if symbol.startswith('BTC') else 3000.0}
+    
+    async def fetch_tickers(self, symbols):
+        self.tickers_calls.append(list(symbols))
+        await asyncio.sleep(0.01)
+        return {s: {'symbol': s, 'last': 45000.0 if s.startswith('BTC') else 3000.0} for s in symbols}
+
+
+def make_service(exchange, ticker_ttl=60.0):
+    service = CCXTService(simulation_mode=True, ticker_ttl=ticker_ttl)
+    service.simulation_mode = False
+    service.exchange = exchange
+    return service
+
+
+class StubOptionExchange(StubExchange):
+    def __init__(self, has_fetch_tickers=False):
+        super().__init__(has_fetch_tickers)
+        self.active = 0
+        self.max_active = 0
+    
+    async def fetch_ticker(self, symbol):
+        if '-' not in symbol:
+            return await super().fetch_ticker(symbol)
+        self.ticker_calls.append(symbol)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if symbol.endswith('-X'):
+            raise RuntimeError("contrato inexistente")
+        return {'symbol': symbol, 'last': None, 'bid': 100.0, 'ask': 110.0, 'info': {'markIV': '0.55'}}
@@ -1,7 +1,8 @@
 import pytest
+import numpy as np
 from datetime import datetime, timedelta
-from src.services.analysis_service import AnalysisService
-from src.models.market_model import OptionContract
+from services.analysis_service import AnalysisService
+from models.market_model import OptionContract
 
 def test_calculate_implied_volatility():
     service = AnalysisService()
@@ -31,4 +32,82 @@ def test_calculate_greeks():
     assert -1.0 <= greeks.delta <= 1.0  # Delta deve estar entre -1 e 1
     assert greeks.gamma >= 0  # Gamma deve ser positivo
     assert isinstance(greeks.theta, float)  # Theta deve ser um número
-    assert greeks.vega >= 0  # Vega deve ser positivo
\ No newline at end of file
+    assert greeks.vega >= 0  # Vega deve ser positivo
+
+
+def test_calculate_greeks_batch_matches_scalar():
+    service = AnalysisService()
+    
+    spot = np.array([29000.0, 29000.0, 45000.0, 3000.0])
+    strike = np.array([30000.0, 30000.0, 40000.0, 3500.0])
+    time_to_expiry = np.array([30/365, 30/365, 0.5, 7/365])
+    volatility = np.array([0.5, 0.5, 0.8, 0.3])
+    is_call = np.array([True, False, True, False])
+    
+    batch = service.calculate_greeks_batch(spot, strike, time_to_expiry, volatility, is_call)
+    
+    assert len(batch) == 4
+    for i in range(4):
+        args = (spot[i], strike[i], time_to_expiry[i], volatility[i], bool(is_call[i]))
+        greeks = service.calculate_greeks(*args)
+        assert batch.price[i] == pytest.approx(service._black_scholes_price(*args), rel=1e-9)
+        batch_greeks = batch.greeks_at(i)
+        for name in ("delta", "gamma", "theta", "vega", "rho"):
+            assert getattr(batch_greeks, name) == pytest.approx(getattr(greeks, name), rel=1e-9)
+    
+    # Rho positivo para calls e negativo para puts
+    assert batch.rho[0] > 0 > batch.rho[1]
+
+def test_calculate_implied_volatility_batch_recovers_volatility():
+    service = AnalysisService()
+    
+    spot = np.full(5, 45000.0)
+    strike = np.array([35000.0, 40000.0, 45000.0, 50000.0, 60000.0])
+    time_to_expiry = np.array([7/365, 30/365, 60/365, 90/365, 1.0])
+    volatility = np.array([0.3, 0.6, 0.8, 1.1, 1.5])
+    is_call = np.array([False, True, True, False, True])
+    prices = service.calculate_greeks_batch(spot, strike, time_to_expiry, volatility, is_call).price
+    
+    result = service.calculate_implied_volatility_batch(prices, spot, strike, time_to_expiry, is_call)
+    
+    assert result.converged.all()
+    np.testing.assert_allclose(result.volatility, volatility, atol=1e-6)
+    
+    # Partindo das IVs do tick anterior o solver precisa de menos iterações
+    cold = service.calculate_implied_volatility_batch(
+        prices * 1.001, spot, strike, time_to_expiry, is_call, initial_guess='fixed'
+    )
+    warm = service.calculate_implied_volatility_batch(
+        prices * 1.001, spot, strike, time_to_expiry, is_call,
+        initial_volatility=result.volatility, initial_guess='fixed'
+    )
+    assert warm.converged.all()
+    assert warm.iterations.sum() < cold.iterations.sum()
+
+def test_calculate_implied_volatility_batch_flags_arbitrage_prices():
+    service = AnalysisService()
+    
+    # Call abaixo do valor intrínseco e put acima do strike descontado
+    result = service.calculate_implied_volatility_batch(
+        [1000.0, 31000.0], 29000.0, [25000.0, 30000.0], 30/365, [True, False]
+    )
+    
+    assert not result.converged.any()
+    assert np.isnan(result.volatility).all()
+
+def test_approximate_implied_volatility_and_fast_mode():
+    service = AnalysisService()
+    
+    spot = np.full(4, 45000.0)
+    strike = np.array([36000.0, 44000.0, 46000.0, 55000.0])
+    time_to_expiry = np.array([3/365, 30/365, 90/365, 0.5])
+    volatility = np.array([0.4, 0.7, 0.9, 1.2])
+    is_call = np.array([False, True, False, True])
+    prices = service.calculate_greeks_batch(spot, strike, time_to_expiry, volatility, is_call).price
+    
+    guess = service.approximate_implied_volatility_batch(prices, spot, strike, time_to_expiry, is_call)
+    np.testing.assert_allclose(guess, volatility, atol=1e-2)
+    
+    fast = service.calculate_implied_volatility_batch(prices, spot, strike, time_to_expiry, is_call, fast=True)
+    assert (fast.iterations == 1).all()
+    np.testing.assert_allclose(fast.volatility, volatility, atol=1e-4)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from services.backtest_runner import BacktestRunner, parameter_grid, walk_forward_folds
+from services.backtest_service import BacktestService, CandleArrays, CandleWindow
+
+
+def make_candles(n: int = 2000) -> CandleArrays:
+    rng = np.random.default_rng(11)
+    price = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, n)))
+    timestamp = np.datetime64("2024-01-01T00:00") + np.arange(n).astype("timedelta64[m]")
+    return CandleArrays(timestamp=timestamp, price=price)
+
+
+def momentum_signal(candles: CandleArrays, lookback: int, size: float) -> np.ndarray:
+    prices = candles.price
+    signal = np.zeros(len(candles))
+    signal[lookback:] = np.sign(prices[lookback:] - prices[:-lookback]) * size
+    return signal
+
+
+def threshold_strategy(window: CandleWindow, threshold: float) -> float:
+    if len(window) < 2:
+        return 0.0
+    prices = window.arrays.price
+    change = prices[window.end - 1] / prices[window.end - 2] - 1.0
+    return 1.0 if change > threshold else -1.0 if change < -threshold else 0.0
+
+
+def test_parameter_grid_and_folds():
+    assert parameter_grid({"a": [1, 2], "b": ["x"]}) == [{"a": 1, "b": "x"}, {"a": 2, "b": "x"}]
+    folds = walk_forward_folds(100, train_size=40, test_size=20)
+    assert [(f.train_start, f.test_start, f.test_end) for f in folds] == [(0, 40, 60), (20, 60, 80), (40, 80, 100)]
+
+
+def test_sweep_in_process_pool_matches_direct_runs():
+    candles = make_candles()
+    grid = {"lookback": [5, 20], "size": [1.0, 2.0]}
+    with BacktestRunner(candles, max_workers=2) as runner:
+        results = runner.sweep(momentum_signal, grid)
+
+    assert len(results) == 4
+    assert {"lookback", "size", "sharpe_ratio", "n_trades", "final_equity"} <= set(results.columns)
+    expected = BacktestService().run_vectorized_backtest(candles, momentum_signal(candles, 20, 2.0))
+    row = results[(results.lookback == 20) & (results["size"] == 2.0)].iloc[0]
+    assert row.final_equity == pytest.approx(expected.equity_curve[-1])
+
+
+def test_streaming_sweep_and_walk_forward():
+    candles = make_candles(600)
+    with BacktestRunner(candles, max_workers=1) as runner:
+        sweep = runner.sweep(threshold_strategy, {"threshold": [0.005, 0.02]}, mode="streaming")
+        folds = runner.walk_forward(momentum_signal, {"lookback": [3, 10], "size": [1.0]},
+                                    train_size=300, test_size=100)
+
+    assert list(sweep.threshold) == [0.005, 0.02]
+    assert list(folds.fold) == [0, 1, 2]
+    assert set(folds.lookback) <= {3, 10}
+    assert "train_sharpe_ratio" in folds.columns
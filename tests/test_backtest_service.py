@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from typing import List, Sequence
+
+import numpy as np
+import pytest
+
+from models.market_model import MarketData
+from services.backtest_service import BacktestService, CandleArrays, CandleWindow, HistoryView
+
+
+def make_data(n: int = 200) -> List[MarketData]:
+    rng = np.random.default_rng(7)
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, n)))
+    start = datetime(2024, 1, 1)
+    return [
+        MarketData(start + timedelta(minutes=i), float(p), 1.0, float(p) * 1.01, float(p) * 0.99, float(p), float(p))
+        for i, p in enumerate(prices)
+    ]
+
+
+def crossover(history: Sequence[MarketData]) -> float:
+    if len(history) < 5:
+        return 0.0
+    average = sum(candle.price for candle in history[-5:]) / 5
+    return 1.0 if history[-1].price > average else -1.0
+
+
+def crossover_window(window: CandleWindow) -> float:
+    if len(window) < 5:
+        return 0.0
+    prices = window.price
+    return 1.0 if prices[-1] > prices[-5:].mean() else -1.0
+
+
+def test_history_view_behaves_like_truncated_list():
+    data = make_data(10)
+    view = HistoryView(data, 4)
+    assert len(view) == 4
+    assert view[-1] is data[3]
+    assert view[1:3] == data[1:3]
+    assert view[::-1] == data[:4][::-1]
+    assert list(view) == data[:4]
+    with pytest.raises(IndexError):
+        view[4]
+
+
+def test_history_kept_by_strategy_does_not_grow():
+    data = make_data(10)
+    seen = []
+    BacktestService().run_backtest(data, lambda history: seen.append(history) or 0.0)
+    assert [len(history) for history in seen] == list(range(1, 11))
+
+
+def test_run_backtest_matches_slicing_behavior():
+    data = make_data()
+    expected = BacktestService()
+    for i, candle in enumerate(data):
+        signal = crossover(data[:i + 1])
+        if signal != 0:
+            expected._execute_trade(signal, candle.price, candle.timestamp)
+
+    result = BacktestService().run_backtest(data, crossover)
+
+    assert result.trades.to_dicts() == expected.trades.view().to_dicts()
+    np.testing.assert_array_equal(result.equity_curve, expected.equity.view())
+
+
+def test_streaming_backtest_matches_run_backtest():
+    data = make_data()
+    legacy = BacktestService().run_backtest(data, crossover)
+    streaming = BacktestService().run_streaming_backtest(CandleArrays.from_market_data(data), crossover_window)
+
+    assert [t["timestamp"] for t in streaming.trades] == [t["timestamp"] for t in legacy.trades]
+    assert streaming.equity_curve == pytest.approx(legacy.equity_curve)
+    assert streaming.metrics == pytest.approx(legacy.metrics)
+
+
+def test_candle_window_is_read_only_view():
+    arrays = CandleArrays.from_market_data(make_data(20))
+    window = CandleWindow(arrays, end=10)
+    assert len(window.price) == 10
+    assert np.shares_memory(window.price, arrays.price)
+    with pytest.raises(ValueError):
+        window.price[0] = 0.0
+
+
+def test_vectorized_backtest_simple_round_trip():
+    start = np.datetime64("2024-01-01T00:00")
+    arrays = CandleArrays(timestamp=start + np.arange(4).astype("timedelta64[m]"),
+                          price=np.array([10.0, 11.0, 12.0, 11.0]))
+    result = BacktestService().run_vectorized_backtest(arrays, np.array([0.0, 1.0, 1.0, 0.0]))
+
+    assert [t["side"] for t in result.trades] == ["BUY", "SELL"]
+    assert [t["price"] for t in result.trades] == [11.0, 11.0]
+    assert result.trades[0]["timestamp"] == datetime(2024, 1, 1, 0, 1)
+    np.testing.assert_array_equal(result.equity_curve, [10000.0, 10000.0, 10000.0, 10001.0, 10000.0])
+    assert result.positions[-1]["position"] == 0.0
+    assert result.metrics["total_return"] == 0.0
+
+
+def test_vectorized_backtest_matches_reference_loop():
+    data = make_data(500)
+    rng = np.random.default_rng(3)
+    signal = rng.choice([-2.0, 0.0, 1.0, 3.0], size=len(data))
+    result = BacktestService().run_vectorized_backtest(data, signal)
+
+    cash, position, equity = 10000.0, 0.0, [10000.0]
+    for candle, target in zip(data, signal):
+        cash -= (target - position) * candle.price
+        position = target
+        equity.append(cash + position * candle.price)
+
+    np.testing.assert_allclose(result.equity_curve, equity)
+    assert len(result.trades) == int(np.count_nonzero(np.diff(signal, prepend=0.0)))
+
+
+def test_vectorized_backtest_rejects_misaligned_signal():
+    with pytest.raises(ValueError):
+        BacktestService().run_vectorized_backtest(make_data(10), np.zeros(9))
+
+
+def test_empty_vectorized_backtest_ignores_previous_run():
+    service = BacktestService()
+    service.run_streaming_backtest(make_data(3), lambda window: 1.0)
+    assert len(service.trades) > 0
+
+    empty = CandleArrays(timestamp=np.empty(0, dtype="datetime64[us]"), price=np.empty(0))
+    result = service.run_vectorized_backtest(empty, np.empty(0))
+    assert len(result.trades) == 0 and len(result.positions) == 0
+    assert list(result.positions.columns) == ["timestamp", "position", "cash", "equity"]
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from datetime import datetime
+from conftest import StubExchange, StubOptionExchange, make_service
+
+async def test_concurrent_price_requests_are_coalesced():
+    exchange = StubExchange()
+    service = make_service(exchange)
+    
+    prices = await asyncio.gather(*(service.get_underlying_price("BTC/USD") for _ in range(500)))
+    
+    assert set(prices) == {45000.0}
+    assert exchange.ticker_calls == ["BTC/USDT"]
+    
+    # Dentro do TTL o preço vem do cache
+    assert await service.get_underlying_price("BTC/USDT") == 45000.0
+    assert len(exchange.ticker_calls) == 1
+
+async def test_bulk_prices_use_single_fetch_tickers():
+    exchange = StubExchange()
+    service = make_service(exchange)
+    
+    # Uma busca individual já em andamento é reaproveitada pela busca em lote
+    single = asyncio.ensure_future(service.get_underlying_price("ETH/USDT"))
+    await asyncio.sleep(0)
+    prices = await service.get_underlying_prices(["BTC/USD", "ETH/USD", "BTC/USD", "SOL/USDT"])
+    
+    assert prices == {"BTC/USD": 45000.0, "ETH/USD": 3000.0, "SOL/USDT": 3000.0}
+    assert await single == 3000.0
+    assert exchange.tickers_calls == [["BTC/USDT", "SOL/USDT"]]
+    assert exchange.ticker_calls == ["ETH/USDT"]
+
+async def test_cancelled_bulk_fetch_releases_inflight_symbols():
+    exchange = StubExchange()
+    service = make_service(exchange)
+    
+    async def slow_tickers(symbols):
+        await asyncio.sleep(10)
+    
+    exchange.fetch_tickers = slow_tickers
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(service.get_underlying_prices(["BTC/USDT", "ETH/USDT"]), 0.05)
+    
+    assert service._inflight == {}
+    assert await asyncio.wait_for(service.get_underlying_price("BTC/USDT"), 1.0) == 45000.0
+
+class StubMarketsExchange(StubExchange):
+    def __init__(self):
+        super().__init__()
+        self.load_calls = 0
+    
+    async def load_markets(self, reload=False):
+        self.load_calls += 1
+        await asyncio.sleep(0.01)
+        expiry_ms = datetime(2030, 1, 31, 8).timestamp() * 1000
+        markets = {'BTC/USDT': {'id': 'BTCUSDT', 'base': 'BTC', 'type': 'spot', 'expiry': None}}
+        for strike in (40000, 45000, 50000):
+            for kind in ('C', 'P'):
+                market_id = f'BTC-300131-{strike}-{kind}'
+                markets[market_id] = {'id': market_id, 'base': 'BTC', 'type': 'option',
+                                      'strike': strike, 'expiry': expiry_ms}
+        markets['ETH-300131-3000-C'] = {'id': 'ETH-300131-3000-C', 'base': 'ETH', 'type': 'option',
+                                        'strike': 3000, 'expiry': expiry_ms}
+        return markets
+
+async def test_options_lookup_uses_cached_market_index(tmp_path):
+    exchange = StubMarketsExchange()
+    snapshot = str(tmp_path / "markets.json")
+    service = make_service(exchange)
+    service.market_snapshot_path = snapshot
+    
+    results = await asyncio.gather(*(service.fetch_options_data("BTC/USD", datetime(2030, 1, 31)) for _ in range(3)))
+    
+    assert [len(r) for r in results] == [6, 6, 6]
+    assert exchange.load_calls == 1
+    assert await service.fetch_options_data("BTC/USD", datetime(2030, 2, 1)) == []
+    
+    # Cold start de outra instância usa o snapshot em disco sem chamar load_markets
+    cold_exchange = StubMarketsExchange()
+    cold = make_service(cold_exchange)
+    cold.market_snapshot_path = snapshot
+    options = await cold.fetch_options_data("ETH/USD", datetime(2030, 1, 31))
+    assert [o['id'] for o in options] == ['ETH-300131-3000-C']
+    assert cold_exchange.load_calls == 0
+
+async def test_stale_market_index_refreshes_in_background():
+    exchange = StubMarketsExchange()
+    service = make_service(exchange)
+    service.market_ttl = 0.0
+    
+    await service.fetch_options_data("BTC/USD", datetime(2030, 1, 31))
+    await asyncio.sleep(0)
+    options = await service.fetch_options_data("BTC/USD", datetime(2030, 1, 31))
+    
+    # O índice vencido continua servindo enquanto a atualização roda
+    assert len(options) == 6
+    await asyncio.sleep(0.05)
+    assert exchange.load_calls >= 2
+
+async def test_option_quotes_are_fetched_concurrently_within_limit():
+    exchange = StubOptionExchange()
+    service = make_service(exchange)
+    service.max_concurrent_requests = 3
+    ids = [f"BTC-300131-{40000 + 1000 * i}-C" for i in range(10)] + ["BTC-300131-1-X"]
+    
+    quotes = await service.get_option_quotes(ids + ids[:2])
+    
+    assert list(quotes) == ids
+    assert len(exchange.ticker_calls) == 11
+    assert exchange.max_active == 3
+    assert quotes[ids[0]]['price'] == 105.0 and quotes[ids[0]]['implied_volatility'] == 0.55
+    assert quotes["BTC-300131-1-X"]['price'] is None
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from models.market_model import OptionChain, OptionContract
+from services.analysis_service import AnalysisService
+from utils.clock import SimulatedClock, year_fraction
+
+def test_year_fraction_scalar_and_vectorized():
+    now = datetime(2030, 1, 1)
+    expiries = [now + timedelta(days=d) for d in (1, 73, 365)]
+    
+    assert year_fraction(expiries[1], now) == pytest.approx(0.2)
+    np.testing.assert_allclose(year_fraction(expiries, now), [1/365, 0.2, 1.0])
+    np.testing.assert_allclose(
+        year_fraction(np.array(expiries, dtype='datetime64[ms]'), now), [1/365, 0.2, 1.0]
+    )
+
+def test_simulated_clock_makes_analysis_deterministic():
+    clock = SimulatedClock(datetime(2030, 1, 1))
+    service = AnalysisService(clock=clock)
+    expiry = datetime(2030, 1, 31)
+    contract = OptionContract("BTC-C", 45000.0, expiry, "BTC-C", "BTC", True, 1500.0)
+    
+    assert service._calculate_time_to_expiry(expiry) == pytest.approx(30/365)
+    assert contract.time_to_expiry_at(clock.now()) == pytest.approx(30/365)
+    
+    first = service.analyze_chain(OptionChain.from_contracts([contract]), 45000.0, volatility=0.5)
+    clock.advance(timedelta(days=10))
+    second = service.analyze_chain(OptionChain.from_contracts([contract]), 45000.0, volatility=0.5)
+    
+    assert second.theoretical_price[0] < first.theoretical_price[0]
+    assert second.theoretical_price[0] == pytest.approx(service._black_scholes_price(45000.0, 45000.0, 20/365, 0.5, True))
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionContract
+from services.correlation_engine import CorrelationEngine
+from services.risk_service import RiskService
+from utils.clock import SimulatedClock
+
+
+def make_prices(n: int = 400, rho: float = 0.7, seed: int = 4) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n, 3)) @ np.linalg.cholesky([[1, rho, 0], [rho, 1, 0], [0, 0, 1]]).T
+    return 100.0 * np.exp(np.cumsum(0.02 * z, axis=0))
+
+
+def test_sample_estimator_matches_numpy():
+    prices = make_prices()
+    engine = CorrelationEngine(["BTC", "ETH", "SOL"], method="sample").fit(prices)
+    returns = np.diff(np.log(prices), axis=0)
+    np.testing.assert_allclose(engine.covariance(), np.cov(returns, rowvar=False, ddof=0), rtol=1e-10)
+    np.testing.assert_allclose(engine.correlation(), np.corrcoef(returns, rowvar=False), rtol=1e-10)
+
+
+def test_incremental_updates_match_batch_fit():
+    prices = make_prices()
+    batch = CorrelationEngine(["BTC", "ETH", "SOL"], decay=0.97).fit(prices)
+    incremental = CorrelationEngine(["BTC", "ETH", "SOL"], decay=0.97).fit(prices[:200])
+    for row in prices[200:]:
+        incremental.update_prices(dict(zip(["BTC", "ETH", "SOL"], row)))
+    np.testing.assert_allclose(incremental.covariance(), batch.covariance(), rtol=1e-10)
+
+
+def test_shrinkage_and_cached_cholesky():
+    prices = make_prices(n=30)
+    raw = CorrelationEngine(["BTC", "ETH", "SOL"], method="sample").fit(prices)
+    shrunk = CorrelationEngine(["BTC", "ETH", "SOL"], method="sample", shrinkage="ledoit_wolf").fit(prices)
+    assert abs(shrunk.correlation()[0, 1]) < abs(raw.correlation()[0, 1])
+
+    factor = shrunk.cholesky(["ETH", "BTC"])
+    assert factor is shrunk.cholesky(["ETH", "BTC"])
+    np.testing.assert_allclose(factor @ factor.T, shrunk.correlation(["ETH", "BTC"]), atol=1e-9)
+    shrunk.update(np.zeros(3))
+    assert factor is not shrunk.cholesky(["ETH", "BTC"])
+
+
+def test_flat_underlying_has_zero_correlation():
+    prices = make_prices()
+    prices[:, 2] = 50.0
+    engine = CorrelationEngine(["BTC", "ETH", "SOL"], method="sample").fit(prices)
+    correlation = engine.correlation()
+    assert np.isfinite(correlation).all()
+    np.testing.assert_array_equal(correlation[2], [0.0, 0.0, 1.0])
+    factor = engine.cholesky()
+    np.testing.assert_allclose(factor @ factor.T, correlation, atol=1e-9)
+
+
+def test_cholesky_gives_up_on_indefinite_correlation():
+    engine = CorrelationEngine(["BTC", "ETH"], method="sample").fit(make_prices()[:, :2])
+    engine._cache[("correlation", ())] = np.array([[1.0, 2.0], [2.0, 1.0]])
+    with pytest.raises(ValueError):
+        engine.cholesky()
+
+
+def test_risk_service_expands_underlying_correlation_to_positions():
+    engine = CorrelationEngine(["BTC", "ETH", "SOL"], method="sample").fit(make_prices())
+    service = RiskService(clock=SimulatedClock(datetime(2030, 1, 1)), correlation_engine=engine)
+    expiry = datetime(2030, 2, 1)
+    positions = [
+        OptionContract("BTC", 45000.0, expiry, "a", "BTC", True),
+        OptionContract("ETH", 3000.0, expiry, "b", "ETH", True),
+        OptionContract("BTC", 40000.0, expiry, "c", "BTC", False),
+    ]
+    matrix = service._calculate_correlation(positions)
+    assert matrix.shape == (3, 3)
+    assert matrix[0, 2] == 1.0
+    assert matrix[0, 1] == pytest.approx(engine.correlation()[0, 1])
+
+    service.monte_carlo.max_workers = 1
+    risk = service.calculate_monte_carlo_risk(positions, {"BTC": 45000.0, "ETH": 3000.0}, volatility=0.6,
+                                              n_paths=5_000, seed=1)
+    assert risk.value_at_risk < 0
+
+    unknown = RiskService()._calculate_correlation(positions)
+    assert np.isnan(unknown[0, 1]) and unknown[0, 2] == 1.0
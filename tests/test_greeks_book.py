@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionChain, OptionContract
+from services.analysis_service import AnalysisService, Greeks
+from services.greeks_book import GREEKS, GreeksBook
+from services.risk_service import RiskService
+from utils.clock import SimulatedClock
+
+NOW = datetime(2030, 1, 1)
+
+
+def contract(underlying: str, strike: float, days: int, is_call: bool = True) -> OptionContract:
+    expiry = NOW + timedelta(days=days)
+    return OptionContract(underlying, strike, expiry, f"{underlying}-{days}-{strike:g}-{'C' if is_call else 'P'}",
+                          underlying, is_call)
+
+
+def test_incremental_updates_keep_totals_and_buckets_consistent():
+    book = GreeksBook(strike_width=1000.0)
+    a, b, c = contract("BTC", 45000, 30), contract("BTC", 45500, 30, False), contract("ETH", 3000, 60)
+    book.add(a, 2.0, Greeks(delta=0.5, gamma=0.01, theta=-10.0, vega=50.0, rho=5.0))
+    book.add(b, -1.0, {'delta': -0.4, 'gamma': 0.01, 'theta': -8.0, 'vega': 45.0})
+    book.add(c, 3.0, [0.3, 0.02, -1.0, 4.0, 0.5])
+    assert book.totals()['delta'] == pytest.approx(2 * 0.5 + 0.4 + 0.9)
+
+    # Mesmo bucket de strike (45000-46000) e vencimento para a e b
+    ladder = book.ladder('underlying')
+    assert ladder.loc['BTC', 'vega'] == pytest.approx(100.0 - 45.0)
+    assert len(book.to_frame()) == 2
+
+    book.reprice(a.contract_id, Greeks(delta=0.6, gamma=0.01, theta=-10.0, vega=50.0, rho=5.0))
+    book.add(c, -3.0, [0.3, 0.02, -1.0, 4.0, 0.5])
+    assert c.contract_id not in book and len(book) == 2
+    assert book.totals()['delta'] == pytest.approx(1.2 + 0.4)
+    assert list(book.ladder(['underlying', 'expiry']).index.get_level_values('underlying')) == ['BTC']
+
+    book.remove(b.contract_id)
+    book.add(contract("SOL", 100, 7), 1.0, [1, 0, 0, 0, 0])
+    totals = book.totals()
+    book.rebuild()
+    assert book.totals() == pytest.approx(totals)
+
+
+def test_reprice_all_matches_batch_greeks_and_risk_service():
+    analysis = AnalysisService()
+    contracts = [contract("BTC", 40000 + 1000 * i, 10 + i, i % 2 == 0) for i in range(100)]
+    quantity = np.where(np.arange(100) % 3 == 0, -1.0, 2.0)
+    book = GreeksBook(capacity=4)
+    for c, q in zip(contracts, quantity):
+        book.add(c, float(q), Greeks(0, 0, 0, 0))
+    book.reprice_all(analysis, {"BTC": 45000.0}, NOW, 0.6)
+
+    t = np.array([(c.expiry - NOW).total_seconds() / (365 * 86400) for c in contracts])
+    strikes = np.array([c.strike_price for c in contracts])
+    batch = analysis.calculate_greeks_batch(45000.0, strikes, t, 0.6, [c.is_call for c in contracts])
+    for greek in GREEKS:
+        assert book.totals()[greek] == pytest.approx(float(getattr(batch, greek) @ quantity))
+
+    service = RiskService(analysis=analysis, clock=SimulatedClock(NOW))
+    risk = service.calculate_portfolio_risk(contracts, [44000.0, 45000.0], volatility=0.6, quantity=quantity)
+    assert risk.option_greeks['gamma'] == pytest.approx(book.totals()['gamma'])
+
+
+def test_from_batch_matches_incremental_adds():
+    rng = np.random.default_rng(3)
+    contracts = [contract(u, 40000 + 250 * int(k), int(d), bool(c))
+                 for u, k, d, c in zip(rng.choice(["BTC", "ETH"], 300), rng.integers(0, 20, 300),
+                                       rng.choice([7, 30, 90], 300), rng.integers(0, 2, 300))]
+    quantity = rng.choice([-2.0, -1.0, 1.0, 3.0], 300)
+    analysis = AnalysisService()
+    t = np.array([(c.expiry - NOW).total_seconds() / (365 * 86400) for c in contracts])
+    greeks = analysis.calculate_greeks_batch(45000.0, [c.strike_price for c in contracts], t, 0.6,
+                                             [c.is_call for c in contracts])
+
+    batch = GreeksBook.from_batch(contracts, greeks, quantity, strike_width=1000.0)
+    incremental = GreeksBook(strike_width=1000.0)
+    for i, (c, q) in enumerate(zip(contracts, quantity)):
+        incremental.add(c, float(q), [float(getattr(greeks, g)[i]) for g in GREEKS])
+
+    assert len(batch) == len(incremental)
+    assert batch.totals() == pytest.approx(incremental.totals())
+    expected = incremental.to_frame()
+    np.testing.assert_allclose(batch.to_frame().loc[expected.index].to_numpy(), expected.to_numpy(), atol=1e-9)
+
+    # Depois de montado em lote, segue incremental nos mesmos buckets
+    first = contracts[0]
+    batch.add(first, 1.0, [1, 0, 0, 0, 0])
+    incremental.add(first, 1.0, [1, 0, 0, 0, 0])
+    assert len(batch.to_frame()) == len(incremental.to_frame())
+    assert batch.totals()['delta'] == pytest.approx(incremental.totals()['delta'])
+
+
+def test_from_batch_uses_greeks_already_in_the_chain():
+    contracts = [contract("BTC", 45000, 30), contract("BTC", 46000, 30)]
+    chain = OptionChain.from_contracts(contracts)
+    chain.delta[:] = [0.5, np.nan]
+    computed = AnalysisService().calculate_greeks_batch(45000.0, chain.strike, 30 / 365, 0.6, chain.is_call)
+
+    book = GreeksBook.from_batch(chain, computed, [2.0, 1.0])
+    assert book.totals()['delta'] == pytest.approx(2 * 0.5 + float(computed.delta[1]))
@@ -0,0 +1,77 @@
+import threading
+import pytest
+from services.analysis_service import AnalysisService
+from services.greeks_cache import GreeksCache
+
+def test_cache_hit_skips_computation(monkeypatch):
+    service = AnalysisService(cache=GreeksCache())
+    calls = []
+    original = service._compute_greeks
+    
+    def counting_compute(*args):
+        calls.append(args)
+        return original(*args)
+    
+    monkeypatch.setattr(service, "_compute_greeks", counting_compute)
+    
+    first = service.calculate_greeks(29000.0, 30000.0, 30/365, 0.5, True)
+    # Variação menor que um tick reaproveita o valor em cache
+    second = service.calculate_greeks(29000.001, 30000.0, 30/365, 0.5, True)
+    
+    assert len(calls) == 1
+    assert first == second and first is not second
+    assert service.cache.stats.hits == 1
+    assert service.cache.stats.hit_rate == pytest.approx(0.5)
+
+def test_cached_value_does_not_depend_on_call_order():
+    inputs = [(29000.004, 30000.0, 30/365, 0.50004, True), (28999.996, 30000.0, 30/365, 0.49996, True)]
+    results = []
+    for order in (inputs, inputs[::-1]):
+        service = AnalysisService(cache=GreeksCache())
+        results.append([service.calculate_greeks(*args) for args in order])
+    
+    # Todas as entradas do bucket recebem o valor calculado no representante quantizado
+    assert results[0][0] == results[0][1] == results[1][0]
+    cache = GreeksCache()
+    expected = AnalysisService()._compute_greeks(*cache.quantize(*inputs[0][:4]), True)
+    assert results[0][0] == expected
+
+def test_cached_none_is_a_hit():
+    cache = GreeksCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("k", lambda: calls.append(1)) is None
+    assert len(calls) == 1
+    assert cache.stats.hits == 2
+
+def test_cache_lru_eviction_and_ttl():
+    now = [0.0]
+    cache = GreeksCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+    
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" passa a ser o mais recente
+    cache.put("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.stats.evictions == 1
+    
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+def test_cache_shared_between_threads():
+    service = AnalysisService(cache=GreeksCache())
+    
+    def worker():
+        for i in range(200):
+            service._black_scholes_price(45000.0, 40000.0 + i, 0.25, 0.6, i % 2 == 0)
+    
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(service.cache) == 200
+    assert service.cache.stats.hits + service.cache.stats.misses == 800
@@ -0,0 +1,108 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from datetime import datetime
+from services.ccxt_service import CCXTService
+from services.market_recorder import (
+    KIND_ORDER_BOOK, KIND_TICKER, MarketLog, MarketRecorder, ReplayService
+)
+from services.market_stream import MarketStream
+
+T0 = datetime(2030, 1, 1, 12).timestamp()
+EXPIRY = datetime(2030, 1, 31)
+
+def write_log(path):
+    with MarketRecorder(path) as recorder:
+        recorder.record_option_chain("BTC", EXPIRY, [{"symbol": "BTC-45000-C", "strike": 45000.0}], T0)
+        for i in range(5):
+            recorder.record_ticker("BTC/USDT", {"last": 45000.0 + i, "bid": None}, T0 + i * 0.02)
+        recorder.record_order_book("BTC-45000-C", [[150.0, 2.0], [149.0, 1.0]], [[155.0, 3.0]], T0 + 0.05)
+    return path
+
+def test_recorder_round_trip_is_zero_copy(tmp_path):
+    path = write_log(str(tmp_path / "ticks.bin"))
+    
+    with MarketLog(path) as log:
+        records = list(log)
+        assert [r.kind for r in records].count(KIND_TICKER) == 5
+        
+        tickers = [r.decode() for r in log.scan(kinds=[KIND_TICKER], start=T0 + 0.03)]
+        assert [t["last"] for t in tickers] == [45002.0, 45003.0, 45004.0]
+        assert tickers[0]["bid"] is None
+        
+        book = next(log.scan(kinds=[KIND_ORDER_BOOK])).decode()
+        np.testing.assert_array_equal(book["bids"], [[150.0, 2.0], [149.0, 1.0]])
+        # Os níveis apontam para o arquivo mapeado
+        assert not book["bids"].flags.owndata
+        del book
+
+async def test_replay_exposes_ccxt_interface(tmp_path):
+    replay = ReplayService(write_log(str(tmp_path / "ticks.bin")))
+    
+    assert await replay.get_underlying_price("BTC/USD") == 0.0
+    replay.advance_to(T0 + 0.03)
+    assert await replay.get_underlying_price("BTC/USD") == 45001.0
+    assert await replay.fetch_options_data("BTC/USD", EXPIRY) == [{"symbol": "BTC-45000-C", "strike": 45000.0}]
+    assert replay.clock.now() == datetime.fromtimestamp(T0 + 0.02)
+    
+    assert await replay.play() == 4
+    assert await replay.get_underlying_prices(["BTC/USDT"]) == {"BTC/USDT": 45004.0}
+    await replay.close()
+
+async def test_replay_speeds(tmp_path):
+    path = write_log(str(tmp_path / "ticks.bin"))
+    
+    start = time.monotonic()
+    await ReplayService(path, speed=1.0).play()
+    realtime = time.monotonic() - start
+    
+    start = time.monotonic()
+    await ReplayService(path, speed=None).play()
+    fastest = time.monotonic() - start
+    
+    assert realtime >= 0.045
+    assert fastest < realtime
+
+@pytest.mark.parametrize("speed", [None, 100.0])
+async def test_replayed_stream_ends_on_last_logged_state(tmp_path, speed):
+    replay = ReplayService(write_log(str(tmp_path / "ticks.bin")), speed=speed)
+    stream = MarketStream(replay)
+    queue = stream.subscribe()
+    stream.start(["BTC/USDT"], order_books=False)
+    await asyncio.sleep(0)
+    
+    await replay.play()
+    for _ in range(10):
+        if not stream.running:
+            break
+        await asyncio.sleep(0)
+    
+    assert not stream.running
+    assert stream.get_ticker("BTC/USDT")["last"] == 45004.0
+    prices = [queue.get_nowait().data["last"] for _ in range(queue.qsize())]
+    assert prices[-1] == 45004.0 and prices == sorted(prices)
+
+async def test_replay_drives_market_stream_and_service_records(tmp_path):
+    replay = ReplayService(write_log(str(tmp_path / "ticks.bin")), speed=None)
+    stream = MarketStream(replay)
+    queue = stream.subscribe()
+    stream.start(["BTC/USDT", "BTC-45000-C"])
+    await asyncio.sleep(0)
+    
+    await replay.play()
+    await asyncio.sleep(0)
+    
+    assert stream.get_order_book("BTC-45000-C").best_ask == 155.0
+    assert queue.qsize() >= 2
+    await asyncio.sleep(0)
+    assert not stream.running
+    
+    # O CCXTService grava o que recebe para replay posterior
+    recorded = str(tmp_path / "service.bin")
+    with MarketRecorder(recorded) as recorder:
+        service = CCXTService(simulation_mode=True, recorder=recorder)
+        options = await service.fetch_options_data("ETH/USD", EXPIRY)
+    replay = ReplayService(recorded)
+    replay.advance_to(float("inf"))
+    assert await replay.fetch_options_data("ETH/USD", EXPIRY) == options
@@ -0,0 +1,100 @@
+import asyncio
+from collections import defaultdict
+import pytest
+from services.ccxt_service import CCXTService
+from services.market_stream import MarketStream, OrderBook
+
+class StubStreamExchange:
+    """
+    Exchange no formato ccxt.pro alimentada pelo teste através de filas
+    """
+    def __init__(self):
+        self.queues = defaultdict(asyncio.Queue)
+        self.closed = False
+    
+    def push(self, kind, symbol, message):
+        self.queues[(kind, symbol)].put_nowait(message)
+    
+    async def watch_ticker(self, symbol):
+        return await self.queues[("ticker", symbol)].get()
+    
+    async def watch_order_book(self, symbol, limit=None):
+        return await self.queues[("order_book", symbol)].get()
+    
+    async def close(self):
+        self.closed = True
+
+async def drain(queue, n):
+    return [await asyncio.wait_for(queue.get(), 1.0) for _ in range(n)]
+
+async def test_stream_keeps_state_and_pushes_updates():
+    exchange = StubStreamExchange()
+    stream = MarketStream(exchange)
+    everything = stream.subscribe()
+    only_put = stream.subscribe(["BTC-300131-40000-P"])
+    stream.start(["BTC-300131-40000-C", "BTC-300131-40000-P"])
+    
+    exchange.push("ticker", "BTC-300131-40000-C", {"last": 5200.0, "timestamp": 1000})
+    exchange.push("order_book", "BTC-300131-40000-P", {
+        "bids": [[150.0, 2.0], [155.0, 1.0]], "asks": [[160.0, 3.0]], "timestamp": 2000
+    })
+    
+    updates = await drain(everything, 2)
+    assert {u.kind for u in updates} == {"ticker", "order_book"}
+    put_update = await drain(only_put, 1)
+    assert put_update[0].symbol == "BTC-300131-40000-P"
+    assert only_put.empty()
+    
+    assert stream.get_ticker("BTC-300131-40000-C")["last"] == 5200.0
+    book = stream.get_order_book("BTC-300131-40000-P")
+    assert (book.best_bid, book.best_ask, book.mid) == (155.0, 160.0, 157.5)
+    
+    await stream.stop()
+    assert not stream.running
+
+async def test_slow_subscriber_drops_oldest_updates():
+    exchange = StubStreamExchange()
+    stream = MarketStream(exchange)
+    queue = stream.subscribe(maxsize=2)
+    stream.start(["BTC/USDT"], order_books=False)
+    
+    for price in (1.0, 2.0, 3.0):
+        exchange.push("ticker", "BTC/USDT", {"last": price})
+    await asyncio.sleep(0.01)
+    
+    assert [u.data["last"] for u in await drain(queue, 2)] == [2.0, 3.0]
+    assert stream.dropped_updates == 1
+    await stream.stop()
+
+async def test_order_book_updates_publish_snapshots():
+    exchange = StubStreamExchange()
+    stream = MarketStream(exchange, order_book_depth=2)
+    queue = stream.subscribe()
+    stream.start(["BTC-C"], tickers=False)
+    
+    exchange.push("order_book", "BTC-C", {"bids": [[100.0, 1.0], [99.0, 2.0], [98.0, 1.0]],
+                                          "asks": [[101.0, 1.0]], "timestamp": 1000})
+    exchange.push("order_book", "BTC-C", {"bids": [[100.5, 3.0]], "asks": [[100.8, 1.5]], "timestamp": 2000})
+    first, second = await drain(queue, 2)
+    
+    # A atualização enfileirada guarda o livro do seu instante, não o livro vivo
+    assert first.data.bids.tolist() == [[100.0, 1.0], [99.0, 2.0]]
+    assert (first.data.best_bid, first.data.best_ask, first.data.timestamp) == (100.0, 101.0, 1.0)
+    assert second.data.mid == pytest.approx(100.65)
+    assert stream.get_order_book("BTC-C").bids == [(100.5, 3.0)]
+    await stream.stop()
+
+async def test_ccxt_service_serves_prices_from_stream():
+    exchange = StubStreamExchange()
+    service = CCXTService(simulation_mode=True)
+    service.simulation_mode = False
+    service.exchange = StubStreamExchange()  # Sem fetch_ticker: nenhuma chamada REST pode acontecer
+    
+    stream = service.start_stream(["BTC/USD"], exchange=exchange)
+    exchange.push("ticker", "BTC/USDT", {"last": 46000.0})
+    await asyncio.sleep(0.01)
+    
+    assert await service.get_underlying_price("BTC/USD") == 46000.0
+    await service.close()
+    # A exchange foi passada pelo chamador: o serviço não a fecha
+    assert not exchange.closed
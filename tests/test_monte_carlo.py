@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy.special import ndtri
+
+from services.monte_carlo import MonteCarloEngine, tail_statistics
+from services.scenario_engine import ScenarioLegs
+
+
+def make_legs(n: int = 1, underlying=("BTC",), strike: float = 1.0) -> ScenarioLegs:
+    return ScenarioLegs(
+        spot=np.full(n, 100.0),
+        strike=np.full(n, strike),
+        time_to_expiry=np.full(n, 0.5),
+        volatility=np.full(n, 0.2),
+        is_call=np.ones(n, dtype=bool),
+        quantity=np.ones(n),
+        underlying=np.array(underlying),
+    )
+
+
+def test_paths_are_reproducible_across_worker_counts():
+    legs = make_legs(2, ("BTC", "ETH"), strike=100.0)
+    kwargs = dict(n_paths=20_000, seed=7, keep_paths=True, correlation=[[1.0, 0.6], [0.6, 1.0]])
+    serial = MonteCarloEngine(chunk_size=5_000, max_workers=1).value_at_risk(legs, **kwargs)
+    with MonteCarloEngine(chunk_size=5_000, max_workers=2, min_parallel_paths=0) as engine:
+        parallel = engine.value_at_risk(legs, **kwargs)
+        pool = engine._executor
+        again = engine.value_at_risk(legs, **kwargs)
+        assert pool is not None and engine._executor is pool
+    assert engine._executor is None
+    np.testing.assert_array_equal(serial.pnl, parallel.pnl)
+    np.testing.assert_array_equal(parallel.pnl, again.pnl)
+
+
+def test_deep_in_the_money_call_matches_lognormal_var():
+    # Call com strike ~0 se comporta como o subjacente
+    engine = MonteCarloEngine(max_workers=1)
+    risk = engine.value_at_risk(make_legs(), confidence_level=0.99, horizon_days=10,
+                                n_paths=200_000, underlying_volatility=0.5, seed=1)
+    h = 10 / 365
+    expected = 100.0 * (np.exp(-0.5 * 0.25 * h + 0.5 * np.sqrt(h) * ndtri(0.01)) - 1.0)
+    assert risk.value_at_risk == pytest.approx(expected, rel=0.02)
+    assert risk.var_interval[0] <= risk.value_at_risk <= risk.var_interval[1]
+    assert risk.es_interval[0] < risk.expected_shortfall < risk.es_interval[1]
+    assert risk.expected_shortfall < risk.value_at_risk
+
+
+def test_jumps_fatten_the_tail():
+    engine = MonteCarloEngine(max_workers=1)
+    base = engine.value_at_risk(make_legs(), n_paths=100_000, seed=3, underlying_volatility=0.5)
+    jumps = engine.value_at_risk(make_legs(), n_paths=100_000, seed=3, underlying_volatility=0.5,
+                                 jump_intensity=20.0, jump_mean=-0.05, jump_std=0.05)
+    assert jumps.expected_shortfall < base.expected_shortfall
+
+
+def test_tail_statistics_on_uniform_sample():
+    risk = tail_statistics(np.arange(1, 1001, dtype=float) - 500.0, confidence_level=0.95)
+    assert risk.value_at_risk == -450.0
+    assert risk.expected_shortfall == pytest.approx(-474.5)
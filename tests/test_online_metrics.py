@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from services.online_metrics import DrawdownTracker, OnlineMetrics, RoundTripTracker, RunningStats
+
+
+def test_running_stats_matches_numpy():
+    values = np.random.default_rng(5).normal(0.001, 0.02, 1000)
+    stats = RunningStats()
+    for value in values:
+        stats.update(float(value))
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std(ddof=1))
+
+
+def test_drawdown_tracks_running_peak():
+    tracker = DrawdownTracker()
+    for equity in (100.0, 120.0, 90.0, 130.0, 110.0):
+        tracker.update(equity)
+    assert tracker.peak == 130.0
+    assert tracker.max_drawdown == pytest.approx(0.25)
+
+
+def test_round_trips_use_realized_pnl():
+    tracker = RoundTripTracker()
+    tracker.record("BTC", 2.0, 100.0)
+    tracker.record("BTC", 2.0, 110.0)                # preço médio 105
+    assert tracker.record("BTC", -1.0, 120.0) == pytest.approx(15.0)
+    assert tracker.record("BTC", -4.0, 100.0) == pytest.approx(-15.0)  # inverte para vendido 1 @ 100
+    assert tracker.position("BTC") == -1.0
+    assert tracker.record("BTC", 1.0, 90.0) == pytest.approx(10.0)
+    assert (tracker.wins, tracker.losses) == (2, 1)
+    assert tracker.win_rate == pytest.approx(2 / 3)
+
+
+def test_online_metrics_match_batch_computation():
+    equity = 10000.0 * np.cumprod(1 + np.random.default_rng(9).normal(0.0005, 0.01, 500))
+    metrics = OnlineMetrics(10000.0)
+    for value in equity:
+        metrics.update_equity(float(value))
+    curve = np.concatenate(([10000.0], equity))
+    returns = curve[1:] / curve[:-1] - 1
+    peak = np.maximum.accumulate(curve)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["total_return"] == pytest.approx(equity[-1] / 10000.0 - 1)
+    assert snapshot["sharpe_ratio"] == pytest.approx(returns.mean() / returns.std(ddof=1) * np.sqrt(252))
+    assert snapshot["max_drawdown"] == pytest.approx(((peak - curve) / peak).max())
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from models.market_model import OptionChain, OptionContract, OptionAnalysis
+from services.analysis_service import AnalysisService
+
+def make_contracts():
+    expiry = datetime(2030, 1, 31, 8, 0)
+    contracts = []
+    for strike in (50000.0, 40000.0, 45000.0):
+        for is_call in (False, True):
+            kind = "C" if is_call else "P"
+            contracts.append(OptionContract(
+                symbol=f"BTC-{int(strike)}-{kind}",
+                strike_price=strike,
+                expiry=expiry,
+                contract_id=f"BTC-{int(strike)}-{kind}",
+                underlying="BTC",
+                is_call=is_call,
+                current_price=1000.0 + strike / 100
+            ))
+    contracts.append(OptionContract("BTC-45000-C2", 45000.0, expiry + timedelta(days=30),
+                                    "BTC-45000-C2", "BTC", True, 3000.0))
+    return contracts
+
+def test_option_chain_layout_and_round_trip():
+    contracts = make_contracts()
+    chain = OptionChain.from_contracts(contracts)
+    
+    assert len(chain) == 7
+    assert chain.n_calls == 4
+    # Calls e puts são views contíguas da cadeia
+    assert np.shares_memory(chain.calls.strike, chain.strike)
+    assert np.shares_memory(chain.puts.price, chain.price)
+    np.testing.assert_array_equal(chain.puts.strike, [40000.0, 45000.0, 50000.0])
+    
+    first_expiry = chain.select(True, contracts[0].expiry)
+    np.testing.assert_array_equal(first_expiry.strike, [40000.0, 45000.0, 50000.0])
+    assert first_expiry.nearest_strike(46000.0) == 1
+    
+    by_id = {c.contract_id: c for c in chain.to_contracts()}
+    assert by_id == {c.contract_id: c for c in contracts}
+    
+    order = chain.strike_index
+    assert order is chain.strike_index
+    assert (np.diff(chain.strike[order]) >= 0).all()
+
+def test_option_chain_analysis_in_place():
+    service = AnalysisService()
+    chain = OptionChain.from_contracts(make_contracts())
+    
+    calls = chain.calls
+    service.analyze_chain(calls, spot=45000.0, volatility=0.6)
+    
+    # A view atualiza a cadeia de origem; as puts continuam sem análise
+    assert np.isfinite(chain.delta[:chain.n_calls]).all()
+    assert np.isnan(chain.delta[chain.n_calls:]).all()
+    np.testing.assert_allclose(chain.implied_volatility[:chain.n_calls], 0.6)
+    
+    analysis = chain.calls.to_analysis()
+    round_trip = OptionChain.from_contracts(chain.calls.to_contracts(), analysis)
+    np.testing.assert_allclose(round_trip.gamma, chain.calls.gamma)
+    assert isinstance(analysis["BTC-45000-C"], OptionAnalysis)
+
+def test_option_chain_memory_per_contract():
+    n = 10_000
+    chain = OptionChain.from_arrays(
+        contract_id=[f"BTC-{i}-C" for i in range(n)],
+        underlying=["BTC"] * n,
+        expiry=[datetime(2030, 1, 31)] * n,
+        is_call=np.ones(n, dtype=bool),
+        strike=np.arange(n, dtype=float)
+    )
+    assert chain.nbytes / n < 300
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionContract
+from services.backtest_service import CandleArrays
+from services.options_backtest import OptionsBacktestService
+
+
+def make_candles(prices) -> CandleArrays:
+    timestamp = np.datetime64("2024-01-01T00:00") + np.arange(len(prices)).astype("timedelta64[D]")
+    return CandleArrays(timestamp=timestamp, price=np.asarray(prices, dtype=float))
+
+
+def contract(strike: float, is_call: bool, expiry: datetime) -> OptionContract:
+    kind = "C" if is_call else "P"
+    return OptionContract(symbol="BTC", strike_price=strike, expiry=expiry,
+                          contract_id=f"BTC-{kind}-{strike}", underlying="BTC", is_call=is_call)
+
+
+def test_short_iron_condor_settles_at_expiry():
+    expiry = datetime(2024, 1, 8)
+    legs = [(contract(90.0, False, expiry), 1.0), (contract(95.0, False, expiry), -1.0),
+            (contract(105.0, True, expiry), -1.0), (contract(110.0, True, expiry), 1.0)]
+
+    def strategy(state):
+        return legs if len(state.window) == 1 else None
+
+    # Fecha acima da call vendida: perda de 3 na asa de calls
+    candles = make_candles([100.0, 101.0, 102.0, 103.0, 104.0, 106.0, 107.0, 108.0, 108.0, 108.0])
+    service = OptionsBacktestService()
+    result = service.run_backtest(candles, strategy, volatility=0.5)
+
+    credit = sum(t["value"] for t in result.trades if t["side"] == "SELL") \
+        - sum(t["value"] for t in result.trades if t["side"] == "BUY")
+    assert credit > 0
+    assert len(result.settlements) == 4
+    assert sum(s["value"] for s in result.settlements) == pytest.approx(-3.0)
+    assert result.equity_curve[-1] == pytest.approx(10000.0 + credit - 3.0)
+    assert len(service.legs) == 0
+    assert result.position_value[-1] == 0.0
+
+
+def test_open_legs_are_marked_with_batch_prices():
+    expiry = datetime(2024, 3, 1)
+    call = contract(100.0, True, expiry)
+
+    def strategy(state):
+        return [(call, 2.0)] if len(state.window) == 1 else None
+
+    candles = make_candles([100.0, 105.0, 95.0])
+    service = OptionsBacktestService(contract_multiplier=10.0)
+    result = service.run_backtest(candles, strategy, volatility=[0.5, 0.6, 0.7])
+
+    t = (expiry - datetime(2024, 1, 3)).total_seconds() / (365 * 24 * 3600)
+    expected = service.analysis.calculate_greeks_batch(95.0, 100.0, t, 0.7, True)
+    assert result.position_value[-1] == pytest.approx(20.0 * float(expected.price))
+    assert result.net_delta[-1] == pytest.approx(20.0 * float(expected.delta))
+
+    # Um snapshot de posição por candle, no formato de POSITION_FIELDS
+    assert len(result.positions) == 3
+    last = result.positions[-1]
+    assert last["timestamp"] == datetime(2024, 1, 3)
+    assert (last["position"], last["open_legs"]) == (2.0, 1)
+    assert last["equity"] == pytest.approx(last["cash"] + last["position_value"])
+    np.testing.assert_array_equal(result.positions["equity"], result.equity_curve[1:])
+
+
+def test_closing_orders_remove_legs():
+    expiry = datetime(2024, 2, 1)
+    put = contract(100.0, False, expiry)
+
+    def strategy(state):
+        if len(state.window) == 1:
+            return [(put, 1.0)]
+        if len(state.window) == 3:
+            return state.close_all()
+        return None
+
+    service = OptionsBacktestService()
+    result = service.run_backtest(make_candles([100.0, 98.0, 97.0, 99.0]), strategy)
+
+    assert [t["side"] for t in result.trades] == ["BUY", "SELL"]
+    assert len(service.legs) == 0
+    assert result.equity_curve[-1] == result.equity_curve[-2]
+
+
+def test_duplicate_contract_in_one_batch_is_aggregated():
+    expiry = datetime(2024, 2, 1)
+    call = contract(100.0, True, expiry)
+
+    def strategy(state):
+        return [(call, 1.0), (call, 2.0)] if len(state.window) == 1 else None
+
+    service = OptionsBacktestService()
+    result = service.run_backtest(make_candles([100.0, 100.0]), strategy)
+
+    assert len(service.legs) == 1
+    assert service.legs.quantity.tolist() == [3.0]
+    paid = sum(t["value"] for t in result.trades)
+    assert service.cash == pytest.approx(10000.0 - paid)
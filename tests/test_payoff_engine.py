@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.payoff_engine import PayoffEngine, expiry_payoff
+from services.scenario_engine import ScenarioLegs, ScenarioSet, ScenarioEngine
+
+
+def make_legs(n: int, seed: int = 3) -> ScenarioLegs:
+    rng = np.random.default_rng(seed)
+    return ScenarioLegs(
+        spot=np.full(n, 45000.0),
+        strike=rng.choice(np.arange(30000.0, 60001.0, 1000.0), n),
+        time_to_expiry=rng.uniform(0.02, 0.5, n),
+        volatility=rng.uniform(0.3, 1.0, n),
+        is_call=rng.random(n) < 0.5,
+        quantity=rng.choice([-2.0, -1.0, 1.0, 2.0], n),
+    )
+
+
+def test_expiry_payoff_matches_leg_by_leg_intrinsic():
+    legs = make_legs(40)
+    x = np.linspace(20000.0, 70000.0, 5001)
+    intrinsic = np.where(legs.is_call, np.maximum(x[:, None] - legs.strike, 0.0),
+                         np.maximum(legs.strike - x[:, None], 0.0))
+    np.testing.assert_allclose(expiry_payoff(x, legs.strike, legs.is_call, legs.quantity),
+                               intrinsic @ legs.quantity, atol=1e-6)
+
+    # Iron condor vendido: crédito no miolo, perda limitada nas asas
+    condor = ScenarioLegs(spot=np.full(4, 100.0), strike=np.array([80.0, 90.0, 110.0, 120.0]),
+                          time_to_expiry=np.full(4, 0.1), volatility=np.full(4, 0.5),
+                          is_call=np.array([False, False, True, True]), quantity=np.array([1.0, -1.0, -1.0, 1.0]))
+    surface = PayoffEngine().surface(condor, np.linspace(60.0, 140.0, 801), premium=[0.5, 1.5, 1.5, 0.5])
+    assert surface.net_cost == pytest.approx(-2.0)
+    assert surface.expiry.max() == pytest.approx(2.0) and surface.expiry.min() == pytest.approx(-8.0)
+    assert surface.break_evens() == pytest.approx([88.0, 112.0])
+
+
+def test_surface_matches_scenario_revaluation():
+    legs = make_legs(25)
+    analysis = AnalysisService()
+    engine = PayoffEngine(analysis, max_chunk_elements=1000)
+    spot = np.linspace(36000.0, 54000.0, 7)
+    days, vol_shifts = np.array([0.0, 7.0, 400.0]), np.array([-0.2, 0.0, 0.5])
+    surface = engine.surface(legs, spot, days, vol_shifts)
+    assert surface.pnl.shape == (3, 3, 7)
+
+    # Antes dos vencimentos, mesmo PnL que a reavaliação de cenários, que parte do valor teórico atual
+    scenarios = ScenarioSet.grid(spot / 45000.0 - 1.0, vol_shifts, days[:2])
+    revalued = ScenarioEngine(analysis).revalue(legs, scenarios).total.reshape(7, 3, 2)
+    np.testing.assert_allclose(surface.pnl[:, :2], revalued.transpose(1, 2, 0), atol=1e-6)
+
+    # Depois do último vencimento, o PnL T+n é o payoff no vencimento
+    np.testing.assert_allclose(surface.curve(days=400.0, vol_shift=0.0), engine.expiry(legs, spot), atol=1e-6)
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionContract
+from services.portfolio_optimizer import PortfolioOptimizer
+from services.risk_service import RiskService
+from utils.clock import SimulatedClock
+
+NOW = datetime(2030, 1, 1)
+
+
+def make_universe(n: int = 400, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    strikes = rng.choice(np.arange(30000, 60001, 1000), n)
+    days = rng.choice([7, 30, 90], n)
+    calls = rng.integers(0, 2, n).astype(bool)
+    return [OptionContract("BTC", float(k), NOW + timedelta(days=int(d)), f"BTC-{i}", "BTC", bool(c))
+            for i, (k, d, c) in enumerate(zip(strikes, days, calls))]
+
+
+def test_optimize_portfolio_respects_limits_and_reaches_target():
+    service = RiskService(clock=SimulatedClock(NOW))
+    universe = make_universe()
+    positions = service.optimize_portfolio(universe, target_delta=0.5, max_vega=50.0, max_theta=-20.0,
+                                           budget=5000.0, spot_price=45000.0, volatility=0.6)
+    assert positions and all(float(q).is_integer() for _, q in positions)
+
+    greeks = service._calculate_portfolio_greeks(positions, 45000.0, volatility=0.6)
+    assert greeks.delta == pytest.approx(0.5, abs=service.portfolio_optimizer.delta_tolerance + 1e-9)
+    assert abs(greeks.vega / 100) <= 50.0 + 1e-6
+    assert greeks.theta / 365 >= -20.0 - 1e-6
+
+
+def test_reoptimization_keeps_current_book_when_it_still_fits():
+    service = RiskService(clock=SimulatedClock(NOW))
+    universe = make_universe()
+    kwargs = dict(max_vega=50.0, max_theta=-20.0, budget=5000.0, spot_price=45000.0, volatility=0.6)
+    book = service.optimize_portfolio(universe, 0.3, **kwargs)
+    assert service.optimize_portfolio(universe, 0.3, current_positions=book, **kwargs) == book
+
+    moved = service.optimize_portfolio(universe, 0.6, current_positions=book, max_trade=1, **kwargs)
+    assert service._calculate_portfolio_greeks(moved, 45000.0, 0.6).delta == pytest.approx(0.6, abs=0.01 + 1e-9)
+
+
+def test_reoptimization_reuses_universe_and_keeps_optimizer_limits(monkeypatch):
+    service = RiskService(clock=SimulatedClock(NOW))
+    universe = make_universe()
+    kwargs = dict(max_vega=50.0, max_theta=-20.0, budget=5000.0, spot_price=45000.0, volatility=0.6)
+    calls = []
+    set_universe = service.portfolio_optimizer.set_universe
+    monkeypatch.setattr(service.portfolio_optimizer, "set_universe", lambda *a: calls.append(1) or set_universe(*a))
+
+    book = service.optimize_portfolio(universe, 0.3, max_contracts=1, **kwargs)
+    service.optimize_portfolio(universe, 0.5, current_positions=book, **kwargs)
+    assert len(calls) == 1
+    assert all(abs(q) <= 1 for _, q in book)
+    assert service.portfolio_optimizer.max_contracts == 100.0
+
+    service.optimize_portfolio(universe, 0.5, **dict(kwargs, spot_price=46000.0))
+    assert len(calls) == 2
+
+
+def test_candidate_restriction_matches_full_problem_objective():
+    service = RiskService(clock=SimulatedClock(NOW))
+    universe = make_universe(n=150, seed=3)
+    legs = service._scenario_legs(universe, 45000.0, 0.6, None)
+    greeks = service.analysis.calculate_greeks_batch(legs.spot, legs.strike, legs.time_to_expiry,
+                                                     legs.volatility, legs.is_call)
+    restricted, full = PortfolioOptimizer(candidate_limit=16), PortfolioOptimizer(candidate_limit=None)
+    for optimizer in (restricted, full):
+        optimizer.set_universe(universe, greeks)
+    a = restricted.solve(-0.4, 30.0, -10.0, 2000.0)
+    b = full.solve(-0.4, 30.0, -10.0, 2000.0)
+    assert a.success and b.success
+    assert np.abs(a.trades).sum() <= np.abs(b.trades).sum() + 1
+    assert a.exposure['delta'] == pytest.approx(-0.4, abs=0.01 + 1e-9)
+
+
+def test_infeasible_constraints_raise():
+    service = RiskService(clock=SimulatedClock(NOW))
+    with pytest.raises(ValueError):
+        service.optimize_portfolio(make_universe(20), 0.5, max_vega=10.0, max_theta=1e6, budget=1.0,
+                                   spot_price=45000.0, volatility=0.6)
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionContract
+from services.risk_service import RiskService
+from services.scenario_engine import ScenarioSet
+from utils.clock import SimulatedClock
+
+NOW = datetime(2030, 1, 1)
+
+
+def make_positions():
+    expiry = NOW + timedelta(days=30)
+    return [
+        OptionContract("BTC", 40000.0, expiry, "BTC-P-40000", "BTC", False),
+        OptionContract("BTC", 50000.0, expiry, "BTC-C-50000", "BTC", True),
+        OptionContract("ETH", 3000.0, expiry, "ETH-C-3000", "ETH", True),
+    ]
+
+
+def test_scenario_grid_matches_direct_repricing():
+    service = RiskService(clock=SimulatedClock(NOW))
+    positions = make_positions()
+    spot = {"BTC": 45000.0, "ETH": 2800.0}
+    scenarios = ScenarioSet.grid([-0.1, 0.0, 0.1], [-0.5, 0.0, 1.0], [0, 7])
+    result = service.run_scenarios(positions, scenarios, spot, volatility=0.6, quantity=[1.0, -2.0, 3.0])
+
+    assert result.pnl.shape == (18, 3)
+    i = int(np.flatnonzero((scenarios.spot_shock == 0.1) & (scenarios.vol_shock == 1.0)
+                           & (scenarios.time_shift > 0))[0])
+    t = 30 / 365
+    price = service.analysis.calculate_price_batch
+    expected = (price(49500.0, 50000.0, t - 7 / 365, 1.2, True) - price(45000.0, 50000.0, t, 0.6, True)) * -2.0
+    assert result.pnl[i, 1] == pytest.approx(float(expected))
+    assert result.total[np.flatnonzero((scenarios.spot_shock == 0) & (scenarios.vol_shock == 0)
+                                       & (scenarios.time_shift == 0))[0]] == pytest.approx(0.0)
+
+
+def test_custom_and_historical_scenarios():
+    prices = np.array([100.0, 90.0, 99.0, 108.9])
+    historical = ScenarioSet.historical(prices, horizon_days=1)
+    np.testing.assert_allclose(historical.spot_shock, [-0.1, 0.1, 0.1])
+    custom = ScenarioSet.custom({"crash": {"spot": -0.3, "vol": 0.5, "days": 1}})
+    combined = historical.concat(custom)
+    assert len(combined) == 4
+    assert combined.name[-1] == "crash"
+    assert combined.time_shift[-1] == pytest.approx(1 / 365)
+
+    with pytest.raises(ValueError):
+        ScenarioSet.custom({"bad": {"spot": -1.0}})
+
+
+def test_stress_tests_use_full_repricing():
+    service = RiskService(clock=SimulatedClock(NOW))
+    positions = make_positions()[:2]
+    history = list(45000.0 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.02, 60))))
+    risk = service.calculate_portfolio_risk(positions, history, volatility=0.6)
+
+    assert set(risk.stress_test_results) == {"down_20_percent", "up_20_percent", "double_volatility"}
+    # Long put + long call: ganha nos dois extremos e com vol maior
+    assert all(value > 0 for value in risk.stress_test_results.values())
+    legs = service._scenario_legs(positions, history[-1], 0.6, None)
+    assert service._calculate_portfolio_value(legs, price_change=-0.2) == pytest.approx(
+        service._calculate_portfolio_value(legs) + risk.stress_test_results["down_20_percent"])
+
+
+def test_portfolio_risk_with_several_underlyings_needs_spot_per_underlying():
+    service = RiskService(clock=SimulatedClock(NOW))
+    positions = make_positions()
+    history = [44000.0, 45000.0]
+    with pytest.raises(ValueError):
+        service.calculate_portfolio_risk(positions, history, volatility=0.6)
+
+    spot = {"BTC": 45000.0, "ETH": 2800.0}
+    risk = service.calculate_portfolio_risk(positions, history, volatility=0.6, spot=spot)
+    legs = service._scenario_legs(positions, spot, 0.6, None)
+    assert risk.stress_test_results["up_20_percent"] == pytest.approx(
+        service._calculate_portfolio_value(legs, price_change=0.2) - service._calculate_portfolio_value(legs))
+
+
+def test_historical_var_is_portfolio_pnl_in_currency():
+    service = RiskService(clock=SimulatedClock(NOW))
+    positions = make_positions()[:2]
+    history = list(45000.0 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.03, 250))))
+    risk = service.calculate_portfolio_risk(positions, history, volatility=0.6)
+
+    legs = service._scenario_legs(positions, history[-1], 0.6, None)
+    pnl = service.scenario_engine.revalue(legs, ScenarioSet.historical(history)).total
+    assert risk.value_at_risk == pytest.approx(float(np.percentile(pnl, 5)))
+    assert risk.expected_shortfall <= risk.value_at_risk
+    # Mesma unidade do Monte Carlo: moeda, limitada pelo prêmio pago
+    premium = service._calculate_portfolio_value(legs)
+    assert -premium < risk.expected_shortfall and abs(risk.value_at_risk) > 1.0
+
+
+def test_monte_carlo_var_mode_values_the_options():
+    service = RiskService(clock=SimulatedClock(NOW))
+    positions = make_positions()[:2]
+    history = list(45000.0 * np.exp(np.cumsum(np.random.default_rng(2).normal(0, 0.03, 120))))
+    service.monte_carlo.max_workers = 1
+    risk = service.calculate_portfolio_risk(positions, history, volatility=0.6, var_method="monte_carlo",
+                                            n_paths=20_000)
+    # Perdas em moeda, limitadas pelo prêmio pago pelas duas opções
+    legs = service._scenario_legs(positions, history[-1], 0.6, None)
+    premium = service._calculate_portfolio_value(legs)
+    assert -premium < risk.expected_shortfall <= risk.value_at_risk < 0
+
+    mc = service.calculate_monte_carlo_risk(positions, history[-1], volatility=0.6, n_paths=10_000,
+                                            seed=5, underlying_volatility=0.8, vol_of_vol=1.0,
+                                            spot_vol_correlation=-0.5)
+    assert mc.n_paths == 10_000
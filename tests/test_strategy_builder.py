@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import OptionChain
+from services.analysis_service import AnalysisService
+from services.strategy_builder import (LegSpec, StrategyBuilder, StrategySpec, bull_call_spread,
+                                           iron_condor, payoff_extremes)
+from services.strategy_service import StrategyService
+from utils.clock import SimulatedClock
+
+NOW = datetime(2030, 1, 1)
+SPOT = 45000.0
+
+
+def make_chain() -> OptionChain:
+    strikes = np.arange(30000.0, 60001.0, 1000.0)
+    expiries = [NOW + timedelta(days=d) for d in (7, 28, 91)]
+    rows = [(e, k, c) for e in expiries for k in strikes for c in (True, False)]
+    ids = [f"BTC-{e:%d%b%y}-{k:g}-{'C' if c else 'P'}" for e, k, c in rows]
+    return OptionChain.from_arrays(ids, ["BTC"] * len(ids), [r[0] for r in rows], [r[2] for r in rows],
+                                   [r[1] for r in rows])
+
+
+def make_builder() -> StrategyBuilder:
+    return StrategyBuilder(make_chain(), SPOT, AnalysisService(clock=SimulatedClock(NOW)), volatility=0.6)
+
+
+def test_resolve_picks_listed_strikes_and_expiry():
+    builder = make_builder()
+    spec = StrategySpec('custom', (
+        LegSpec('call', 'buy', 1, 'moneyness', 1.012, expiry_days=30),
+        LegSpec('put', 'sell', 2, 'delta', -0.25, expiry_days=30),
+        LegSpec('call', 'sell', 1, 'strike', 51400.0, expiry_days=80),
+    ), ordered=False)
+    resolved = builder.resolve(spec)
+
+    assert resolved.strike[0] == 46000.0 and resolved.strike[2] == 51000.0
+    assert resolved.quantity.tolist() == [1.0, -2.0, -1.0]
+    assert resolved.contracts[0].expiry == NOW + timedelta(days=28)
+    assert resolved.contracts[2].expiry == NOW + timedelta(days=91)
+    puts = builder.delta[(~builder.chain.is_call) & (builder.chain.expiry == np.datetime64(NOW + timedelta(days=28)))]
+    assert abs(builder.delta[resolved.rows[1]] + 0.25) == pytest.approx(np.abs(puts + 0.25).min())
+
+
+def test_ordered_resolution_keeps_legs_on_distinct_strikes():
+    builder = make_builder()
+    resolved = builder.resolve(iron_condor((0.99, 0.995), (1.0, 1.001), expiry_days=28))
+    assert np.all(np.diff(resolved.strike) > 0)
+
+
+def test_search_matches_brute_force_ranking():
+    builder = make_builder()
+    spec = bull_call_spread(expiry_days=28)
+    frame = builder.search(spec, rank_by='reward_risk', top=None)
+
+    calls = np.flatnonzero(builder.chain.is_call & (builder.chain.expiry == np.datetime64(NOW + timedelta(days=28))))
+    assert len(frame) == len(calls) * (len(calls) - 1) // 2
+    best_ratio = -np.inf
+    for i in calls:
+        for j in calls:
+            if builder.chain.strike[j] > builder.chain.strike[i]:
+                cost = builder.premium[i] - builder.premium[j]
+                width = builder.chain.strike[j] - builder.chain.strike[i]
+                best_ratio = max(best_ratio, (width - cost) / cost)
+    assert frame['reward_risk'].iloc[0] == pytest.approx(best_ratio)
+
+    best = builder.best(spec, rank_by='theta', max_cost=1000.0)
+    assert best.metrics()['net_cost'] <= 1000.0
+    assert best.metrics()['greeks'].theta == pytest.approx(
+        builder.search(spec, rank_by='theta', max_cost=1000.0, top=1)['theta'].iloc[0])
+
+
+def test_payoff_extremes_match_dense_grid():
+    strikes = np.array([[38000.0, 40000.0, 50000.0, 52000.0]])
+    is_call = np.array([False, False, True, True])
+    quantity = np.array([1.0, -1.0, -1.0, 1.0])
+    max_profit, max_loss = payoff_extremes(strikes, is_call, quantity, np.array([-500.0]))
+    grid = np.linspace(0, 100000, 100001)[:, None]
+    payoff = np.where(is_call, np.maximum(grid - strikes, 0), np.maximum(strikes - grid, 0)) @ quantity + 500.0
+    assert max_profit[0] == pytest.approx(payoff.max())
+    assert max_loss[0] == pytest.approx(payoff.min())
+
+
+def test_create_bull_spread_snaps_to_chain_and_reports_metrics():
+    service = StrategyService(analysis=AnalysisService(clock=SimulatedClock(NOW)))
+    expiry = NOW + timedelta(days=28)
+    options, metrics = service.create_bull_spread(SPOT, expiry, 42800.0, 47300.0, "BTC", chain=make_chain())
+    assert [o.strike_price for o in options] == [43000.0, 47000.0]
+    assert metrics['max_profit'] == pytest.approx(4000.0 - metrics['net_cost'])
+    assert metrics['max_loss'] == pytest.approx(-metrics['net_cost'])
+    assert metrics['break_even'] == pytest.approx(43000.0 + metrics['net_cost'])
+
+    options, metrics = service.create_iron_condor(SPOT, expiry, (38000.0, 40000.0), (50000.0, 52000.0), "BTC")
+    assert [o.is_call for o in options] == [False, False, True, True]
+    assert metrics['net_credit'] > 0 and len(metrics['break_evens']) == 2
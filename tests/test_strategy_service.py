@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from conftest import StubOptionExchange, make_service
+from models.market_model import OptionContract
+from services.analysis_service import AnalysisService
+from services.strategy_service import StrategyService
+from utils.clock import SimulatedClock
+
+NOW = datetime(2030, 1, 1)
+
+
+def make_legs():
+    expiry = NOW + timedelta(days=30)
+    return [
+        OptionContract("BTC/USDT", 40000.0, expiry, "BTC-300131-40000-P", "BTC/USDT", False),
+        OptionContract("BTC/USDT", 45000.0, expiry, "BTC-300131-45000-C", "BTC/USDT", True),
+        OptionContract("BTC/USDT", 50000.0, expiry, "BTC-300131-50000-C", "BTC/USDT", True),
+    ]
+
+
+async def test_strategy_metrics_are_signed_and_batched():
+    exchange = StubOptionExchange()
+    analysis = AnalysisService(clock=SimulatedClock(NOW))
+    service = StrategyService(make_service(exchange), analysis)
+    legs = make_legs()
+    quantity = [1.0, -2.0, 1.0]
+
+    metrics = await service.calculate_strategy_metrics(legs, quantity)
+
+    assert metrics['total_cost'] == pytest.approx(105.0 * (1 - 2 + 1))
+    batch = analysis.calculate_greeks_batch(45000.0, [40000.0, 45000.0, 50000.0], 30 / 365, 0.55,
+                                            [False, True, True])
+    for greek in ('delta', 'gamma', 'theta', 'vega', 'rho'):
+        assert metrics['greeks'][greek] == pytest.approx(float(getattr(batch, greek) @ np.array(quantity)))
+    assert [leg['quantity'] for leg in metrics['legs']] == quantity
+
+
+async def test_legs_without_quotes_use_theoretical_price():
+    analysis = AnalysisService(clock=SimulatedClock(NOW))
+    service = StrategyService(analysis=analysis)
+    legs = make_legs()
+
+    metrics = await service.calculate_strategy_metrics(legs, [-1, 1, 0])
+
+    batch = analysis.calculate_greeks_batch(45000.0, [40000.0, 45000.0], 30 / 365, service.default_volatility,
+                                            [False, True])
+    assert metrics['total_cost'] == pytest.approx(float(batch.price[1] - batch.price[0]))
@@ -0,0 +1,93 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.market_model import MarketData
+from services.backtest_service import BacktestService
+from services.trade_ledger import GrowableColumn, Ledger, TRADE_FIELDS
+
+
+def test_growable_column_keeps_old_views_valid():
+    column = GrowableColumn(np.float64, capacity=2)
+    column.extend([1.0, 2.0])
+    before = column.view()
+    for value in range(3, 11):
+        column.append(float(value))
+    assert len(column) == 10
+    np.testing.assert_array_equal(before, [1.0, 2.0])
+    np.testing.assert_array_equal(column.view(), np.arange(1.0, 11.0))
+    with pytest.raises(ValueError):
+        column.view()[0] = 0.0
+
+
+def test_ledger_rows_columns_and_zero_copy_export():
+    ledger = Ledger(TRADE_FIELDS, capacity=1)
+    start = datetime(2024, 1, 1)
+    for i in range(5):
+        side = "BUY" if i % 2 == 0 else "SELL"
+        ledger.append(timestamp=start + timedelta(hours=i), side=side, quantity=1.0, price=100.0 + i, value=100.0 + i)
+    ledger.extend(timestamp=np.array([start, start], dtype="datetime64[us]"), side=["SELL", "HOLD"],
+                  quantity=[2.0, 3.0], price=[1.0, 1.0], value=[2.0, 3.0])
+
+    view = ledger.view()
+    assert len(view) == 7
+    assert view[1] == {"timestamp": start + timedelta(hours=1), "side": "SELL", "quantity": 1.0,
+                       "price": 101.0, "value": 101.0}
+    assert [row["side"] for row in view][-2:] == ["SELL", "HOLD"]
+    np.testing.assert_array_equal(view["price"][:3], [100.0, 101.0, 102.0])
+    assert list(view.decoded("side")[:2]) == ["BUY", "SELL"]
+
+    frame = view.to_pandas()
+    assert np.shares_memory(frame["price"].to_numpy(), view["price"])
+    assert list(frame["side"][:2]) == ["BUY", "SELL"]
+
+
+def test_backtest_ledger_spills_to_memory_mapped_files(tmp_path):
+    service = BacktestService(ledger_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+    service.reset()
+    start = datetime(2024, 1, 1)
+    for i in range(2000):
+        service._execute_trade(1.0 if i % 2 == 0 else -1.0, 100.0 + i % 7, start + timedelta(minutes=i))
+    result = service._generate_results()
+
+    assert os.path.exists(os.path.join(service.run_dir, "trades.price.bin"))
+    assert os.path.dirname(service.run_dir) == str(tmp_path)
+    assert isinstance(service.trades._columns["price"]._data, np.memmap)
+    assert len(result.trades) == 2000
+    assert result.positions[-1]["position"] == -1.0
+    assert result.equity_curve.size == 2001
+
+
+def test_reused_service_keeps_earlier_results_readable(tmp_path):
+    service = BacktestService(ledger_dir=str(tmp_path))
+    start = datetime(2024, 1, 1)
+
+    def run(prices):
+        service.reset()
+        for i, price in enumerate(prices):
+            service._execute_trade(1.0 if i % 2 == 0 else -1.0, price, start + timedelta(minutes=i))
+        return service._generate_results()
+
+    first = run([100.0 + i % 5 for i in range(3000)])
+    first_dir = service.run_dir
+    second = run([50.0, 51.0])
+
+    assert service.run_dir != first_dir
+    assert len(first.trades) == 3000
+    assert first.trades[-1]["price"] == 100.0 + 2999 % 5
+    assert first.equity_curve.size == 3001
+    assert [t["price"] for t in second.trades] == [50.0, 51.0]
+
+
+def test_run_dirs_are_pruned_and_removed_on_close(tmp_path):
+    candles = [MarketData(datetime(2024, 1, 1) + timedelta(hours=i), 100.0 + i, 1.0, 101.0 + i, 99.0 + i,
+                          100.0 + i, 100.0 + i) for i in range(3)]
+    with BacktestService(ledger_dir=str(tmp_path), keep_runs=2) as service:
+        for _ in range(3):
+            service.run_backtest(candles, lambda history: 1.0)
+        assert len(os.listdir(tmp_path)) == 2
+        assert os.path.isdir(service.run_dir)
+    assert os.listdir(tmp_path) == []
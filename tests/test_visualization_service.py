@@ -0,0 +1,81 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.utils
+import pytest
+
+from models.market_model import OptionAnalysis, OptionChain, OptionContract
+from services.visualization_service import VisualizationService
+
+NOW = datetime(2030, 1, 1)
+
+
+def make_chain(strikes: np.ndarray) -> OptionChain:
+    n = strikes.size
+    chain = OptionChain.from_arrays([f"C-{i}" for i in range(2 * n)], ["BTC"] * (2 * n), [NOW] * (2 * n),
+                                    [True] * n + [False] * n, np.concatenate([strikes, strikes]))
+    for column in ('implied_volatility', 'delta', 'gamma', 'theta', 'vega'):
+        getattr(chain, column)[:] = np.linspace(0.1, 0.9, 2 * n)
+    return chain
+
+
+@pytest.fixture(autouse=True)
+def no_browser(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("fig.show() não deve ser chamado")
+    monkeypatch.setattr(go.Figure, 'show', fail)
+
+
+def test_builders_return_figures_and_serializable_dicts():
+    service = VisualizationService(webgl_threshold=100)
+    chain = make_chain(np.arange(40000.0, 50000.0, 1000.0))
+    smile = service.plot_volatility_surface(chain)
+    assert isinstance(smile, go.Figure) and [t.type for t in smile.data] == ['scatter', 'scatter']
+
+    greeks = service.plot_greeks_surface(chain, as_dict=True)
+    assert [t['uid'] for t in greeks['data'][:2]] == ['calls-delta', 'puts-delta']
+    assert greeks['data'][-1]['yaxis'] == 'y4' and greeks['layout']['yaxis4']['title']['text'] == 'Vega'
+    assert isinstance(greeks['layout']['template'], dict)
+    assert json.loads(json.dumps(greeks, cls=plotly.utils.PlotlyJSONEncoder))['data'][0]['x'][0] == 40000.0
+    go.Figure(greeks)
+
+    # Cadeias com milhares de pontos passam a usar WebGL
+    large = service.plot_volatility_surface(make_chain(np.arange(1000.0, 101000.0, 500.0)))
+    assert {t.type for t in large.data} == {'scattergl'}
+
+    option = OptionContract("BTC", 45000.0, NOW, "C-0", "BTC", True)
+    analysis = {"C-0": OptionAnalysis(option, 0.6, 1200.0, 0.0, 1200.0, {})}
+    payoff = service.plot_option_payoff(option, (30000.0, 60000.0), analysis, points=301)
+    assert payoff.data[1].y[-1] == pytest.approx(15000.0 - 1200.0)
+    assert payoff.layout.shapes[0].x0 == 45000.0
+
+
+def test_update_figure_swaps_arrays_in_place():
+    service = VisualizationService()
+    chain = make_chain(np.arange(40000.0, 50000.0, 1000.0))
+    figure = service.plot_greeks_surface(chain)
+    cached = service.plot_greeks_surface(chain, as_dict=True)
+
+    chain.delta[:] = 0.5
+    for current in (figure, cached):
+        updated = service.update_figure(current, service.plot_greeks_surface(chain, as_dict=True))
+        assert updated is current
+    assert np.allclose(figure.data[0].y, 0.5) and np.allclose(cached['data'][1]['y'], 0.5)
+
+    # Sem puts o conjunto de traços muda e a figura nova é devolvida
+    calls_only = service.plot_greeks_surface(chain.calls)
+    assert service.update_figure(figure, calls_only) is calls_only
+
+
+def test_export_figures_in_worker_pool(tmp_path):
+    service = VisualizationService()
+    chain = make_chain(np.arange(40000.0, 50000.0, 1000.0))
+    figures = {
+        'smile': service.plot_volatility_surface(chain),
+        'greeks': service.plot_greeks_surface(chain, as_dict=True),
+    }
+    paths = service.export_figures(figures, tmp_path / 'out', 'json', max_workers=2)
+    assert [p.rsplit('/', 1)[-1] for p in paths] == ['smile.json', 'greeks.json']
+    assert json.loads((tmp_path / 'out' / 'greeks.json').read_text())['data'][0]['uid'] == 'calls-delta'